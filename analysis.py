@@ -0,0 +1,85 @@
+import hashlib
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from langdetect import DetectorFactory, detect
+from textstat import flesch_reading_ease
+
+from simhash import simhash
+
+# langdetect is randomized by default; seed it so every process gives the same answer
+DetectorFactory.seed = 0
+
+
+def analyze_content(content):
+    """CPU-bound per-page analysis: word count, language, readability, content hash and SimHash."""
+    word_count = len(content.split())
+    try:
+        language = detect(content) if len(content) > 50 else 'unknown'
+    except Exception:
+        language = 'unknown'
+    try:
+        readability = flesch_reading_ease(content)
+    except Exception:
+        readability = 0
+    return {
+        'word_count': word_count,
+        'language_detected': language,
+        'readability_score': readability,
+        'content_hash': hashlib.md5(content.encode()).hexdigest(),
+        'simhash': simhash(content),
+    }
+
+
+class AnalysisPool:
+    """Runs analyze_content in worker processes so crawl threads don't hold the GIL.
+
+    ``workers`` defaults to the CPU count; ``0`` analyzes inline in the calling
+    thread. The process pool is created on first use and shared by every crawl
+    session of the owning crawler.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is not None:
+                return self._executor
+            if 'forkserver' in multiprocessing.get_all_start_methods():
+                # Fork from a clean server process rather than the threaded Flask process
+                context = multiprocessing.get_context('forkserver')
+                context.set_forkserver_preload(['analysis', 'simhash'])
+            else:
+                context = multiprocessing.get_context('spawn')
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+            return self._executor
+
+    def submit(self, content):
+        if self.workers == 0:
+            future = Future()
+            future.set_result(analyze_content(content))
+            return future
+        executor = self._get_executor()
+        try:
+            return executor.submit(analyze_content, content)
+        except BrokenProcessPool:
+            # A worker died (OOM, kill); replace the pool instead of failing every later page
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            return self._get_executor().submit(analyze_content, content)
+
+    def analyze(self, content):
+        return self.submit(content).result()
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
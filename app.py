@@ -1,8 +1,11 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify, stream_with_context
 from flask_cors import CORS
+import argparse
 import os
 from crawler import WebCrawler
-import json
+from exporter import EXPORT_FORMATS
+from events import iter_sse
+from metrics import PROFILE_MODES
 
 app = Flask(__name__)
 CORS(app)
@@ -24,6 +27,9 @@ def start_crawl():
         start_url = data.get('url')
         max_pages = int(data.get('max_pages', 50))
         delay = float(data.get('delay', 1.0))
+        engine = data.get('engine', 'sequential')
+        incremental = bool(data.get('incremental', False))
+        priority = int(data.get('priority', 0))
         
         if not start_url:
             return jsonify({'error': 'URL is required'}), 400
@@ -32,13 +38,12 @@ def start_crawl():
         if not start_url.startswith(('http://', 'https://')):
             start_url = 'http://' + start_url
         
-        session_id = crawler.start_crawl(start_url, max_pages, delay)
+        result = crawler.start_crawl(start_url, max_pages, delay, engine, incremental, priority)
         
-        return jsonify({
-            'success': True,
-            'session_id': session_id,
-            'message': 'Crawling started successfully'
-        })
+        return jsonify(dict(result, success=True, message='Crawling started successfully'))
+    
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -55,11 +60,59 @@ def get_sessions():
 
 @app.route('/api/sessions/<int:session_id>/pages', methods=['GET'])
 def get_session_pages(session_id):
-    """Get pages for a specific session"""
+    """Get a page of crawled pages for a session.
+
+    Query params: ``fields`` (comma-separated columns, ``content`` excluded by
+    default), ``after_id``/``since_id`` (only rows with a larger id) and
+    ``limit`` (default 100, max 1000).
+    """
     try:
-        pages = crawler.get_session_pages(session_id)
-        return jsonify({'pages': pages})
+        fields = request.args.get('fields')
+        columns = [f.strip() for f in fields.split(',') if f.strip()] if fields else None
+        after_id = int(request.args.get('after_id', request.args.get('since_id', 0)))
+        limit = max(1, min(int(request.args.get('limit', 100)), 1000))
+
+        pages = crawler.get_session_pages(session_id, columns, after_id, limit + 1)
+        has_more = len(pages) > limit
+        pages = pages[:limit]
+        return jsonify({
+            'pages': pages,
+            'next_after_id': pages[-1]['id'] if pages else after_id,
+            'has_more': has_more
+        })
     
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/sessions/<int:session_id>/media', methods=['GET'])
+def get_session_media(session_id):
+    """Get a page of a session's media files.
+
+    Query params: ``type`` (image, video or audio), ``status`` (pending,
+    downloaded, probed, skipped or failed), ``after_id`` and ``limit``
+    (default 100, max 1000).
+    """
+    try:
+        if not crawler.get_session(session_id):
+            return jsonify({'error': 'Session not found'}), 404
+        
+        after_id = int(request.args.get('after_id', 0))
+        limit = max(1, min(int(request.args.get('limit', 100)), 1000))
+        
+        media = crawler.get_session_media(session_id, request.args.get('type'), request.args.get('status'),
+                                          after_id, limit + 1)
+        has_more = len(media) > limit
+        media = media[:limit]
+        return jsonify({
+            'media': media,
+            'next_after_id': media[-1]['id'] if media else after_id,
+            'has_more': has_more
+        })
+    
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -67,17 +120,132 @@ def get_session_pages(session_id):
 def get_session_status(session_id):
     """Get status of a specific session"""
     try:
-        sessions = crawler.get_sessions()
-        session = next((s for s in sessions if s['id'] == session_id), None)
+        session = crawler.get_session(session_id)
         
         if not session:
             return jsonify({'error': 'Session not found'}), 404
         
+        session['queue_position'] = crawler.scheduler.position(session_id)
+        session['stage_timings'] = crawler.metrics.summary(session_id)
+        session['host_rates'] = crawler.get_host_rates([session['domain']])
+        if session['engine'] == 'distributed':
+            session['frontier'] = crawler.coordinator.session_status(session_id)
         return jsonify({'session': session})
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/sessions/<int:session_id>/graph', methods=['GET'])
+def get_session_graph(session_id):
+    """Get link graph metrics: PageRank, in-degree, orphan pages and broken links"""
+    try:
+        limit = int(request.args.get('limit', 50))
+        if not 1 <= limit <= 1000:
+            return jsonify({'error': 'limit must be between 1 and 1000'}), 400
+        
+        graph = crawler.get_link_graph(session_id, limit)
+        if graph is None:
+            return jsonify({'error': 'Session not found'}), 404
+        
+        return jsonify(graph)
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/sessions/<int:session_id>/resume', methods=['POST'])
+def resume_session(session_id):
+    """Resume an interrupted session from its checkpoint"""
+    try:
+        result = crawler.resume_crawl(session_id)
+        
+        if result is None:
+            return jsonify({'error': 'Session not found'}), 404
+        
+        return jsonify(dict(result, message='Crawling resumed successfully'))
+    
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 409
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/sessions/<int:session_id>/cancel', methods=['POST'])
+@app.route('/api/sessions/<int:session_id>/pause', methods=['POST'])
+def stop_session(session_id):
+    """Cancel or pause a queued or running session"""
+    try:
+        if request.path.endswith('/cancel'):
+            result = crawler.cancel_crawl(session_id)
+        else:
+            result = crawler.pause_crawl(session_id)
+        
+        if result is None:
+            return jsonify({'error': 'Session not found'}), 404
+        
+        return jsonify(result)
+    
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 409
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/workers', methods=['GET'])
+def get_workers():
+    """Distributed crawl workers, active leases and requeued URLs"""
+    try:
+        return jsonify(crawler.coordinator.status())
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/workers/lease', methods=['POST'])
+def lease_urls():
+    """Lease a batch of frontier URLs to a distributed crawl worker"""
+    try:
+        data = request.get_json() or {}
+        worker_id = data.get('worker_id')
+        max_urls = int(data.get('max_urls', 10))
+        
+        if not worker_id:
+            return jsonify({'error': 'worker_id is required'}), 400
+        
+        lease = crawler.coordinator.lease(str(worker_id), max_urls)
+        if lease is None:
+            return '', 204
+        
+        return jsonify(lease)
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/workers/leases/<lease_id>', methods=['POST'])
+def submit_lease_results(lease_id):
+    """Accept a worker's results for a lease; ``final`` releases the lease"""
+    try:
+        data = request.get_json() or {}
+        results = data.get('results', [])
+        
+        if not isinstance(results, list):
+            return jsonify({'error': 'results must be a list'}), 400
+        
+        accepted = crawler.coordinator.submit(lease_id, results, bool(data.get('final')), data.get('delay'))
+        if accepted is None:
+            return jsonify({'error': 'Lease expired or unknown'}), 409
+        
+        return jsonify({'success': True, 'accepted': accepted})
+    
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/events', methods=['GET'])
+@app.route('/api/sessions/<int:session_id>/events', methods=['GET'])
+def stream_events(session_id=None):
+    """Server-sent events for one session, or for every session"""
+    subscription = crawler.events.subscribe(session_id)
+    return Response(stream_with_context(iter_sse(subscription)), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 '''Export Error in this
 @app.route('/api/sessions/<int:session_id>/export', methods=['GET'])
 def export_session_data(session_id):
@@ -104,59 +272,78 @@ def export_session_data(session_id):
 
 @app.route('/api/sessions/<int:session_id>/export', methods=['GET'])
 def export_session_data(session_id):
+    """Stream session data as JSON, NDJSON or CSV, optionally gzip-compressed"""
     try:
-        export_path = crawler.export_session_data(session_id, format_type='json')
+        format_type = request.args.get('format', 'json')
+        if format_type not in EXPORT_FORMATS:
+            return jsonify({'error': f'Unsupported format: {format_type}'}), 400
+        compress = request.args.get('gzip', '0') in ('1', 'true')
+        chunks = crawler.iter_session_export(
+            session_id,
+            format_type,
+            include_content=request.args.get('content', '1') in ('1', 'true'),
+            include_links=request.args.get('links', '0') in ('1', 'true'),
+            compress=compress,
+        )
 
-        if not export_path or not os.path.exists(export_path):
-            return jsonify({'error': 'Export failed or file not found'}), 500
+        if chunks is None:
+            return jsonify({'error': 'Session not found'}), 404
 
-        # Load the exported file and return its JSON content
-        with open(export_path, 'r', encoding='utf-8') as f:
-            return jsonify(json.load(f))
+        mimetype, extension = EXPORT_FORMATS[format_type]
+        filename = f"session_{session_id}_export.{extension}"
+        headers = {'Content-Disposition': f'attachment; filename="{filename}"'}
+        if compress:
+            headers['Content-Disposition'] = f'attachment; filename="{filename}.gz"'
+            mimetype = 'application/gzip'
+        return Response(stream_with_context(chunks), mimetype=mimetype, headers=headers)
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 
+@app.route('/api/search', methods=['GET'])
+def search_pages():
+    """Full-text search over crawled pages, ranked by relevance"""
+    try:
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({'error': 'q is required'}), 400
+        
+        session_id = request.args.get('session_id', type=int)
+        language = request.args.get('language')
+        limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        
+        results = crawler.search(query, session_id, language, limit, offset)
+        return jsonify({'query': query, 'results': results, 'count': len(results)})
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Stage latency histograms and crawl counters for Prometheus"""
+    try:
+        return Response(crawler.render_metrics(), mimetype='text/plain; version=0.0.4')
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/stats', methods=['GET'])
 def get_stats():
     """Get overall crawling statistics"""
     try:
-        import sqlite3
-        
-        conn = sqlite3.connect(crawler.db_path)
-        cursor = conn.cursor()
-        
-        # Get total sessions
-        cursor.execute('SELECT COUNT(*) FROM crawl_sessions')
-        total_sessions = cursor.fetchone()[0]
-        
-        # Get total pages crawled
-        cursor.execute('SELECT COUNT(*) FROM pages')
-        total_pages = cursor.fetchone()[0]
-        
-        # Get total links found
-        cursor.execute('SELECT COUNT(*) FROM links')
-        total_links = cursor.fetchone()[0]
-        
-        # Get active sessions
-        cursor.execute("SELECT COUNT(*) FROM crawl_sessions WHERE status = 'running'")
-        active_sessions = cursor.fetchone()[0]
-        
-        conn.close()
-        
-        return jsonify({
-            'total_sessions': total_sessions,
-            'total_pages': total_pages,
-            'total_links': total_links,
-            'active_sessions': active_sessions
-        })
+        return jsonify(crawler.get_stats())
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--profile', choices=PROFILE_MODES, help="dump a profile of every crawl session")
+    crawler.profile = parser.parse_args().profile
+
     # Create database directory if it doesn't exist
     os.makedirs('database', exist_ok=True)
     
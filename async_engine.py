@@ -0,0 +1,186 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
+
+
+class HostPoliteness:
+    """Per-host gate: caps concurrent connections and spaces request starts by min_gap seconds.
+
+    A slot can ask for a longer gap for its host, e.g. a robots.txt Crawl-delay,
+    and for its own connection cap, e.g. an adaptive one.
+    """
+
+    def __init__(self, min_gap=1.0, max_connections=2):
+        self.min_gap = min_gap
+        self.max_connections = max_connections
+        self._hosts = {}
+
+    def _host(self, host):
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = {'active': 0, 'next_start': 0.0, 'cond': asyncio.Condition()}
+        return state
+
+    @asynccontextmanager
+    async def slot(self, host, min_gap=None, max_connections=None):
+        state = self._host(host)
+        gap = max(self.min_gap, min_gap or 0.0)
+        limit = max_connections or self.max_connections
+        loop = asyncio.get_running_loop()
+        async with state['cond']:
+            await state['cond'].wait_for(lambda: state['active'] < limit)
+            state['active'] += 1
+            start_at = max(loop.time(), state['next_start'])
+            state['next_start'] = start_at + gap
+        try:
+            wait = start_at - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            yield
+        finally:
+            async with state['cond']:
+                state['active'] -= 1
+                state['cond'].notify()
+
+
+class AsyncCrawlEngine:
+    """Asyncio crawl loop that keeps many fetches in flight for one session.
+
+    Network I/O runs on a thread pool sized to ``concurrency`` so the
+    crawler's pooled HTTP transport is reused; parsing runs on a single
+    processing thread and analysis on the crawler's process pool, both
+    overlapping with the fetches, and rows are handed to the crawler's
+    database writer.
+    """
+
+    def __init__(self, crawler, concurrency=16, per_host_connections=4):
+        self.crawler = crawler
+        self.concurrency = concurrency
+        self.per_host_connections = per_host_connections
+
+    def run(self, session_id, start_url, max_pages, delay, incremental=False, checkpoint=None):
+        asyncio.run(self._crawl(session_id, start_url, max_pages, delay, incremental, checkpoint))
+
+    async def _crawl(self, session_id, start_url, max_pages, delay, incremental=False, checkpoint=None):
+        loop = asyncio.get_running_loop()
+        # Gaps and connection caps come per request from the crawler, which may adapt them per host
+        politeness = HostPoliteness(min_gap=0.0, max_connections=self.per_host_connections)
+        fetch_pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='crawl-fetch')
+        process_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='crawl-process')
+        base_domain = urlparse(start_url).netloc
+        previous_pages = None
+        if incremental:
+            previous_pages = await loop.run_in_executor(process_pool, self.crawler._load_previous_pages,
+                                                        session_id, base_domain)
+        queue = asyncio.Queue()
+        seen = self.crawler._new_seen_set()
+        if checkpoint:
+            for url in checkpoint['seen']:
+                seen.add(url)
+            for url in checkpoint['pending']:
+                seen.add(url)
+                queue.put_nowait(url)
+            content_hashes = set(checkpoint['content_hashes'])
+            crawled = checkpoint['pages_crawled']
+        else:
+            seeds = await loop.run_in_executor(fetch_pool, self.crawler._sitemap_seeds, start_url)
+            added = [url for url in [start_url] + seeds if seen.add(url)]
+            for url in added:
+                queue.put_nowait(url)
+            self.crawler._checkpoint(session_id, added=added)
+            content_hashes = set()
+            crawled = 0
+        state = {'reserved': crawled, 'crawled': crawled}
+        slots = asyncio.Condition()
+
+        async def worker():
+            while True:
+                url = await queue.get()
+                try:
+                    async with slots:
+                        # With every slot reserved, wait for the fetches in flight: a failed one frees its slot
+                        await slots.wait_for(lambda: state['reserved'] < max_pages
+                                             or state['reserved'] == state['crawled'])
+                        if state['reserved'] >= max_pages or self.crawler.scheduler.stop_status(session_id):
+                            continue
+                        state['reserved'] += 1
+                    links = None
+                    try:
+                        links = await self._crawl_url(loop, politeness, fetch_pool, process_pool, session_id,
+                                                      url, content_hashes, base_domain, previous_pages, delay)
+                    finally:
+                        async with slots:
+                            if links is None:
+                                state['reserved'] -= 1
+                            else:
+                                state['crawled'] += 1
+                            slots.notify_all()
+                    added = []
+                    for link in links or ():
+                        if link['is_internal'] and seen.add(link['canonical_url']):
+                            queue.put_nowait(link['canonical_url'])
+                            added.append(link['canonical_url'])
+                    self.crawler._checkpoint(session_id, url, added)
+                    if links is None:
+                        continue
+                    self.crawler._update_session_progress(session_id, state['crawled'], queue.qsize())
+                    print(f"Pages Crawled: {state['crawled']}/{max_pages} | Queue: {queue.qsize()}")
+                finally:
+                    queue.task_done()
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+        try:
+            await queue.join()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            fetch_pool.shutdown(wait=False)
+            process_pool.shutdown(wait=True)
+            status = self.crawler._complete_session(session_id, state['crawled'])
+        print(f"Session {status}: {state['crawled']} pages crawled.")
+
+    async def _crawl_url(self, loop, politeness, fetch_pool, process_pool, session_id,
+                         url, content_hashes, base_domain, previous_pages, delay=0.0):
+        try:
+            # Fetches robots.txt on a host's first URL, so it runs off the event loop
+            if not await loop.run_in_executor(fetch_pool, self.crawler._allowed, url):
+                print(f"Disallowed by robots.txt: {url}")
+                return None
+            print(f"Crawling: {url}")
+            validators = self.crawler._validators(url, previous_pages)
+            async with politeness.slot(urlparse(url).netloc, self.crawler._host_delay(url, delay),
+                                       self.crawler._host_connections(url, self.per_host_connections)):
+                response, response_time = await loop.run_in_executor(fetch_pool, self.crawler._fetch,
+                                                                     url, validators, session_id)
+            if response.status_code not in (200, 304):
+                self.crawler._report_error(session_id, url, f"HTTP {response.status_code}")
+            if response.status_code == 304:
+                page_data = await loop.run_in_executor(process_pool, self.crawler._not_modified, session_id, url,
+                                                       response, response_time, content_hashes, previous_pages)
+                if not page_data:
+                    return None
+                return await loop.run_in_executor(process_pool, self._save, page_data, url, base_domain)
+            parsed = await loop.run_in_executor(process_pool, self.crawler._parse_response, url, response,
+                                                session_id)
+            if parsed is None:
+                return None
+            analysis = self.crawler.analysis
+            with self.crawler.metrics.timer('analysis', session_id, urlparse(url).netloc):
+                if analysis.workers:
+                    result = await asyncio.wrap_future(analysis.submit(parsed['content']))
+                else:
+                    result = await loop.run_in_executor(process_pool, analysis.analyze, parsed['content'])
+            # The first page of a domain loads its SimHash index from the database
+            page_data = await loop.run_in_executor(process_pool, self.crawler._build_page, session_id, url,
+                                                   response, response_time, parsed, result, content_hashes)
+            if not page_data:
+                return None
+            return await loop.run_in_executor(process_pool, self._save, page_data, url, base_domain)
+        except Exception as e:
+            self.crawler._report_error(session_id, url, e)
+            return None
+
+    def _save(self, page_data, url, base_domain):
+        return self.crawler._store_page(page_data, url, base_domain)
@@ -0,0 +1,78 @@
+"""Check that pooled page analysis matches the inline path and measure multi-session throughput.
+
+Each simulated session is a thread that analyzes ``--docs`` pages one after
+another, as a crawl worker does. Throughput is reported for inline analysis
+and for process pools of increasing size up to the CPU count.
+
+Usage: python benchmarks/bench_analysis.py [--sessions 4] [--docs 40]
+"""
+import argparse
+import glob
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analysis import AnalysisPool, analyze_content  # noqa: E402
+from extractor import extract_page_soup  # noqa: E402
+from fixture_server import WORDS  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def corpus(count, words=1500):
+    docs = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES, '*.html'))):
+        with open(path, 'rb') as f:
+            docs.append(extract_page_soup(f.read())['content'])
+    rng = random.Random(1)
+    while len(docs) < count:
+        docs.append(' '.join(rng.choice(WORDS) for _ in range(words)) + '.')
+    return docs
+
+
+def run_sessions(pool, docs, sessions):
+    def session():
+        for doc in docs:
+            pool.analyze(doc)
+
+    threads = [threading.Thread(target=session) for _ in range(sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sessions * len(docs) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=4)
+    parser.add_argument('--docs', type=int, default=40)
+    args = parser.parse_args()
+    docs = corpus(args.docs)
+
+    pool = AnalysisPool(workers=2)
+    mismatches = [doc[:40] for doc in docs if pool.analyze(doc) != analyze_content(doc)]
+    pool.shutdown()
+    print(f"identical output: {len(docs) - len(mismatches)}/{len(docs)} documents")
+    for doc in mismatches:
+        print(f"  mismatch: {doc!r}")
+
+    cpus = os.cpu_count() or 1
+    sizes = sorted({1, 2, 4, cpus} & set(range(1, cpus + 1)))
+    print(f"{args.sessions} sessions x {len(docs)} pages, {cpus} CPUs")
+    print(f"{'inline':>10}: {run_sessions(AnalysisPool(workers=0), docs, args.sessions):8.1f} pages/sec")
+    for size in sizes:
+        pool = AnalysisPool(workers=size)
+        for future in [pool.submit(doc) for doc in docs[:size * 2]]:
+            future.result()  # start the workers outside the timed region
+        print(f"{f'{size} procs':>10}: {run_sessions(pool, docs, args.sessions):8.1f} pages/sec")
+        pool.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,250 @@
+"""End-to-end crawl benchmark: pages/sec, per-page latency, peak RSS and database size.
+
+Starts the fixture site, then for every engine crawls it with ``--sessions``
+concurrent sessions started through ``WebCrawler.start_crawl`` and through
+the Flask ``/api/crawl`` endpoint, each run in a fresh temporary database.
+Results are printed and written as JSON; ``--compare`` prints the change
+against an earlier results file.
+
+Usage: python benchmarks/bench_crawl.py [--pages 500] [--fanout 5] [--words 300] [--latency 0.02]
+           [--duplicate-ratio 0] [--error-rate 0] [--sitemap] [--engines sequential,async]
+           [--via start_crawl,api] [--sessions 2] [--max-pages 50] [--delay 0]
+           [--output FILE] [--compare FILE]
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from crawler import WebCrawler  # noqa: E402
+from fixture_server import FixtureServer  # noqa: E402
+
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+
+class RssSampler:
+    """Tracks this process's peak resident set size while a run is in progress."""
+
+    def __init__(self, interval=0.02):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @staticmethod
+    def current():
+        try:
+            with open('/proc/self/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+        # No /proc: fall back to the process-lifetime peak (kilobytes on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+    def _run(self):
+        while True:
+            self.peak = max(self.peak, self.current())
+            if self._stop.wait(self.interval):
+                return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of ``values`` (0 <= q <= 100)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))]
+
+
+def _load_app(workdir):
+    """Import the Flask app with its module-level crawler created under ``workdir``, not the repo's database."""
+    if 'app' not in sys.modules:
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            import app  # noqa: F401
+        finally:
+            os.chdir(cwd)
+    return sys.modules['app']
+
+
+def start_sessions(via, crawler, server, args, workdir):
+    if via == 'start_crawl':
+        return [crawler.start_crawl(server.url, args.max_pages, args.delay, args.engine)['session_id']
+                for _ in range(args.sessions)]
+    app = _load_app(workdir)
+    app.crawler = crawler
+    client = app.app.test_client()
+    ids = []
+    for _ in range(args.sessions):
+        response = client.post('/api/crawl', json={'url': server.url, 'max_pages': args.max_pages,
+                                                   'delay': args.delay, 'engine': args.engine})
+        if response.status_code != 200:
+            raise RuntimeError(f"/api/crawl failed: {response.get_data(as_text=True)}")
+        ids.append(response.get_json()['session_id'])
+    return ids
+
+
+def wait_for_sessions(db_path, session_ids, timeout):
+    deadline = time.time() + timeout
+    placeholders = ', '.join('?' * len(session_ids))
+    while time.time() < deadline:
+        conn = sqlite3.connect(db_path)
+        active = conn.execute(f"SELECT COUNT(*) FROM crawl_sessions WHERE id IN ({placeholders}) "
+                              f"AND status IN ('queued', 'running')", session_ids).fetchone()[0]
+        conn.close()
+        if not active:
+            return
+        time.sleep(0.05)
+    raise TimeoutError(f"Sessions {session_ids} did not finish within {timeout}s")
+
+
+def run(via, server, args, workdir):
+    db_path = os.path.join(workdir, f"{args.engine}-{via}.db")
+    crawler = WebCrawler(db_path=db_path, http_cache_dir=None, max_sessions=args.sessions)
+    try:
+        with RssSampler() as rss:
+            start = time.perf_counter()
+            session_ids = start_sessions(via, crawler, server, args, workdir)
+            wait_for_sessions(db_path, session_ids, args.timeout)
+            crawler.writer.flush()
+            elapsed = time.perf_counter() - start
+        stages = crawler.metrics.summary()
+    finally:
+        crawler.analysis.shutdown()
+        crawler.writer.close()
+
+    placeholders = ', '.join('?' * len(session_ids))
+    conn = sqlite3.connect(db_path)
+    latencies = [row[0] for row in conn.execute(
+        f"SELECT response_time FROM pages WHERE session_id IN ({placeholders}) AND response_time IS NOT NULL",
+        session_ids)]
+    errors = conn.execute(f"SELECT COALESCE(SUM(total_errors), 0) FROM crawl_sessions WHERE id IN ({placeholders})",
+                          session_ids).fetchone()[0]
+    conn.close()
+    db_size = sum(os.path.getsize(db_path + suffix) for suffix in ('', '-wal') if os.path.exists(db_path + suffix))
+    pages = len(latencies)
+    return {
+        'engine': args.engine,
+        'via': via,
+        'sessions': args.sessions,
+        'pages': pages,
+        'errors': errors,
+        'elapsed_s': round(elapsed, 3),
+        'pages_per_sec': round(pages / elapsed, 2) if elapsed else 0.0,
+        'latency_p50_ms': round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+        'latency_p99_ms': round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+        'peak_rss_mb': round(rss.peak / 1e6, 1),
+        'db_size_mb': round(db_size / 1e6, 2),
+        'stages': stages,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, path):
+    with open(path) as f:
+        previous = {(r['engine'], r['via']): r for r in json.load(f)['results']}
+    print(f"\nChange against {path}:")
+    for result in results:
+        old = previous.get((result['engine'], result['via']))
+        if not old:
+            continue
+        for key in ('pages_per_sec', 'latency_p99_ms', 'peak_rss_mb', 'db_size_mb'):
+            if old[key] and result[key] is not None:
+                change = (result[key] - old[key]) / old[key] * 100
+                print(f"{result['engine']:>10} {result['via']:<11} {key:<15} "
+                      f"{old[key]:>9} -> {result[key]:>9} ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=500, help="size of the fixture site")
+    parser.add_argument('--fanout', type=int, default=5)
+    parser.add_argument('--words', type=int, default=300, help="page weight in words")
+    parser.add_argument('--latency', type=float, default=0.02, help="seconds added to every response")
+    parser.add_argument('--duplicate-ratio', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0, help="share of pages answering HTTP 500")
+    parser.add_argument('--sitemap', action='store_true', help="serve a sitemap index listing every page")
+    parser.add_argument('--engines', default='sequential,async')
+    parser.add_argument('--via', default='start_crawl,api')
+    parser.add_argument('--sessions', type=int, default=2, help="concurrent sessions per run")
+    parser.add_argument('--max-pages', type=int, default=50, help="per session (start_crawl caps it at 50)")
+    parser.add_argument('--delay', type=float, default=0.0)
+    parser.add_argument('--timeout', type=float, default=600)
+    parser.add_argument('--output', help="results file (default: benchmarks/results/bench_crawl_<time>.json)")
+    parser.add_argument('--compare', help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'engine':>10} {'via':<11} {'pages':>6} {'errors':>6} {'pages/s':>8} {'p50':>8} {'p99':>9} "
+          f"{'peak RSS':>9} {'db size':>8}")
+    with FixtureServer(args.pages, args.fanout, args.latency, duplicate_ratio=args.duplicate_ratio,
+                       sitemap=args.sitemap, words=args.words, error_rate=args.error_rate) as server, \
+            tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        # The crawler creates exports/ (and the app its database) relative to the working directory
+        os.chdir(workdir)
+        try:
+            for engine in args.engines.split(','):
+                for via in args.via.split(','):
+                    args.engine = engine
+                    result = run(via, server, args, workdir)
+                    results.append(result)
+                    print(f"{engine:>10} {via:<11} {result['pages']:>6} {result['errors']:>6} "
+                          f"{result['pages_per_sec']:>8.1f} {result['latency_p50_ms'] or 0:>6.1f}ms "
+                          f"{result['latency_p99_ms'] or 0:>7.1f}ms {result['peak_rss_mb']:>7.1f}MB "
+                          f"{result['db_size_mb']:>6.2f}MB")
+        finally:
+            os.chdir(cwd)
+
+    config = {key: value for key, value in vars(args).items() if key not in ('engine', 'output', 'compare')}
+    report = {
+        'benchmark': 'bench_crawl',
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'config': config,
+        'results': results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"bench_crawl_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""Distributed crawl benchmark: pages/sec with N local worker processes sharing one frontier.
+
+Starts ``--sites`` fixture sites (one host each) and the web app as the
+coordinator on a temporary database, queues one distributed session per
+site and runs ``python distributed.py`` workers against it, once for every
+worker count in ``--workers``. ``--kill-after`` SIGKILLs one worker that many
+seconds into each run, so its leases expire and are requeued to the others
+(with a single worker, a replacement is started).
+Each run checks that no URL was stored twice.
+
+Usage: python benchmarks/bench_distributed.py [--sites 4] [--pages 200] [--max-pages 100] [--latency 0.02]
+           [--workers 1,2,4] [--batch-size 10] [--delay 0] [--lease-timeout 5] [--kill-after 0]
+"""
+import argparse
+import os
+import signal
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_crawl import _load_app, wait_for_sessions  # noqa: E402
+from crawler import WebCrawler  # noqa: E402
+from fixture_server import FixtureServer  # noqa: E402
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args):
+        pass
+
+
+def start_workers(coordinator_url, count, batch_size, log_dir, first=0):
+    workers = []
+    for i in range(first, first + count):
+        log = open(os.path.join(log_dir, f"worker-{i}.log"), 'w')
+        process = subprocess.Popen([sys.executable, os.path.join(ROOT, 'distributed.py'), '--coordinator',
+                                    coordinator_url, '--worker-id', f"bench-{i}", '--batch-size', str(batch_size)],
+                                   cwd=log_dir, stdout=log, stderr=subprocess.STDOUT)
+        workers.append((process, log))
+    return workers
+
+
+def stop_workers(workers):
+    for process, log in workers:
+        if process.poll() is None:
+            process.send_signal(signal.SIGINT)
+    for process, log in workers:
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        log.close()
+
+
+def run(worker_count, servers, args, workdir):
+    db_path = os.path.join(workdir, f"distributed-{worker_count}.db")
+    crawler = WebCrawler(db_path=db_path, http_cache_dir=None, max_sessions=len(servers),
+                         lease_timeout=args.lease_timeout)
+    app = _load_app(workdir)
+    app.crawler = crawler
+    httpd = make_server('127.0.0.1', 0, app.app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    coordinator_url = f"http://127.0.0.1:{httpd.server_port}"
+    try:
+        start = time.perf_counter()
+        session_ids = [crawler.start_crawl(server.url, args.max_pages, args.delay, 'distributed')['session_id']
+                       for server in servers]
+        workers = start_workers(coordinator_url, worker_count, args.batch_size, workdir)
+        try:
+            if args.kill_after:
+                time.sleep(args.kill_after)
+                workers[0][0].kill()
+                if worker_count == 1:
+                    workers += start_workers(coordinator_url, 1, args.batch_size, workdir, first=1)
+            wait_for_sessions(db_path, session_ids, args.timeout)
+            crawler.writer.flush()
+            elapsed = time.perf_counter() - start
+        finally:
+            stop_workers(workers)
+        status = crawler.coordinator.status()
+    finally:
+        httpd.shutdown()
+        crawler.analysis.shutdown()
+        crawler.writer.close()
+
+    placeholders = ', '.join('?' * len(session_ids))
+    conn = sqlite3.connect(db_path)
+    pages, distinct = conn.execute(f"SELECT COUNT(*), COUNT(DISTINCT session_id || ' ' || url) FROM pages "
+                                   f"WHERE session_id IN ({placeholders})", session_ids).fetchone()
+    conn.close()
+    return {'workers': worker_count, 'pages': pages, 'duplicates': pages - distinct, 'elapsed': elapsed,
+            'requeued': status['requeued_urls']}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sites', type=int, default=4, help="fixture sites, one distributed session each")
+    parser.add_argument('--pages', type=int, default=200, help="size of each fixture site")
+    parser.add_argument('--max-pages', type=int, default=100, help="per session")
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--workers', default='1,2,4', help="worker process counts to run")
+    parser.add_argument('--batch-size', type=int, default=10)
+    parser.add_argument('--delay', type=float, default=0.0)
+    parser.add_argument('--lease-timeout', type=float, default=5.0)
+    parser.add_argument('--kill-after', type=float, default=0.0, help="SIGKILL one worker after this many seconds")
+    parser.add_argument('--timeout', type=float, default=600)
+    args = parser.parse_args()
+
+    servers = [FixtureServer(args.pages, latency=args.latency) for _ in range(args.sites)]
+    for server in servers:
+        server.__enter__()
+    print(f"{'workers':>7} {'pages':>6} {'dupes':>6} {'requeued':>8} {'seconds':>8} {'pages/s':>8}")
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            cwd = os.getcwd()
+            os.chdir(workdir)
+            try:
+                for count in (int(n) for n in args.workers.split(',')):
+                    result = run(count, servers, args, workdir)
+                    print(f"{result['workers']:>7} {result['pages']:>6} {result['duplicates']:>6} "
+                          f"{result['requeued']:>8} {result['elapsed']:>8.2f} "
+                          f"{result['pages'] / result['elapsed']:>8.1f}")
+            finally:
+                os.chdir(cwd)
+    finally:
+        for server in servers:
+            server.__exit__(None, None, None)
+
+
+if __name__ == '__main__':
+    main()
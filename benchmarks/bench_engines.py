@@ -0,0 +1,55 @@
+"""Compare pages/sec of the sequential and asyncio crawl engines against a local fixture site.
+
+Usage: python benchmarks/bench_engines.py [--pages 50] [--latency 0.05] [--delay 0]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crawler import WebCrawler  # noqa: E402
+from fixture_server import FixtureServer  # noqa: E402
+
+
+def wait_for_session(crawler, session_id, timeout=600):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        conn = sqlite3.connect(crawler.db_path)
+        row = conn.execute("SELECT status, total_pages FROM crawl_sessions WHERE id = ?",
+                           (session_id,)).fetchone()
+        conn.close()
+        if row and row[0] == 'completed':
+            return row[1]
+        time.sleep(0.05)
+    raise TimeoutError(f"Session {session_id} did not finish")
+
+
+def run(engine, server, max_pages, delay, db_dir):
+    crawler = WebCrawler(db_path=os.path.join(db_dir, f"{engine}.db"))
+    start = time.perf_counter()
+    session = crawler.start_crawl(server.url, max_pages=max_pages, delay=delay, engine=engine)
+    pages = wait_for_session(crawler, session['session_id'])
+    elapsed = time.perf_counter() - start
+    return pages, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--delay', type=float, default=0.0)
+    args = parser.parse_args()
+
+    with FixtureServer(pages=args.pages * 2, latency=args.latency) as server, \
+            tempfile.TemporaryDirectory() as db_dir:
+        for engine in ('sequential', 'async'):
+            pages, elapsed = run(engine, server, args.pages, args.delay, db_dir)
+            print(f"{engine:>10}: {pages} pages in {elapsed:.2f}s -> {pages / elapsed:.1f} pages/sec")
+
+
+if __name__ == '__main__':
+    main()
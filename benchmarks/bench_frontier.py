@@ -0,0 +1,78 @@
+"""Micro-benchmark: Frontier (bloom/exact) versus the original deque + visited set.
+
+Simulates a link-heavy site where every crawled page yields ``--links`` links,
+most of them already seen (navigation), and reports enqueue time and memory.
+
+Usage: python benchmarks/bench_frontier.py [--pages 1000] [--links 100] [--site 50000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from frontier import Frontier, make_seen_set  # noqa: E402
+
+
+def link_batches(pages, links, site, seed=0):
+    rng = random.Random(seed)
+    nav = [f"https://example.com/section/{i}" for i in range(links // 2)]
+    for _ in range(pages):
+        yield nav + [f"https://example.com/article/{rng.randrange(site)}?ref=list"
+                     for _ in range(links - len(nav))]
+
+
+def run_deque(batches):
+    visited = set()
+    to_visit = deque(["https://example.com/"])
+    for batch in batches:
+        if to_visit:
+            url = to_visit.popleft()
+            visited.add(url)
+        for link in batch:
+            if link not in visited and link not in to_visit:
+                to_visit.append(link)
+    return len(visited) + len(to_visit)
+
+
+def run_frontier(batches, mode):
+    frontier = Frontier(make_seen_set(mode, capacity=1_000_000, error_rate=0.001))
+    frontier.add("https://example.com/")
+    for batch in batches:
+        if frontier:
+            frontier.pop()
+        for link in batch:
+            frontier.add(link)
+    return len(frontier.seen)
+
+
+def measure(name, func, args):
+    # Batches are generated lazily so each structure pays for the URL strings it retains.
+    start = time.perf_counter()
+    seen = func(link_batches(args.pages, args.links, args.site))
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    func(link_batches(args.pages, args.links, args.site))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:>14}: {elapsed * 1000:9.1f} ms  peak {peak / 1024 / 1024:7.2f} MiB  seen {seen}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=1000)
+    parser.add_argument('--links', type=int, default=100)
+    parser.add_argument('--site', type=int, default=50000)
+    args = parser.parse_args()
+
+    measure('deque + set', run_deque, args)
+    measure('frontier/bloom', lambda b: run_frontier(b, 'bloom'), args)
+    measure('frontier/exact', lambda b: run_frontier(b, 'exact'), args)
+
+
+if __name__ == '__main__':
+    main()
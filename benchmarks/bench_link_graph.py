@@ -0,0 +1,123 @@
+"""Benchmark: link storage size of the old inline ``links`` table versus the normalized link graph,
+and the time to load a session's graph and compute PageRank, in-degree and orphans.
+
+Builds a synthetic site where every page carries the same ``--nav`` navigation
+links plus ``--content`` links to other pages, the pattern that makes the old
+table grow as pages x nav-links.
+
+Usage: python benchmarks/bench_link_graph.py [--pages 20000] [--nav 40] [--content 10]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from link_graph import LinkGraph, LinkStore, analyze_session, init_link_graph, np  # noqa: E402
+
+OLD_LINKS = """
+    CREATE TABLE links (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, page_id INTEGER, session_id INTEGER, url TEXT NOT NULL,
+        canonical_url TEXT, text TEXT, is_internal BOOLEAN, link_type TEXT
+    )
+"""
+PAGES = """
+    CREATE TABLE pages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, session_id INTEGER, url TEXT NOT NULL, canonical_url TEXT
+    )
+"""
+
+
+def site(pages, nav, content, seed=0):
+    """Yield ``(page_url, links)`` for a synthetic site."""
+    rng = random.Random(seed)
+    base = 'https://www.example.com'
+    nav_links = [(f"{base}/section/{i}", f"Section {i} navigation") for i in range(nav)]
+    for n in range(pages):
+        links = [{'url': url, 'canonical_url': url, 'text': text, 'is_internal': True, 'link_type': 'internal'}
+                 for url, text in nav_links]
+        for target in rng.sample(range(pages), content):
+            url = f"{base}/articles/{target}-a-reasonably-long-article-slug"
+            links.append({'url': url + '?utm_source=related', 'canonical_url': url, 'text': f"Article {target}",
+                          'is_internal': True, 'link_type': 'internal'})
+        yield f"{base}/articles/{n}-a-reasonably-long-article-slug", links
+
+
+def database_size(conn):
+    conn.execute("VACUUM")
+    return conn.execute("PRAGMA page_count").fetchone()[0] * conn.execute("PRAGMA page_size").fetchone()[0]
+
+
+def build_old(path, args):
+    conn = sqlite3.connect(path)
+    conn.execute(PAGES)
+    conn.execute(OLD_LINKS)
+    conn.execute("CREATE INDEX idx_links_canonical_url ON links(canonical_url)")
+    start = time.perf_counter()
+    for page_id, (page_url, links) in enumerate(site(args.pages, args.nav, args.content), 1):
+        conn.execute("INSERT INTO pages (id, session_id, url, canonical_url) VALUES (?, 1, ?, ?)",
+                     (page_id, page_url, page_url))
+        conn.executemany("INSERT INTO links (page_id, session_id, url, canonical_url, text, is_internal, link_type) "
+                         "VALUES (?, 1, ?, ?, ?, ?, ?)",
+                         [(page_id, link['url'], link['canonical_url'], link['text'], link['is_internal'],
+                           link['link_type']) for link in links])
+    conn.commit()
+    return conn, time.perf_counter() - start
+
+
+def build_new(path, args):
+    conn = sqlite3.connect(path)
+    conn.execute(PAGES)
+    init_link_graph(conn.cursor())
+    store = LinkStore()
+    start = time.perf_counter()
+    batch = []
+    for page_id, (page_url, links) in enumerate(site(args.pages, args.nav, args.content), 1):
+        conn.execute("INSERT INTO pages (id, session_id, url, canonical_url) VALUES (?, 1, ?, ?)",
+                     (page_id, page_url, page_url))
+        batch.append((1, page_id, page_url, links))
+        if len(batch) == 200:
+            store.write_links(conn.cursor(), batch)
+            batch = []
+    store.write_links(conn.cursor(), batch)
+    conn.commit()
+    return conn, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=20000)
+    parser.add_argument('--nav', type=int, default=40)
+    parser.add_argument('--content', type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        old, old_time = build_old(os.path.join(tmp, 'old.db'), args)
+        new, new_time = build_new(os.path.join(tmp, 'new.db'), args)
+        links = args.pages * (args.nav + args.content)
+        print(f"{args.pages} pages, {links} links")
+        print(f"inline links table: {database_size(old) / 1e6:7.1f} MB, written in {old_time:.1f}s")
+        print(f"link graph tables:  {database_size(new) / 1e6:7.1f} MB, written in {new_time:.1f}s")
+        old.close()
+
+        start = time.perf_counter()
+        graph = LinkGraph.load(new, 1)
+        load_time = time.perf_counter() - start
+        start = time.perf_counter()
+        graph.pagerank()
+        rank_time = time.perf_counter() - start
+        start = time.perf_counter()
+        analyze_session(new, 1, limit=20)
+        print(f"\nCSR graph ({'numpy' if np is not None else 'pure Python'}): {graph.nodes} nodes, "
+              f"{graph.edges} edges loaded in {load_time:.2f}s")
+        print(f"PageRank: {rank_time:.2f}s; full report (in-degree, PageRank, depth, orphans): "
+              f"{time.perf_counter() - start:.2f}s")
+        new.close()
+
+
+if __name__ == '__main__':
+    main()
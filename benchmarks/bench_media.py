@@ -0,0 +1,100 @@
+"""Crawl throughput with the media pipeline off and on, and how long the media downloads take.
+
+Crawls ``--max-pages`` pages of a fixture site whose pages embed ``--images``
+PNGs (from a pool of ``--pool`` shared images of ``--size`` pixels) with each
+engine, once recording media only and once also downloading them. Reports
+pages/sec of the HTML crawl, the seconds the media pipeline needed after the
+crawl finished, and how many files were fetched, reused from an earlier
+reference or left pending. Low-res copies are only made when Pillow is
+installed.
+
+Usage: python benchmarks/bench_media.py [--max-pages 50] [--images 6] [--pool 40] [--size 800x600]
+           [--latency 0.02] [--delay 0.05] [--workers 2]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_engines import wait_for_session  # noqa: E402
+from crawler import WebCrawler  # noqa: E402
+from fixture_server import FixtureServer  # noqa: E402
+
+
+def wait_for_media(db_path, session_id, timeout=120):
+    """Seconds until no media row of the session is pending any more (or ``timeout``)."""
+    start = time.perf_counter()
+    conn = sqlite3.connect(db_path)
+    try:
+        while time.perf_counter() - start < timeout:
+            pending = conn.execute("SELECT COUNT(*) FROM media_files WHERE session_id = ? "
+                                   "AND download_status = 'pending'", (session_id,)).fetchone()[0]
+            if not pending:
+                break
+            time.sleep(0.05)
+    finally:
+        conn.close()
+    return time.perf_counter() - start
+
+
+def run(engine, download, server, args, workdir):
+    db_path = os.path.join(workdir, f"{engine}-{download}.db")
+    crawler = WebCrawler(db_path=db_path, http_cache_dir=None, rate_control=False, download_media=download,
+                         media_workers=args.workers, media_dir=os.path.join(workdir, f"media-{engine}"))
+    try:
+        start = time.perf_counter()
+        session_id = crawler.start_crawl(server.url, args.max_pages, args.delay, engine)['session_id']
+        pages = wait_for_session(crawler, session_id)
+        elapsed = time.perf_counter() - start
+        drain = wait_for_media(db_path, session_id) if download else 0.0
+        stats = crawler.media.stats() if crawler.media else {}
+    finally:
+        if crawler.media:
+            crawler.media.close()
+        crawler.analysis.shutdown()
+        crawler.writer.close()
+    conn = sqlite3.connect(db_path)
+    rows, pending = conn.execute("SELECT COUNT(*), SUM(download_status = 'pending') FROM media_files "
+                                 "WHERE session_id = ?", (session_id,)).fetchone()
+    conn.close()
+    return {'pages': pages, 'elapsed': elapsed, 'drain': drain, 'rows': rows, 'pending': pending or 0,
+            'fetched': stats.get('queued', 0), 'reused': stats.get('reused', 0),
+            'downloaded': stats.get('downloaded', 0)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--max-pages', type=int, default=50)
+    parser.add_argument('--images', type=int, default=6, help="<img> tags per page")
+    parser.add_argument('--pool', type=int, default=40, help="distinct images on the site")
+    parser.add_argument('--size', default='800x600', help="image width x height")
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--delay', type=float, default=0.05)
+    parser.add_argument('--workers', type=int, default=2, help="media download threads")
+    args = parser.parse_args()
+    size = tuple(int(n) for n in args.size.split('x'))
+
+    print(f"{'engine':>10} {'media':>8} {'pages':>6} {'pages/s':>8} {'rows':>6} {'fetched':>7} {'reused':>6} "
+          f"{'low-res':>7} {'pending':>7} {'drain s':>7}")
+    with FixtureServer(args.max_pages * 4, latency=args.latency, images=args.images, image_pool=args.pool,
+                       image_size=size) as server, tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            for engine in ('sequential', 'async'):
+                for download in (False, True):
+                    result = run(engine, download, server, args, workdir)
+                    print(f"{engine:>10} {'download' if download else 'record':>8} {result['pages']:>6} "
+                          f"{result['pages'] / result['elapsed']:>8.2f} {result['rows']:>6} {result['fetched']:>7} "
+                          f"{result['reused']:>6} {result['downloaded']:>7} {result['pending']:>7} "
+                          f"{result['drain']:>7.2f}")
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == '__main__':
+    main()
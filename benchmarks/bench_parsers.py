@@ -0,0 +1,55 @@
+"""Parse + extract time per page for the lxml single-pass and BeautifulSoup engines.
+
+Runs both engines over every *.html file in the fixture corpus and reports the
+mean time per page and whether their outputs agree.
+
+Usage: python benchmarks/bench_parsers.py [--fixtures DIR] [--repeat 50]
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extractor import extract_page, extract_page_soup  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def time_engine(func, html, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func(html)
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--fixtures', default=FIXTURES)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    totals = {'lxml': 0.0, 'html.parser': 0.0}
+    print(f"{'fixture':<24}{'size':>9}{'lxml ms':>10}{'bs4 ms':>10}{'speedup':>9}  same output")
+    for path in sorted(glob.glob(os.path.join(args.fixtures, '*.html'))):
+        with open(path, 'rb') as f:
+            html = f.read()
+        bs_time, bs_result = time_engine(extract_page_soup, html, args.repeat)
+        try:
+            lxml_time, lxml_result = time_engine(extract_page, html, args.repeat)
+            same = 'yes' if lxml_result == bs_result else 'no'
+        except Exception as e:
+            # The crawler falls back to html.parser for these documents
+            lxml_time, same = bs_time, f"fallback ({e})"
+        totals['lxml'] += lxml_time
+        totals['html.parser'] += bs_time
+        print(f"{os.path.basename(path):<24}{len(html):>9}{lxml_time * 1000:>10.2f}{bs_time * 1000:>10.2f}"
+              f"{bs_time / lxml_time:>8.1f}x  {same}")
+    print(f"{'total':<24}{'':>9}{totals['lxml'] * 1000:>10.2f}{totals['html.parser'] * 1000:>10.2f}"
+          f"{totals['html.parser'] / totals['lxml']:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Fixed delay versus adaptive per-host rate control, against a fast and an overloaded fixture site.
+
+For each engine, crawls ``--max-pages`` pages with the session delay applied
+as-is (rate control off) and with it as the floor of the adaptive
+controller, once against an unlimited site and once against one answering
+503 beyond ``--rate-limit`` requests/sec; rate control can only back off. Reports pages/sec, the 503s the
+site sent and the delay and connection window the controller ended at.
+
+Usage: python benchmarks/bench_rate_control.py [--max-pages 50] [--delay 0.1] [--latency 0.02] [--rate-limit 3]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_engines import wait_for_session  # noqa: E402
+from crawler import WebCrawler  # noqa: E402
+from fixture_server import FixtureServer  # noqa: E402
+
+
+def run(engine, adaptive, server, args, db_dir):
+    crawler = WebCrawler(db_path=os.path.join(db_dir, f"{engine}-{adaptive}-{server.rate_limit}.db"),
+                         http_cache_dir=None, rate_control=adaptive)
+    throttled = server.throttled
+    try:
+        start = time.perf_counter()
+        session = crawler.start_crawl(server.url, args.max_pages, args.delay, engine)
+        pages = wait_for_session(crawler, session['session_id'])
+        elapsed = time.perf_counter() - start
+        rate = crawler.get_host_rates().get(crawler.get_session(session['session_id'])['domain'])
+    finally:
+        crawler.analysis.shutdown()
+        crawler.writer.close()
+    return pages, elapsed, server.throttled - throttled, rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--max-pages', type=int, default=50)
+    parser.add_argument('--delay', type=float, default=0.1)
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--rate-limit', type=float, default=3.0, help="requests/sec the overloaded site serves")
+    args = parser.parse_args()
+
+    print(f"{'site':>10} {'engine':>10} {'rate control':>12} {'pages':>6} {'pages/s':>8} {'503s':>5} "
+          f"{'final delay':>11} {'connections':>11}")
+    with tempfile.TemporaryDirectory() as db_dir:
+        cwd = os.getcwd()
+        os.chdir(db_dir)
+        try:
+            for rate_limit in (None, args.rate_limit):
+                with FixtureServer(args.max_pages * 4, latency=args.latency, rate_limit=rate_limit) as server:
+                    site = f"{rate_limit:g}/s" if rate_limit else 'unlimited'
+                    for engine in ('sequential', 'async'):
+                        for adaptive in (False, True):
+                            pages, elapsed, throttled, rate = run(engine, adaptive, server, args, db_dir)
+                            print(f"{site:>10} {engine:>10} {'on' if adaptive else 'off':>12} {pages:>6} "
+                                  f"{pages / elapsed:>8.2f} {throttled:>5} "
+                                  f"{rate['delay'] if rate else args.delay:>10.3f}s "
+                                  f"{rate['connections'] if rate else '-':>11}")
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Benchmark: FTS5 search (search.search_pages) versus a LIKE '%term%' scan of pages.content.
+
+Fills a temporary database with synthetic pages whose words follow a Zipf-like
+distribution, then times ranked top-20 queries and full match counts for
+rare, mid-frequency, common and multi-word queries.
+
+Usage: python benchmarks/bench_search.py [--pages 100000] [--words 150]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from content_store import ContentStore, init_content_store  # noqa: E402
+from search import fts_query, init_search, search_pages  # noqa: E402
+
+VOCABULARY = [f"w{i}" for i in range(20000)]
+WEIGHTS = [1.0 / (rank + 1) for rank in range(len(VOCABULARY))]
+
+
+def build(db_path, pages, words, seed=0):
+    rng = random.Random(seed)
+    conn = ContentStore(db_path).register(sqlite3.connect(db_path))
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("""
+        CREATE TABLE pages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, session_id INTEGER, url TEXT, title TEXT, content TEXT, content_hash TEXT,
+            language_detected TEXT, crawl_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    init_content_store(conn.cursor())
+    init_search(conn.cursor())
+    start = time.perf_counter()
+    for offset in range(0, pages, 1000):
+        rows = []
+        for n in range(offset, min(offset + 1000, pages)):
+            text = ' '.join(rng.choices(VOCABULARY, WEIGHTS, k=words))
+            rows.append((n % 10, f"https://example.com/{n}", f"Page {n} {text[:40]}", text, 'en'))
+        conn.executemany("INSERT INTO pages (session_id, url, title, content, language_detected) "
+                         "VALUES (?, ?, ?, ?, ?)", rows)
+        conn.execute("INSERT INTO pages_fts (rowid, title, content) "
+                     "SELECT id, title, content FROM pages WHERE id > ?", (offset,))
+        conn.commit()
+    return conn, time.perf_counter() - start
+
+
+def timed(func, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=100000)
+    parser.add_argument('--words', type=int, default=150)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'search.db')
+        conn, build_time = build(db_path, args.pages, args.words)
+        size = os.path.getsize(db_path) + os.path.getsize(db_path + '-wal')
+        print(f"Indexed {args.pages} pages x {args.words} words in {build_time:.1f}s ({size / 1e6:.0f} MB)\n")
+
+        queries = {'rare': 'w15000', 'mid': 'w800', 'common': 'w5', 'two words': 'w800 w1200'}
+        print(f"{'query':<10} {'matches':>8} {'fts top20':>10} {'like top20':>11} {'fts count':>10} {'like count':>11}")
+        for name, query in queries.items():
+            terms = query.split()
+            like_where = ' AND '.join("content LIKE ?" for _ in terms)
+            like_params = [f"%{term} %" for term in terms]
+            fts_top, _ = timed(lambda: search_pages(conn, query, limit=20))
+            like_top, _ = timed(lambda: conn.execute(
+                f"SELECT id, url, title FROM pages WHERE {like_where} LIMIT 20", like_params).fetchall())
+            fts_count, matches = timed(lambda: conn.execute(
+                "SELECT COUNT(*) FROM pages_fts WHERE pages_fts MATCH ?", (fts_query(query),)).fetchone()[0])
+            like_count, _ = timed(lambda: conn.execute(
+                f"SELECT COUNT(*) FROM pages WHERE {like_where}", like_params).fetchone()[0], repeat=1)
+            print(f"{name:<10} {matches:>8} {fts_top * 1000:>8.1f}ms {like_top * 1000:>9.1f}ms "
+                  f"{fts_count * 1000:>8.1f}ms {like_count * 1000:>9.1f}ms")
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
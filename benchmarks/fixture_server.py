@@ -0,0 +1,224 @@
+"""Local stand-in web server serving a synthetic site for crawler benchmarks.
+
+Run it on its own to point a crawler (or the web UI) at it:
+
+    python benchmarks/fixture_server.py [--pages 200] [--fanout 5] [--words 300] [--latency 0.05] [--port 8000]
+        [--rate-limit 20] [--images 4]
+"""
+import argparse
+import gzip
+import hashlib
+import random
+import struct
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = ("the crawler reads every page of the site and follows each link it finds "
+         "while measuring how long the server takes to answer a request for content "
+         "about spiders webs networks data science python language models history").split()
+
+
+def render_page(n, pages, fanout, words=300, duplicate_ratio=0.0, images=0, image_pool=20):
+    """Synthetic page ``n``; a ``duplicate_ratio`` share of pages reuse page 0's text (near-duplicates).
+
+    ``images`` <img> tags point into a pool of ``image_pool`` shared images;
+    every other one has no alt text.
+    """
+    rng = random.Random(n)
+    children = [c for c in range(n * fanout + 1, n * fanout + fanout + 1) if c < pages]
+    links = ''.join(f'<li><a href="/page/{c}">Page {c}</a></li>' for c in children)
+    if n and rng.random() < duplicate_ratio:
+        rng = random.Random(0)
+    body = ' '.join(rng.choice(WORDS) for _ in range(words))
+    figures = ''.join(f'<img src="/img/{(n + i) % image_pool}.png"' + (f' alt="Image {i}">' if i % 2 else '>')
+                      for i in range(images))
+    return (f"<html><head><title>Page {n}</title><style>p {{ color: black; }}</style></head>"
+            f"<body><nav><a href=\"/page/0\">Home</a></nav><h1>Page {n}</h1>"
+            f"<p>Page number {n}. {body}</p>{figures}<ul>{links}</ul>"
+            f"<footer>Synthetic fixture site</footer></body></html>")
+
+
+def render_png(seed, width, height):
+    """An RGB PNG of noise, which compresses poorly, so its size is close to ``width * height * 3``."""
+    rng = random.Random(seed)
+    raw = b''.join(b'\x00' + rng.randbytes(width * 3) for _ in range(height))
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(raw, 1)) + chunk(b'IEND', b''))
+
+
+def page_fails(n, error_rate):
+    """Whether page ``n`` answers with an error; the same pages fail on every request and run."""
+    return n > 0 and random.Random(n * 7919 + 17).random() < error_rate
+
+
+def render_sitemaps(pages, per_file=1000):
+    """A sitemap index and its gzipped sitemaps listing every page, keyed by path."""
+    files = {}
+    names = []
+    for i, first in enumerate(range(0, pages, per_file)):
+        urls = ''.join(f"<url><loc>/page/{n}</loc></url>" for n in range(first, min(first + per_file, pages)))
+        names.append(f"/sitemap-{i}.xml.gz")
+        files[names[-1]] = gzip.compress(
+            f'<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>'
+            .encode())
+    entries = ''.join(f"<sitemap><loc>{name}</loc></sitemap>" for name in names)
+    files['/sitemap.xml'] = (f'<?xml version="1.0"?><sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                             f'{entries}</sitemapindex>').encode()
+    return files
+
+
+class FixtureServer:
+    """Serves ``pages`` linked pages; optionally a robots.txt and a sitemap index listing every page.
+
+    ``words`` sets the page weight, ``latency`` is added to every response and
+    an ``error_rate`` share of pages answer with ``error_status``. With
+    ``rate_limit``, requests beyond that many per second (a token bucket one
+    second deep) answer 503, like an overloaded server. Pages embed ``images``
+    PNGs of ``image_size`` from a pool of ``image_pool``; files are served with
+    Range support.
+    """
+
+    def __init__(self, pages=200, fanout=5, latency=0.05, host='127.0.0.1', port=0, duplicate_ratio=0.0,
+                 robots_txt=None, sitemap=False, words=300, error_rate=0.0, error_status=500, rate_limit=None,
+                 images=0, image_pool=20, image_size=(400, 300)):
+        self.pages = pages
+        self.fanout = fanout
+        self.latency = latency
+        self.duplicate_ratio = duplicate_ratio
+        self.words = words
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rate_limit = rate_limit
+        self.images = images
+        self.image_pool = image_pool
+        self.throttled = 0
+        self._tokens, self._refilled = rate_limit or 0.0, time.monotonic()
+        self._lock = threading.Lock()
+        self.files = render_sitemaps(pages) if sitemap else {}
+        if robots_txt is not None:
+            self.files['/robots.txt'] = robots_txt.encode()
+        if images:
+            self.files.update((f"/img/{k}.png", render_png(k, *image_size)) for k in range(image_pool))
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive, so connection reuse shows up in benchmarks
+
+            def do_GET(self):
+                if server.rate_limit and not server._take_token():
+                    self.send_error(503)
+                    return
+                if server.latency:
+                    time.sleep(server.latency)
+                if self.path in server.files:
+                    payload = server.files[self.path]
+                    first, last = self._range(len(payload))
+                    self.send_response(200 if first is None else 206)
+                    self.send_header('Content-Type', 'text/plain' if self.path.endswith('.txt') else
+                                     'application/gzip' if self.path.endswith('.gz') else
+                                     'image/png' if self.path.endswith('.png') else 'application/xml')
+                    if first is not None:
+                        self.send_header('Content-Range', f"bytes {first}-{last}/{len(payload)}")
+                        payload = payload[first:last + 1]
+                    self.send_header('Content-Length', str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                    return
+                parts = self.path.strip('/').split('/')
+                if self.path == '/':
+                    parts = ['page', '0']
+                if len(parts) != 2 or parts[0] != 'page' or not parts[1].isdigit() \
+                        or int(parts[1]) >= server.pages:
+                    self.send_error(404)
+                    return
+                if page_fails(int(parts[1]), server.error_rate):
+                    self.send_error(server.error_status)
+                    return
+                payload = render_page(int(parts[1]), server.pages, server.fanout, server.words,
+                                      server.duplicate_ratio, server.images, server.image_pool).encode()
+                etag = f'"{hashlib.md5(payload).hexdigest()}"'
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _range(self, size):
+                """``(first, last)`` of a satisfiable single-range Range header, else ``(None, None)``."""
+                unit, _, spec = (self.headers.get('Range') or '').partition('=')
+                first, _, last = spec.partition('-')
+                if unit != 'bytes' or not first.isdigit() or int(first) >= size:
+                    return None, None
+                return int(first), min(int(last) if last.isdigit() else size - 1, size - 1)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def _take_token(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.rate_limit, self._tokens + (now - self._refilled) * self.rate_limit)
+            self._refilled = now
+            if self._tokens < 1:
+                self.throttled += 1
+                return False
+            self._tokens -= 1
+            return True
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--fanout', type=int, default=5)
+    parser.add_argument('--words', type=int, default=300)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--duplicate-ratio', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit', type=float, help="requests/sec served before answering 503")
+    parser.add_argument('--sitemap', action='store_true')
+    parser.add_argument('--images', type=int, default=0, help="<img> tags per page")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    args = parser.parse_args()
+
+    with FixtureServer(args.pages, args.fanout, args.latency, args.host, args.port, args.duplicate_ratio,
+                       sitemap=args.sitemap, words=args.words, error_rate=args.error_rate,
+                       rate_limit=args.rate_limit, images=args.images) as server:
+        print(f"Serving {args.pages} pages at {server.url} (Ctrl+C to stop)")
+        try:
+            server.thread.join()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
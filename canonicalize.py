@@ -0,0 +1,56 @@
+import fnmatch
+import re
+from functools import lru_cache
+from urllib.parse import unquote_plus, urlsplit, urlunsplit
+
+DEFAULT_TRACKING_PATTERNS = (
+    'utm_*', 'gclid', 'dclid', 'fbclid', 'msclkid', 'yclid', 'mc_cid', 'mc_eid', '_ga', '_hsenc', '_hsmi',
+)
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+class URLCanonicalizer:
+    """Maps equivalent URLs to one canonical string so each page is fetched once.
+
+    Rules: lowercase scheme and host, drop default ports, strip the fragment,
+    drop query parameters matching ``tracking_patterns`` (shell-style
+    wildcards), sort the remaining parameters by name without decoding
+    them (``?x``, ``/``, ``+`` and ``%20`` keep their bytes) and, optionally, strip a
+    trailing slash from non-root paths. That last rule is off by default:
+    canonical URLs are what gets fetched, and /docs/ and /docs are often
+    different resources (relative links resolve differently). Results are
+    memoized in a bounded LRU cache of ``cache_size`` entries.
+    """
+
+    def __init__(self, tracking_patterns=DEFAULT_TRACKING_PATTERNS, cache_size=65536, strip_trailing_slash=False):
+        self.tracking_patterns = tuple(tracking_patterns)
+        self.strip_trailing_slash = strip_trailing_slash
+        self._tracking = re.compile('|'.join(fnmatch.translate(p) for p in self.tracking_patterns) or r'(?!)')
+        self.canonicalize = lru_cache(maxsize=cache_size)(self._canonicalize)
+
+    def _canonicalize(self, url):
+        parts = urlsplit(url.strip())
+        scheme = parts.scheme.lower()
+        host = parts.hostname or ''
+        if ':' in host:
+            host = f"[{host}]"
+        try:
+            port = parts.port
+        except ValueError:
+            port = None
+        netloc = host
+        if parts.username is not None:
+            userinfo = parts.username if parts.password is None else f"{parts.username}:{parts.password}"
+            netloc = f"{userinfo}@{netloc}"
+        if port is not None and port != DEFAULT_PORTS.get(scheme):
+            netloc = f"{netloc}:{port}"
+
+        path = parts.path or '/'
+        if self.strip_trailing_slash and len(path) > 1 and path.endswith('/'):
+            path = path.rstrip('/') or '/'
+
+        # Raw k=v pieces; only the tracking match looks at decoded names. Repeated names keep their order
+        params = [piece for piece in parts.query.split('&')
+                  if piece and not self._tracking.fullmatch(unquote_plus(piece.partition('=')[0]))]
+        query = '&'.join(sorted(params, key=lambda piece: piece.partition('=')[0]))
+        return urlunsplit((scheme, netloc, path, query, ''))
@@ -0,0 +1,238 @@
+"""Compressed, content-addressed storage for cleaned page text.
+
+Page text lives in ``content_blobs`` keyed by ``content_hash``, so identical
+bodies are stored once across sessions, compressed with zlib primed with a
+preset dictionary trained on earlier pages (``content_dicts``). ``pages``
+keeps only metadata and text is decompressed on demand. Run this module to
+move the inline ``pages.content`` of an existing database into the store:
+
+    python content_store.py [database/crawler.db]
+"""
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from collections import Counter
+
+from search import init_search
+
+DICTIONARY_SIZE = 32 * 1024  # zlib's window; dictionary bytes beyond it are never referenced
+
+
+def init_content_store(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS content_dicts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            data BLOB NOT NULL,
+            created_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS content_blobs (
+            content_hash TEXT PRIMARY KEY,
+            dict_id INTEGER,
+            size INTEGER,
+            data BLOB NOT NULL,
+            FOREIGN KEY (dict_id) REFERENCES content_dicts (id)
+        )
+    """)
+
+
+def train_dictionary(samples, size=DICTIONARY_SIZE):
+    """Build a zlib preset dictionary from the word n-grams shared by the most samples.
+
+    N-grams are scored by document frequency times length and the best ones are
+    placed last, since zlib reaches the end of the dictionary with the
+    shortest distances.
+    """
+    frequency = Counter()
+    for text in samples:
+        words = text.split()
+        grams = set()
+        for n in (2, 3, 4, 6):
+            grams.update(' '.join(words[i:i + n]) for i in range(0, len(words) - n + 1))
+        frequency.update(grams)
+    chosen, total = [], 0
+    for gram, count in sorted(frequency.items(), key=lambda item: item[1] * len(item[0]), reverse=True):
+        if count < 2:
+            break
+        if total + len(gram) + 1 > size:
+            continue
+        chosen.append(gram)
+        total += len(gram) + 1
+    return ' '.join(reversed(chosen)).encode('utf-8')
+
+
+class ContentStore:
+    """Compresses page text for the database writer and decompresses it for readers.
+
+    Until a dictionary exists, blobs are compressed without one while the first
+    ``train_after`` texts are sampled; the trained dictionary is stored in
+    ``content_dicts`` and used for every later blob.
+    """
+
+    def __init__(self, db_path, level=6, train_after=200):
+        self.db_path = db_path
+        self.level = level
+        self.train_after = train_after
+        self._dictionaries = {}
+        self._current = None
+        self._samples = []
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def _load(self, conn=None):
+        own = conn is None
+        conn = conn or sqlite3.connect(self.db_path)
+        try:
+            rows = conn.execute("SELECT id, data FROM content_dicts ORDER BY id").fetchall()
+        finally:
+            if own:
+                conn.close()
+        with self._lock:
+            self._dictionaries.update({dict_id: bytes(data) for dict_id, data in rows})
+            if rows:
+                self._current = rows[-1][0]
+            self._loaded = True
+
+    def reset(self):
+        """Forget dictionaries and samples after a rollback, which may have discarded the newest dictionary."""
+        with self._lock:
+            self._dictionaries = {}
+            self._current = None
+            self._samples = []
+            self._loaded = False
+
+    def _dictionary(self, dict_id):
+        if dict_id is None:
+            return None
+        if dict_id not in self._dictionaries:
+            self._load()
+        return self._dictionaries[dict_id]
+
+    def compress(self, text, dict_id=None):
+        data = text.encode('utf-8')
+        dictionary = self._dictionary(dict_id)
+        compressor = zlib.compressobj(self.level, zdict=dictionary) if dictionary else zlib.compressobj(self.level)
+        return compressor.compress(data) + compressor.flush()
+
+    def decompress(self, dict_id, data):
+        dictionary = self._dictionary(dict_id)
+        decompressor = zlib.decompressobj(zdict=dictionary) if dictionary else zlib.decompressobj()
+        return (decompressor.decompress(data) + decompressor.flush()).decode('utf-8')
+
+    def put(self, cursor, content_hash, text):
+        """Store ``text`` under ``content_hash`` unless it is already there (writer thread only)."""
+        if cursor.execute("SELECT 1 FROM content_blobs WHERE content_hash = ?", (content_hash,)).fetchone():
+            return
+        if not self._loaded:
+            self._load(cursor.connection)
+        if self._current is None:
+            self._samples.append(text)
+            if len(self._samples) >= self.train_after:
+                self.add_dictionary(cursor, train_dictionary(self._samples))
+                self._samples = []
+        cursor.execute("INSERT INTO content_blobs (content_hash, dict_id, size, data) VALUES (?, ?, ?, ?)",
+                       (content_hash, self._current, len(text), self.compress(text, self._current)))
+
+    def add_dictionary(self, cursor, dictionary):
+        cursor.execute("INSERT INTO content_dicts (data) VALUES (?)", (dictionary,))
+        with self._lock:
+            self._dictionaries[cursor.lastrowid] = dictionary
+            self._current = cursor.lastrowid
+        return cursor.lastrowid
+
+    def get_many(self, conn, content_hashes):
+        """Decompressed text for each stored hash in ``content_hashes``."""
+        hashes = list(set(h for h in content_hashes if h))
+        texts = {}
+        for i in range(0, len(hashes), 500):
+            chunk = hashes[i:i + 500]
+            for content_hash, dict_id, data in conn.execute(
+                    f"SELECT content_hash, dict_id, data FROM content_blobs "
+                    f"WHERE content_hash IN ({', '.join('?' * len(chunk))})", chunk):
+                texts[content_hash] = self.decompress(dict_id, data)
+        return texts
+
+    def fill(self, conn, rows):
+        """Set ``content`` on row dicts that have a ``content_hash`` but no inline text."""
+        missing = [row['content_hash'] for row in rows if row.get('content') is None and row.get('content_hash')]
+        if not missing:
+            return rows
+        texts = self.get_many(conn, missing)
+        for row in rows:
+            if row.get('content') is None and row.get('content_hash'):
+                row['content'] = texts.get(row['content_hash'])
+        return rows
+
+    def register(self, conn):
+        """Expose ``page_content(dict_id, data)`` to SQL on ``conn`` (used by the pages_text view)."""
+        conn.create_function('page_content', 2,
+                             lambda dict_id, data: None if data is None else self.decompress(dict_id, data),
+                             deterministic=True)
+        return conn
+
+
+def _database_size(conn):
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    return conn.execute("PRAGMA page_count").fetchone()[0] * page_size
+
+
+def _time_queries(conn):
+    timings = {}
+    for name, sql in (('SELECT * FROM pages', "SELECT * FROM pages"),
+                      ('metadata scan', "SELECT id, url, title, status_code, word_count FROM pages")):
+        start = time.perf_counter()
+        conn.execute(sql).fetchall()
+        timings[name] = time.perf_counter() - start
+    return timings
+
+
+def migrate(db_path, batch_size=500):
+    """Move inline pages.content into the store, then VACUUM; print size and query times before and after."""
+    store = ContentStore(db_path)
+    conn = store.register(sqlite3.connect(db_path))
+    cursor = conn.cursor()
+    init_content_store(cursor)
+    before_size, before_times = _database_size(conn), _time_queries(conn)
+
+    init_search(cursor)
+    ids = [row[0] for row in cursor.execute("SELECT id FROM pages WHERE content IS NOT NULL")]
+    store._load(conn)
+    if store._current is None and ids:
+        samples = [row[0] for row in cursor.execute(
+            "SELECT content FROM pages WHERE content IS NOT NULL ORDER BY random() LIMIT 1000")]
+        store.add_dictionary(cursor, train_dictionary(samples))
+    for i in range(0, len(ids), batch_size):
+        chunk = ids[i:i + batch_size]
+        placeholders = ', '.join('?' * len(chunk))
+        for page_id, content_hash, text in cursor.execute(
+                f"SELECT id, content_hash, content FROM pages WHERE id IN ({placeholders})", chunk).fetchall():
+            if not content_hash:
+                continue
+            store.put(cursor, content_hash, text)
+        cursor.execute(f"UPDATE pages SET content = NULL WHERE id IN ({placeholders}) AND content_hash IS NOT NULL",
+                       chunk)
+        conn.commit()
+    # VACUUM cannot run inside a transaction; with no inline bodies the init/dictionary writes are still open
+    conn.commit()
+    conn.execute("VACUUM")
+    after_size, after_times = _database_size(conn), _time_queries(conn)
+    conn.close()
+
+    print(f"Moved {len(ids)} page bodies into content_blobs")
+    print(f"Database size: {before_size / 1e6:.1f} MB -> {after_size / 1e6:.1f} MB")
+    for name in before_times:
+        print(f"{name}: {before_times[name] * 1000:.1f} ms -> {after_times[name] * 1000:.1f} ms")
+
+
+def main(db_path="database/crawler.db"):
+    if not os.path.exists(db_path):
+        sys.exit(f"No database at {db_path}")
+    migrate(db_path)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:2])
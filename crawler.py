@@ -1,230 +1,689 @@
-import requests
-from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
+import argparse
 import time
 import sqlite3
-import json
 from datetime import datetime
-import re
-from collections import deque
-import threading
 import os
-import hashlib
-from langdetect import detect
-from textstat import flesch_reading_ease
+import threading
+from contextlib import nullcontext
+from functools import partial
+from collections import OrderedDict
+from async_engine import AsyncCrawlEngine
+from db_writer import DatabaseWriter
+from frontier import Frontier, make_seen_set
+from canonicalize import DEFAULT_TRACKING_PATTERNS, URLCanonicalizer
+from extractor import count_media, extract_links, extract_media, parse_page, resolve_base
+from analysis import AnalysisPool
+from http_cache import HttpCache
+from exporter import EXPORT_FORMATS, gzip_chunks, iter_export
+from events import EventBus
+from stats import StatsCache, init_stats
+from search import init_search, search_pages
+from content_store import ContentStore, init_content_store
+from transport import HttpTransport
+from scheduler import CrawlScheduler
+from simhash import SimHashIndex, from_signed, to_signed
+from robots import RobotsCache
+from sitemap import iter_sitemap_urls
+from metrics import PROFILE_MODES, StageMetrics, profile_session, render_values
+from stats import COUNTERS
+from link_graph import analyze_session, init_link_graph
+from distributed import DistributedCoordinator, init_shared_frontier
+from rate_control import HostRateController, is_overload
+from media import MEDIA_FIELDS, MediaPipeline, init_media
+
+ENGINES = ('sequential', 'async', 'distributed')
+
+
+def init_database(cursor):
+    """Create or migrate every table the crawler uses, on a connection with ``page_content`` registered.
+
+    Also brings databases created by database_schema.py or older versions up
+    to date; the caller commits.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS crawl_sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            start_url TEXT NOT NULL,
+            max_pages INTEGER,
+            delay REAL,
+            domain TEXT,
+            session_name TEXT,
+            start_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            end_time TIMESTAMP,
+            status TEXT DEFAULT 'running',
+            total_pages INTEGER DEFAULT 0,
+            engine TEXT DEFAULT 'sequential',
+            incremental BOOLEAN DEFAULT 0
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS pages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id INTEGER,
+            url TEXT NOT NULL,
+            canonical_url TEXT,
+            title TEXT,
+            content TEXT,
+            status_code INTEGER,
+            response_time REAL,
+            word_count INTEGER,
+            language_detected TEXT,
+            readability_score REAL,
+            content_hash TEXT,
+            simhash INTEGER,
+            etag TEXT,
+            last_modified TEXT,
+            cache_control TEXT,
+            crawl_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (session_id) REFERENCES crawl_sessions (id)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS seo_analysis (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            page_id INTEGER,
+            session_id INTEGER,
+            title_length INTEGER,
+            meta_desc_length INTEGER,
+            h1_count INTEGER,
+            missing_alt_images INTEGER,
+            broken_links INTEGER,
+            duplicate_content BOOLEAN DEFAULT 0,
+            mobile_friendly BOOLEAN DEFAULT 1,
+            page_speed_score REAL,
+            seo_score REAL,
+            recommendations TEXT,
+            FOREIGN KEY (page_id) REFERENCES pages (id),
+            FOREIGN KEY (session_id) REFERENCES crawl_sessions (id)
+        )
+    """)
+    # Checkpointed frontier: every URL a session has enqueued, flagged once it has been processed
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS crawl_frontier (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id INTEGER NOT NULL,
+            url TEXT NOT NULL,
+            done BOOLEAN DEFAULT 0,
+            UNIQUE (session_id, url),
+            FOREIGN KEY (session_id) REFERENCES crawl_sessions (id)
+        )
+    """)
+    # Databases created by database_schema.py or older versions may lack these columns
+    _ensure_columns(cursor, 'crawl_sessions', {
+        'engine': "TEXT DEFAULT 'sequential'", 'incremental': 'BOOLEAN DEFAULT 0',
+    })
+    _ensure_columns(cursor, 'pages', {
+        'canonical_url': 'TEXT', 'etag': 'TEXT', 'last_modified': 'TEXT', 'cache_control': 'TEXT',
+        'simhash': 'INTEGER', 'image_count': 'INTEGER DEFAULT 0', 'video_count': 'INTEGER DEFAULT 0',
+        'audio_count': 'INTEGER DEFAULT 0',
+    })
+    if cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'links'").fetchone():
+        # An old links table, migrated into the link graph tables by init_link_graph
+        _ensure_columns(cursor, 'links', {'session_id': 'INTEGER', 'canonical_url': 'TEXT'})
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_pages_canonical_url ON pages(canonical_url)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_pages_session_id_id ON pages(session_id, id)")
+    init_link_graph(cursor)
+    init_shared_frontier(cursor)
+    init_media(cursor)
+    init_stats(cursor)
+    init_content_store(cursor)
+    init_search(cursor)
+
+
+def _ensure_columns(cursor, table, columns):
+    existing = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+    for name, column_type in columns.items():
+        if name not in existing:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}")
+
 
 class WebCrawler:
-    def __init__(self, db_path="database/crawler.db"):
+    def __init__(self, db_path="database/crawler.db", frontier_mode='bloom',
+                 frontier_capacity=1_000_000, frontier_error_rate=0.001,
+                 tracking_params=DEFAULT_TRACKING_PATTERNS, parser='lxml', analysis_workers=None,
+                 http_cache_dir="cache/http", http_cache_max_bytes=256 * 1024 * 1024,
+                 max_sessions=2, max_fetches=8, near_duplicate_distance=3, expand_near_duplicates=False,
+                 simhash_cache_size=8,
+                 transport=None, respect_robots=True, robots_ttl=3600.0, use_sitemaps=True, sitemap_limit=10000,
+                 profile=None, profile_dir="profiles", distributed_partitions=64, lease_timeout=60.0,
+                 rate_control=True, min_delay=0.05, max_delay=30.0, max_host_connections=4,
+                 download_media=True, media_dir="media", media_workers=2, thumbnail_size=(320, 320)):
+        if parser not in ('lxml', 'html.parser'):
+            raise ValueError(f"Unknown parser: {parser}")
         self.db_path = db_path
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        })
+        self.parser = parser
+        self.analysis = AnalysisPool(analysis_workers)
+        self.events = EventBus()
+        self.http_cache = HttpCache(http_cache_dir, http_cache_max_bytes) if http_cache_dir else None
+        self.canonicalizer = URLCanonicalizer(tracking_params)
+        self.frontier_mode = frontier_mode
+        self.frontier_capacity = frontier_capacity
+        self.frontier_error_rate = frontier_error_rate
+        # SimHash indexes of the most recently crawled domains, loaded from stored pages on first use;
+        # a near_duplicate_distance of None disables the check
+        self.near_duplicate_distance = near_duplicate_distance
+        self.expand_near_duplicates = expand_near_duplicates
+        self.simhash_cache_size = simhash_cache_size
+        self._simhash_indexes = OrderedDict()
+        self._simhash_lock = threading.Lock()
+        # Link graph reports per session, reused until the session's counters change
+        self._graph_cache = OrderedDict()
+        self._graph_lock = threading.Lock()
+        # Pool sizes, retries, timeouts and the body size cap are configured on the transport
+        self.transport = transport or HttpTransport()
+        # robots.txt rules per host (None ignores robots.txt); sitemaps seed new sessions' frontiers
+        self.robots = RobotsCache(self.transport, ttl=robots_ttl) if respect_robots else None
+        self.use_sitemaps = use_sitemaps
+        self.sitemap_limit = sitemap_limit
+        # Per-host delay and connections adapted between these bounds (None keeps each session's fixed delay)
+        self.rate_control = HostRateController(min_delay, max_delay, max_host_connections) if rate_control else None
+        # Stage latency histograms for /metrics; profile ('cprofile' or 'sampling') dumps one profile per session
+        self.metrics = StageMetrics()
+        self.profile = profile
+        self.profile_dir = profile_dir
 
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
         os.makedirs("exports", exist_ok=True)
+        self.content_store = ContentStore(self.db_path)
         self._init_database()
+        self.writer = DatabaseWriter(self.db_path, content_store=self.content_store, metrics=self.metrics)
+        self.stats = StatsCache(self.db_path)
+        self.scheduler = CrawlScheduler(max_sessions, max_fetches)
+        # Hands the frontier of 'distributed' sessions out to worker processes (see distributed.py)
+        self.coordinator = DistributedCoordinator(self, distributed_partitions, lease_timeout)
+        # Probes referenced media and keeps low-res copies on its own threads and connections (None records only)
+        self.media = MediaPipeline(
+            self.writer, HttpTransport(pool_maxsize=media_workers, retries=1,
+                                       user_agent=self.transport.session.headers['User-Agent']),
+            allowed=self._allowed, metrics=self.metrics, workers=media_workers, media_dir=media_dir,
+            thumbnail_size=thumbnail_size) if download_media else None
 
     def _init_database(self):
-        conn = sqlite3.connect(self.db_path)
+        conn = self.content_store.register(sqlite3.connect(self.db_path))
+        conn.execute("PRAGMA journal_mode=WAL")
         cursor = conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS crawl_sessions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                start_url TEXT NOT NULL,
-                max_pages INTEGER,
-                delay REAL,
-                domain TEXT,
-                session_name TEXT,
-                start_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                end_time TIMESTAMP,
-                status TEXT DEFAULT 'running',
-                total_pages INTEGER DEFAULT 0
-            )
-        """)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS pages (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                session_id INTEGER,
-                url TEXT NOT NULL,
-                title TEXT,
-                content TEXT,
-                status_code INTEGER,
-                response_time REAL,
-                word_count INTEGER,
-                language_detected TEXT,
-                readability_score REAL,
-                content_hash TEXT,
-                crawl_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (session_id) REFERENCES crawl_sessions (id)
-            )
-        """)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS links (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                page_id INTEGER,
-                session_id INTEGER,
-                url TEXT NOT NULL,
-                text TEXT,
-                is_internal BOOLEAN,
-                link_type TEXT,
-                FOREIGN KEY (page_id) REFERENCES pages (id),
-                FOREIGN KEY (session_id) REFERENCES crawl_sessions (id)
-            )
-        """)
+        init_database(cursor)
+        # No crawl survives a restart; sessions left running or queued by a previous process can be resumed
+        cursor.execute("UPDATE crawl_sessions SET status = 'interrupted' WHERE status IN ('running', 'queued')")
         conn.commit()
         conn.close()
 
-    def start_crawl(self, start_url, max_pages=20, delay=3.0):
-        max_pages = min(max_pages, 50)
+    def start_crawl(self, start_url, max_pages=20, delay=3.0, engine='sequential', incremental=False, priority=0):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown crawl engine: {engine}")
+        if engine == 'distributed' and incremental:
+            raise ValueError("Incremental crawls are not supported by the distributed engine")
+        if engine != 'distributed':
+            # Bigger crawls are meant to be spread over distributed workers
+            max_pages = min(max_pages, 50)
         delay = min(delay, 5.0)
+        start_url = self.canonicalizer.canonicalize(start_url)
         domain = urlparse(start_url).netloc
         session_name = f"{domain}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
 
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         cursor.execute("""
-            INSERT INTO crawl_sessions (start_url, max_pages, delay, domain, session_name)
-            VALUES (?, ?, ?, ?, ?)
-        """, (start_url, max_pages, delay, domain, session_name))
+            INSERT INTO crawl_sessions (start_url, max_pages, delay, domain, session_name, engine, incremental,
+                                        status)
+            VALUES (?, ?, ?, ?, ?, ?, ?, 'queued')
+        """, (start_url, max_pages, delay, domain, session_name, engine, incremental))
         session_id = cursor.lastrowid
+        cursor.execute("UPDATE crawl_stats SET value = value + 1 WHERE name = 'total_sessions'")
         conn.commit()
         conn.close()
 
-        thread = threading.Thread(target=self._crawl_worker, args=(session_id, start_url, max_pages, delay))
-        thread.daemon = True
-        thread.start()
-        return {'success': True, 'session_id': session_id, 'session_name': session_name}
+        position = self.scheduler.submit(
+            session_id, partial(self._run_session, engine, session_id, start_url, max_pages, delay, incremental),
+            priority)
+        self.events.publish('queued', session_id, start_url=start_url, queue_position=position)
+        return {'success': True, 'session_id': session_id, 'session_name': session_name,
+                'queue_position': position}
+
+    def resume_crawl(self, session_id, priority=0):
+        """Queue an interrupted or paused session to continue from its checkpointed frontier.
+
+        Returns None if the session does not exist and raises ValueError if it
+        cannot be resumed.
+        """
+        session = self.get_session(session_id)
+        if not session:
+            return None
+        if not self._set_status(session_id, 'queued', ('interrupted', 'paused')):
+            raise ValueError(f"Session {session_id} is {session['status']}, not interrupted or paused")
+
+        position = self.scheduler.submit(
+            session_id, partial(self._run_session, session['engine'] or 'sequential', session_id,
+                                session['start_url'], session['max_pages'], session['delay'],
+                                bool(session['incremental']), resume=True),
+            priority)
+        self.events.publish('queued', session_id, start_url=session['start_url'], queue_position=position)
+        return {'success': True, 'session_id': session_id, 'queue_position': position}
+
+    def cancel_crawl(self, session_id):
+        """Cancel a queued, running, paused or interrupted session; None if it does not exist."""
+        return self._stop_crawl(session_id, 'cancelled', ('paused', 'interrupted'))
+
+    def pause_crawl(self, session_id):
+        """Pause a queued or running session, keeping its checkpoint for resume_crawl."""
+        return self._stop_crawl(session_id, 'paused')
+
+    def _stop_crawl(self, session_id, status, idle_statuses=()):
+        session = self.get_session(session_id)
+        if not session:
+            return None
+        found = self.scheduler.stop(session_id, status)
+        if found == 'queued' or (found is None and session['status'] in idle_statuses):
+            self._complete_session(session_id, None, status)
+        elif found is None:
+            raise ValueError(f"Session {session_id} is {session['status']} and cannot be {status}")
+        # A running session stops at its next page and then reports the new status
+        return {'success': True, 'session_id': session_id, 'status': status if found != 'running' else 'stopping'}
+
+    def _set_status(self, session_id, status, from_statuses):
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            UPDATE crawl_sessions SET status = ?, end_time = NULL
+            WHERE id = ? AND status IN ({', '.join('?' * len(from_statuses))})
+        """, (status, session_id, *from_statuses))
+        conn.commit()
+        conn.close()
+        return cursor.rowcount > 0
+
+    def _run_session(self, engine, session_id, start_url, max_pages, delay, incremental, resume=False):
+        """Scheduler job: run one session to completion on the calling worker thread."""
+        self._set_status(session_id, 'running', ('queued',))
+        checkpoint = self._load_checkpoint(session_id, start_url) if resume else None
+        self.events.publish('started', session_id, start_url=start_url, max_pages=max_pages, resumed=resume,
+                            pages_crawled=checkpoint['pages_crawled'] if checkpoint else 0)
+        if engine == 'distributed':
+            target = self.coordinator.run
+        else:
+            target = AsyncCrawlEngine(self).run if engine == 'async' else self._crawl_worker
+        profiler = profile_session(self.profile, self.profile_dir, session_id) if self.profile else nullcontext()
+        try:
+            with profiler:
+                target(session_id, start_url, max_pages, delay, incremental, checkpoint)
+        except Exception as e:
+            print(f"Crawl session {session_id} failed: {e}")
+            self._complete_session(session_id, None, 'error')
 
-    def _crawl_worker(self, session_id, start_url, max_pages, delay):
-        visited = set()
-        to_visit = deque([start_url])
-        pages_crawled = 0
-        content_hashes = set()
+    def _load_checkpoint(self, session_id, start_url):
+        """Frontier, seen URLs and content hashes of a session as last committed by the writer."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("SELECT url, done FROM crawl_frontier WHERE session_id = ? ORDER BY id", (session_id,))
+        rows = cursor.fetchall()
+        cursor.execute("SELECT content_hash FROM pages WHERE session_id = ?", (session_id,))
+        content_hashes = {row[0] for row in cursor.fetchall()}
+        conn.close()
+        if not rows:
+            # Interrupted before the first checkpoint was committed
+            rows = [(start_url, 0)]
+        return {
+            'seen': [url for url, done in rows if done],
+            'pending': [url for url, done in rows if not done],
+            'content_hashes': content_hashes,
+            'pages_crawled': len(content_hashes),
+        }
+
+    def _crawl_worker(self, session_id, start_url, max_pages, delay, incremental=False, checkpoint=None):
+        frontier = Frontier(self._new_seen_set())
+        if checkpoint:
+            frontier.restore(checkpoint['seen'], checkpoint['pending'])
+            pages_crawled = checkpoint['pages_crawled']
+            content_hashes = set(checkpoint['content_hashes'])
+        else:
+            added = [url for url in [start_url] + self._sitemap_seeds(start_url) if frontier.add(url)]
+            self._checkpoint(session_id, added=added)
+            pages_crawled = 0
+            content_hashes = set()
         base_domain = urlparse(start_url).netloc
+        previous_pages = self._load_previous_pages(session_id, base_domain) if incremental else None
 
-        while to_visit and pages_crawled < max_pages:
-            current_url = to_visit.popleft()
-            if current_url in visited:
+        while frontier and pages_crawled < max_pages and not self.scheduler.stop_status(session_id):
+            current_url = frontier.pop()
+            if not self._allowed(current_url):
+                print(f"Disallowed by robots.txt: {current_url}")
+                self._checkpoint(session_id, current_url)
                 continue
-            visited.add(current_url)
 
             print(f"Crawling: {current_url}")
-            page_data = self._crawl_page(session_id, current_url, content_hashes)
+            page_data = self._crawl_page(session_id, current_url, content_hashes, previous_pages)
 
+            added = []
             if page_data:
                 pages_crawled += 1
-                links = self._extract_links(page_data['soup'], current_url, base_domain)
-                self._save_links(session_id, page_data['page_id'], links)
+                links = self._store_page(page_data, current_url, base_domain)
 
                 for link in links:
-                    if link['is_internal'] and link['url'] not in visited and link['url'] not in to_visit:
-                        to_visit.append(link['url'])
+                    if link['is_internal'] and frontier.add(link['canonical_url']):
+                        added.append(link['canonical_url'])
+            self._checkpoint(session_id, current_url, added)
 
-            self._update_session_progress(session_id, pages_crawled)
-            print(f"Pages Crawled: {pages_crawled}/{max_pages} | Queue: {len(to_visit)}")
-            time.sleep(delay)
+            self._update_session_progress(session_id, pages_crawled, len(frontier))
+            print(f"Pages Crawled: {pages_crawled}/{max_pages} | Queue: {len(frontier)}")
+            time.sleep(self._host_delay(current_url, delay))
 
-        self._complete_session(session_id, pages_crawled)
-        print(f"Session complete: {pages_crawled} pages crawled.")
+        status = self._complete_session(session_id, pages_crawled)
+        print(f"Session {status}: {pages_crawled} pages crawled.")
 
-    def _crawl_page(self, session_id, url, content_hashes):
-        try:
-            start = time.time()
-            response = self.session.get(url, timeout=10)
-            response_time = time.time() - start
-            if response.status_code != 200:
-                return None
-            soup = BeautifulSoup(response.content, 'html.parser')
-            title = soup.title.string.strip() if soup.title else 'No Title'
-            content = self._extract_clean_content(soup)
-            content_hash = hashlib.md5(content.encode()).hexdigest()
-            if content_hash in content_hashes:
-                return None
-            content_hashes.add(content_hash)
+    def _allowed(self, url):
+        return self.robots is None or self.robots.allowed(url)
 
-            word_count = len(content.split())
-            try:
-                language = detect(content) if len(content) > 50 else 'unknown'
-            except:
-                language = 'unknown'
-            try:
-                readability = flesch_reading_ease(content)
-            except:
-                readability = 0
-
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO pages (session_id, url, title, content, status_code, response_time,
-                                   word_count, language_detected, readability_score, content_hash)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (session_id, url, title, content, response.status_code, response_time,
-                  word_count, language, readability, content_hash))
-            page_id = cursor.lastrowid
-            conn.commit()
-            conn.close()
+    def _host_delay(self, url, delay):
+        """Seconds to wait between requests to ``url``'s host, never below its robots.txt Crawl-delay.
 
-            return {'page_id': page_id, 'soup': soup}
-        except Exception as e:
-            print(f"Failed to crawl {url}: {e}")
-            return None
+        With rate control the host's adaptive delay is used, which never
+        drops below the session's ``delay``; otherwise ``delay`` itself.
+        """
+        if self.rate_control:
+            delay = self.rate_control.delay(urlparse(url).netloc, delay)
+        crawl_delay = self.robots.crawl_delay(url) if self.robots else None
+        return max(delay, crawl_delay or 0.0)
 
-    def _extract_clean_content(self, soup):
-        for tag in soup(["script", "style", "nav", "footer", "header"]):
-            tag.decompose()
-        return re.sub(r'\s+', ' ', soup.get_text()).strip()
+    def _host_connections(self, url, limit):
+        """Concurrent requests allowed to ``url``'s host, at most ``limit``."""
+        if self.rate_control:
+            return min(limit, self.rate_control.connections(urlparse(url).netloc))
+        return limit
 
-    def _extract_links(self, soup, base_url, domain):
-        links = []
-        for tag in soup.find_all('a', href=True):
-            href = urljoin(base_url, tag['href'])  # Normalize relative links
-            parsed = urlparse(href)
+    def _sitemap_seeds(self, start_url):
+        """Allowed same-host page URLs from the sitemaps robots.txt lists, or /sitemap.xml.
 
-            # Only allow http(s) links
-            if parsed.scheme not in ['http', 'https']:
+        Seeding these ahead of link discovery spends max_pages on content pages
+        rather than on the navigation pages that lead to them.
+        """
+        if not self.use_sitemaps:
+            return []
+        parsed = urlparse(start_url)
+        sitemaps = (self.robots.sitemaps(start_url) if self.robots else None) or \
+            [f"{parsed.scheme}://{parsed.netloc}/sitemap.xml"]
+        seeds, seen = [], {start_url}
+        for loc in iter_sitemap_urls(self.transport, sitemaps, max_urls=self.sitemap_limit):
+            url = self.canonicalizer.canonicalize(urljoin(start_url, loc))
+            if urlparse(url).netloc != parsed.netloc or url in seen or not self._allowed(url):
                 continue
+            seen.add(url)
+            seeds.append(url)
+        if seeds:
+            print(f"Seeded {len(seeds)} URLs from sitemaps of {parsed.netloc}")
+        return seeds
 
-            # Determine if link is internal
-            netloc = parsed.netloc
-            is_internal = (netloc == '' or netloc == domain)
+    def _new_seen_set(self):
+        return make_seen_set(self.frontier_mode, self.frontier_capacity, self.frontier_error_rate)
 
-            links.append({
-                'url': href,
-                'text': tag.get_text(strip=True)[:200],
-                'is_internal': is_internal,
-                'link_type': 'internal' if is_internal else 'external'
-            })
+    def _crawl_page(self, session_id, url, content_hashes, previous_pages=None):
+        try:
+            response, response_time = self._fetch(url, self._validators(url, previous_pages), session_id)
+            if response.status_code not in (200, 304):
+                self._report_error(session_id, url, f"HTTP {response.status_code}")
+            if response.status_code == 304:
+                return self._not_modified(session_id, url, response, response_time, content_hashes, previous_pages)
+            return self._process_response(session_id, url, response, response_time, content_hashes)
+        except Exception as e:
+            self._report_error(session_id, url, e)
+            return None
 
-        return links
+    def _report_error(self, session_id, url, error):
+        print(f"Failed to crawl {url}: {error}")
+        self.writer.record_error(session_id, url, str(error))
+        self.events.publish('error', session_id, url=url, error=str(error))
+
+    def _fetch(self, url, validators=None, session_id=None):
+        headers = {}
+        if validators:
+            if validators.get('etag'):
+                headers['If-None-Match'] = validators['etag']
+            if validators.get('last_modified'):
+                headers['If-Modified-Since'] = validators['last_modified']
+        host = urlparse(url).netloc
+        with self.scheduler.limiter.slot(session_id):
+            start = time.time()
+            try:
+                response = self.transport.get(url, headers=headers)
+            except Exception as e:
+                if self.rate_control:
+                    self.rate_control.observe(host, overloaded=is_overload(error=e))
+                raise
+            response_time = time.time() - start
+        if self.rate_control:
+            self.rate_control.observe(host, response_time, response.status_code, overloaded=response.retries > 0)
+        self.metrics.observe('fetch', response_time, session_id, host)
+        for stage, seconds in response.timings.items():
+            if stage != 'connect' or seconds:
+                self.metrics.observe(stage, seconds, session_id, host)
+        return response, response_time
 
-    def _save_links(self, session_id, page_id, links):
+    def _load_previous_pages(self, session_id, domain):
+        """Latest stored page per canonical URL from earlier sessions of the same domain."""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
-        for link in links:
-            cursor.execute("""
-                INSERT INTO links (page_id, session_id, url, text, is_internal, link_type)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (page_id, session_id, link['url'], link['text'], link['is_internal'], link['link_type']))
-        conn.commit()
+        cursor.execute("""
+            SELECT p.canonical_url, MAX(p.id), p.etag, p.last_modified
+            FROM pages p JOIN crawl_sessions s ON s.id = p.session_id
+            WHERE s.domain = ? AND p.session_id != ? AND p.canonical_url IS NOT NULL
+            GROUP BY p.canonical_url
+        """, (domain, session_id))
+        previous = {row[0]: {'id': row[1], 'etag': row[2], 'last_modified': row[3]} for row in cursor.fetchall()}
         conn.close()
+        return previous
+
+    def _validators(self, url, previous_pages):
+        if previous_pages is None:
+            return None
+        previous = previous_pages.get(url)
+        if previous and (previous['etag'] or previous['last_modified']):
+            return previous
+        cached = self.http_cache.get_headers(url) if self.http_cache else None
+        if cached:
+            return {'etag': cached.get('ETag'), 'last_modified': cached.get('Last-Modified')}
+        return None
+
+    def _not_modified(self, session_id, url, response, response_time, content_hashes, previous_pages):
+        """Handle a 304: carry the stored page and links forward, or rebuild the page from the HTTP cache."""
+        previous = previous_pages.get(url) if previous_pages else None
+        if previous and (previous['etag'] or previous['last_modified']):
+            return self._carry_forward(session_id, previous['id'], response_time, content_hashes)
+        cached = self.http_cache.get(url) if self.http_cache else None
+        if not cached:
+            return None
+        headers, body = cached
+        parsed = self._parse(body, headers.get('Content-Type'))
+        analysis = self.analysis.analyze(parsed['content'])
+        page_data = self._build_page(session_id, url, response, response_time, parsed, analysis, content_hashes)
+        if page_data:
+            page_data['page']['etag'] = page_data['page']['etag'] or headers.get('ETag')
+            page_data['page']['last_modified'] = page_data['page']['last_modified'] or headers.get('Last-Modified')
+        return page_data
 
-    def _update_session_progress(self, session_id, pages_crawled):
+    def _carry_forward(self, session_id, previous_id, response_time, content_hashes):
         conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("UPDATE crawl_sessions SET total_pages = ? WHERE id = ?", (pages_crawled, session_id))
-        conn.commit()
+        conn.row_factory = sqlite3.Row
+        row = conn.execute("SELECT * FROM pages WHERE id = ?", (previous_id,)).fetchone()
+        if row is None or row['content_hash'] in content_hashes:
+            conn.close()
+            return None
+        links = [dict(link) for link in conn.execute(
+            "SELECT url, canonical_url, text, is_internal, link_type FROM links WHERE page_id = ?", (previous_id,))]
+        media = [dict(item) for item in conn.execute(
+            f"SELECT {', '.join(MEDIA_FIELDS)} FROM media_files WHERE page_id = ?", (previous_id,))]
+        seo_row = conn.execute("SELECT * FROM seo_analysis WHERE page_id = ?", (previous_id,)).fetchone()
+        seo = {key: seo_row[key] for key in seo_row.keys()
+               if key not in ('id', 'page_id', 'session_id') and seo_row[key] is not None} if seo_row else None
+        page = {key: row[key] for key in row.keys() if key not in ('id', 'crawl_time') and row[key] is not None}
+        # The writer needs the text to index the new row for search
+        self.content_store.fill(conn, [page])
         conn.close()
+        content_hashes.add(row['content_hash'])
+        page.update(session_id=session_id, status_code=304, response_time=response_time)
+        return {'page': page, 'links': links, 'media': media, 'seo': seo}
+
+    def _process_response(self, session_id, url, response, response_time, content_hashes):
+        parsed = self._parse_response(url, response, session_id)
+        if parsed is None:
+            return None
+        with self.metrics.timer('analysis', session_id, urlparse(url).netloc):
+            analysis = self.analysis.analyze(parsed['content'])
+        return self._build_page(session_id, url, response, response_time, parsed, analysis, content_hashes)
+
+    def _parse_response(self, url, response, session_id=None):
+        if response.status_code != 200:
+            return None
+        if self.http_cache:
+            self.http_cache.put(url, response.content, response.headers)
+        with self.metrics.timer('parse', session_id, urlparse(url).netloc):
+            return self._parse(response.content, response.headers.get('Content-Type'))
 
-    def _complete_session(self, session_id, total_pages):
+    def _build_page(self, session_id, url, response, response_time, parsed, analysis, content_hashes):
+        if analysis['content_hash'] in content_hashes:
+            return None
+        content_hashes.add(analysis['content_hash'])
+        canonical_url = self.canonicalizer.canonicalize(url)
+        near_duplicate_of = self._near_duplicate(canonical_url, analysis['simhash'])
+        if near_duplicate_of:
+            print(f"Near-duplicate of {near_duplicate_of}: {url}")
+        media_counts = count_media(parsed['media'])
+        # Relative references resolve against where the page really is, after redirects
+        base = resolve_base(parsed, response.url or url)
+
+        page = {
+            'session_id': session_id,
+            'url': url,
+            'canonical_url': canonical_url,
+            'title': parsed['title'],
+            'content': parsed['content'],
+            'status_code': response.status_code,
+            'response_time': response_time,
+            'word_count': analysis['word_count'],
+            'language_detected': analysis['language_detected'],
+            'readability_score': analysis['readability_score'],
+            'content_hash': analysis['content_hash'],
+            'simhash': to_signed(analysis['simhash']),
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'cache_control': response.headers.get('Cache-Control'),
+            'image_count': media_counts['image_count'],
+            'video_count': media_counts['video_count'],
+            'audio_count': media_counts['audio_count'],
+        }
+        return {'page': page, 'anchors': parsed['anchors'], 'base_url': base, 'near_duplicate_of': near_duplicate_of,
+                'media': extract_media(parsed['media'], base),
+                'seo': {'duplicate_content': near_duplicate_of is not None,
+                        'missing_alt_images': media_counts['missing_alt_images']}}
+
+    def _near_duplicate(self, canonical_url, fingerprint):
+        """Index a page's SimHash; return the URL of an earlier page of its domain within range, or None."""
+        if self.near_duplicate_distance is None:
+            return None
+        domain = urlparse(canonical_url).netloc
+        with self._simhash_lock:
+            index = self._simhash_indexes.get(domain)
+            if index is None:
+                index = self._simhash_indexes[domain] = self._load_simhash_index(domain)
+            self._simhash_indexes.move_to_end(domain)
+            while len(self._simhash_indexes) > self.simhash_cache_size:
+                self._simhash_indexes.popitem(last=False)
+            match = index.find(fingerprint, exclude=canonical_url)
+            index.add(fingerprint, canonical_url)
+        return match[0] if match else None
+
+    def _load_simhash_index(self, domain):
+        index = SimHashIndex(self.near_duplicate_distance)
         conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("""
-            UPDATE crawl_sessions SET end_time = CURRENT_TIMESTAMP, status = 'completed', total_pages = ?
-            WHERE id = ?
-        """, (total_pages, session_id))
-        conn.commit()
+        cursor = conn.execute("""
+            SELECT p.canonical_url, p.simhash FROM pages p JOIN crawl_sessions s ON s.id = p.session_id
+            WHERE s.domain = ? AND p.simhash IS NOT NULL ORDER BY p.id
+        """, (domain,))
+        for canonical_url, fingerprint in cursor:
+            index.add(from_signed(fingerprint), canonical_url)
         conn.close()
+        return index
+
+    def _parse(self, html, content_type=None):
+        return parse_page(html, content_type, self.parser)
+
+    def _extract_links(self, anchors, base_url, domain):
+        return extract_links(anchors, base_url, domain, self.canonicalizer)
+
+    def _store_page(self, page_data, url, base_domain):
+        """Save a crawled page with all its links and return the links to expand; near-duplicates are not expanded."""
+        links = page_data.get('links')
+        if links is None:
+            with self.metrics.timer('extract', page_data['page']['session_id'], urlparse(url).netloc):
+                links = self._extract_links(page_data['anchors'], page_data.get('base_url', url), base_domain)
+        self._save_page(page_data['page'], links, page_data.get('seo'), page_data.get('media', ()))
+        if page_data.get('near_duplicate_of') and not self.expand_near_duplicates:
+            return []
+        return links
+
+    def _save_page(self, page, links, seo=None, media=()):
+        # The writer assigns page_id and fills it into each link, seo_analysis and media row on insert.
+        media = [{key: item.get(key) for key in MEDIA_FIELDS} for item in media]
+        self.writer.submit_page(page, [
+            {'url': link['url'], 'canonical_url': link['canonical_url'], 'text': link['text'],
+             'is_internal': link['is_internal'], 'link_type': link['link_type']}
+            for link in links
+        ], seo, media)
+        # Downloads are queued only after their rows, so every result finds the rows to update
+        if media and self.media:
+            self.media.submit(page['session_id'], media)
+        self.events.publish('page', page['session_id'], url=page['url'], title=page.get('title'),
+                            status_code=page.get('status_code'), response_time=page.get('response_time'),
+                            word_count=page.get('word_count'), links=len(links), media=len(media))
+
+    def _checkpoint(self, session_id, done_url=None, added=()):
+        # Queued after the page itself, so a committed 'done' flag implies the page row is committed too
+        self.writer.checkpoint_frontier(session_id, done_url, added)
+
+    def _update_session_progress(self, session_id, pages_crawled, queue_size=None):
+        self.writer.update_progress(session_id, pages_crawled)
+        self.events.publish('progress', session_id, pages_crawled=pages_crawled, queue_size=queue_size)
+
+    def _complete_session(self, session_id, total_pages, status=None):
+        """Finish a session as completed, or as cancelled/paused if the scheduler asked it to stop."""
+        status = status or self.scheduler.stop_status(session_id) or 'completed'
+        self.writer.complete_session(session_id, total_pages, status)
+        self.events.publish(status, session_id, total_pages=total_pages)
+        return status
+
+    def get_host_rates(self, hosts=None):
+        """Adaptive delay and connection window per host ({} with rate control off)."""
+        return self.rate_control.snapshot(hosts) if self.rate_control else {}
+
+    def get_stats(self):
+        stats = dict(self.stats.get(), http=self.transport.metrics())
+        if self.media:
+            stats['media'] = self.media.stats()
+        return stats
+
+    def render_metrics(self):
+        """Stage histograms plus crawl and HTTP counters in the Prometheus text format."""
+        stats = self.get_stats()
+        http = stats['http']
+        values = [(name.replace('total_', '') + '_total', 'counter', f"Crawl {name.replace('total_', '')} recorded.",
+                   stats[name]) for name in COUNTERS]
+        values += [
+            ('active_sessions', 'gauge', 'Sessions currently running.', stats['active_sessions']),
+            ('http_requests_total', 'counter', 'HTTP requests sent.', http['requests']),
+            ('http_connections_total', 'counter', 'HTTP connections opened.', http['new_connections']),
+            ('http_retries_total', 'counter', 'HTTP requests retried.', http['retries']),
+            ('http_received_bytes_total', 'counter', 'Response body bytes received.', http['bytes_received']),
+            ('http_aborted_too_large_total', 'counter', 'Responses aborted over the size cap.',
+             http['aborted_too_large']),
+            ('http_connection_reuse_ratio', 'gauge', 'Share of requests sent on a reused connection.',
+             http['connection_reuse_rate']),
+        ]
+        return self.metrics.render() + render_values(values)
+
+    def search(self, query, session_id=None, language=None, limit=20, offset=0):
+        conn = self.content_store.register(sqlite3.connect(self.db_path))
+        try:
+            return search_pages(conn, query, session_id, language, limit, offset)
+        finally:
+            conn.close()
 
     def get_sessions(self):
         conn = sqlite3.connect(self.db_path)
@@ -235,28 +694,137 @@ class WebCrawler:
         conn.close()
         return [dict(zip(columns, row)) for row in result]
 
-    def get_session_pages(self, session_id):
+    def get_page_columns(self):
+        conn = sqlite3.connect(self.db_path)
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(pages)")]
+        conn.close()
+        return columns
+
+    def get_session_pages(self, session_id, columns=None, after_id=0, limit=None):
+        """Pages of a session in id order, starting after ``after_id``.
+
+        ``columns`` defaults to every column except the bulky ``content``;
+        ``id`` is always included so callers can continue from the last row.
+        """
+        available = self.get_page_columns()
+        if columns is None:
+            columns = [c for c in available if c != 'content']
+        unknown = [c for c in columns if c not in available]
+        if unknown:
+            raise ValueError(f"Unknown page columns: {', '.join(unknown)}")
+        columns = ['id'] + [c for c in columns if c != 'id']
+        # Text is stored compressed by content_hash and only decompressed when asked for
+        select = columns + ['content_hash'] if 'content' in columns and 'content_hash' not in columns else columns
+
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM pages WHERE session_id = ?", (session_id,))
+        cursor.execute(f"""
+            SELECT {', '.join(select)} FROM pages
+            WHERE session_id = ? AND id > ? ORDER BY id LIMIT ?
+        """, (session_id, after_id, -1 if limit is None else limit))
+        pages = [dict(zip(select, row)) for row in cursor.fetchall()]
+        if 'content' in columns:
+            self.content_store.fill(conn, pages)
+            if select is not columns:
+                for page in pages:
+                    del page['content_hash']
+        conn.close()
+        return pages
+
+    def get_session_media(self, session_id, file_type=None, status=None, after_id=0, limit=100):
+        """Media files of a session in id order, optionally filtered by type and download status."""
+        filters, params = ["session_id = ?", "id > ?"], [session_id, after_id]
+        if file_type:
+            filters.append("file_type = ?")
+            params.append(file_type)
+        if status:
+            filters.append("download_status = ?")
+            params.append(status)
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute(f"SELECT * FROM media_files WHERE {' AND '.join(filters)} ORDER BY id LIMIT ?",
+                            params + [limit]).fetchall()
+        conn.close()
+        return [dict(row) for row in rows]
+
+    def get_session(self, session_id):
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM crawl_sessions WHERE id = ?", (session_id,))
         columns = [desc[0] for desc in cursor.description]
-        result = cursor.fetchall()
+        row = cursor.fetchone()
         conn.close()
-        return [dict(zip(columns, row)) for row in result]
+        return dict(zip(columns, row)) if row else None
 
-    def export_session_data(self, session_id, format_type='json'):
-        session = next((s for s in self.get_sessions() if s['id'] == session_id), None)
+    def get_link_graph(self, session_id, limit=50, cache_size=16):
+        """In-degree, PageRank, orphans and broken links of a session (see link_graph.analyze_session)."""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            row = conn.execute("SELECT start_url, total_pages, total_links, total_errors, status "
+                               "FROM crawl_sessions WHERE id = ?", (session_id,)).fetchone()
+            if not row:
+                return None
+            key = (tuple(row[1:]), limit)
+            with self._graph_lock:
+                cached = self._graph_cache.get(session_id)
+                if cached and cached[0] == key:
+                    self._graph_cache.move_to_end(session_id)
+                    return cached[1]
+            report = analyze_session(conn, session_id, row[0], limit)
+        finally:
+            conn.close()
+        with self._graph_lock:
+            self._graph_cache[session_id] = (key, report)
+            self._graph_cache.move_to_end(session_id)
+            while len(self._graph_cache) > cache_size:
+                self._graph_cache.popitem(last=False)
+        return report
+
+    def iter_session_export(self, session_id, format_type='json', include_content=True,
+                            include_links=False, compress=False):
+        """Return a generator streaming the export (bytes if ``compress``), or None if the session is unknown."""
+        if format_type not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format: {format_type}")
+        session = self.get_session(session_id)
         if not session:
             return None
-        pages = self.get_session_pages(session_id)
-        export_data = {
-            'session': session,
-            'pages': pages,
-            'export_time': datetime.now().isoformat()
-        }
-        if format_type == 'json':
-            export_path = f"exports/session_{session_id}_export.json"
-            with open(export_path, "w", encoding="utf-8") as f:
-                json.dump(export_data, f, indent=2)
-            return export_path
-        return None
+        chunks = iter_export(self.db_path, session, format_type, include_content, include_links,
+                             content_store=self.content_store)
+        return gzip_chunks(chunks) if compress else chunks
+
+    def export_session_data(self, session_id, format_type='json'):
+        chunks = self.iter_session_export(session_id, format_type)
+        if chunks is None:
+            return None
+        export_path = f"exports/session_{session_id}_export.{EXPORT_FORMATS[format_type][1]}"
+        with open(export_path, "w", encoding="utf-8", newline='') as f:
+            for chunk in chunks:
+                f.write(chunk)
+        return export_path
+
+
+def main(argv=None):
+    """Run one crawl session from the command line and print where its time went."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('url')
+    parser.add_argument('--max-pages', type=int, default=20)
+    parser.add_argument('--delay', type=float, default=1.0)
+    parser.add_argument('--engine', choices=('sequential', 'async'), default='sequential')
+    parser.add_argument('--db', default="database/crawler.db")
+    parser.add_argument('--profile', choices=PROFILE_MODES, help="dump a profile of the session")
+    parser.add_argument('--profile-dir', default="profiles")
+    args = parser.parse_args(argv)
+
+    crawler = WebCrawler(args.db, profile=args.profile, profile_dir=args.profile_dir)
+    session_id = crawler.start_crawl(args.url, args.max_pages, args.delay, args.engine)['session_id']
+    while crawler.get_session(session_id)['status'] in ('queued', 'running'):
+        time.sleep(0.5)
+    crawler.writer.flush()
+    for stage, timing in crawler.metrics.summary(session_id).items():
+        print(f"{stage:<10} n={timing['count']:<6} mean={timing['mean'] * 1000:8.2f}ms "
+              f"p50<={timing['p50'] * 1000:.1f}ms p99<={timing['p99'] * 1000:.1f}ms")
+    crawler.analysis.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -11,7 +11,23 @@ def upgrade_database(db_path="database/crawler.db"):
     cursor = conn.cursor()
     
     # Drop existing tables to recreate with new schema
-    cursor.execute('DROP TABLE IF EXISTS links')
+    # crawler.py keeps links as a view over link_edges
+    links = cursor.execute("SELECT type FROM sqlite_master WHERE name = 'links'").fetchone()
+    if links:
+        cursor.execute(f"DROP {links[0].upper()} links")
+    cursor.execute('DROP TABLE IF EXISTS link_edges')
+    cursor.execute('DROP TABLE IF EXISTS crawl_errors')
+    # Indexes, counters and stores derived from the dropped rows; the crawler recreates and reseeds them
+    cursor.execute('DROP VIEW IF EXISTS pages_text')
+    cursor.execute('DROP TABLE IF EXISTS pages_fts')
+    cursor.execute('DROP TABLE IF EXISTS crawl_stats')
+    cursor.execute('DROP TABLE IF EXISTS url_dictionary')
+    cursor.execute('DROP TABLE IF EXISTS anchor_texts')
+    cursor.execute('DROP TABLE IF EXISTS content_blobs')
+    cursor.execute('DROP TABLE IF EXISTS content_dicts')
+    cursor.execute('DROP TABLE IF EXISTS crawl_frontier')
+    cursor.execute('DROP TABLE IF EXISTS shared_frontier')
+    cursor.execute('DROP TABLE IF EXISTS seo_analysis')
     cursor.execute('DROP TABLE IF EXISTS pages')
     cursor.execute('DROP TABLE IF EXISTS crawl_sessions')
     cursor.execute('DROP TABLE IF EXISTS media_files')
@@ -107,14 +123,17 @@ def upgrade_database(db_path="database/crawler.db"):
         CREATE TABLE links (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             page_id INTEGER,
+            session_id INTEGER,
             url TEXT NOT NULL,
+            canonical_url TEXT,
             text TEXT,
             is_internal BOOLEAN,
             link_type TEXT,  -- 'nav', 'footer', 'content', 'social'
             rel_attribute TEXT,
             target_attribute TEXT,
             title_attribute TEXT,
-            FOREIGN KEY (page_id) REFERENCES pages (id)
+            FOREIGN KEY (page_id) REFERENCES pages (id),
+            FOREIGN KEY (session_id) REFERENCES crawl_sessions (id)
         )
     ''')
     
@@ -164,8 +183,11 @@ def upgrade_database(db_path="database/crawler.db"):
     
     # Create indexes for better performance
     cursor.execute('CREATE INDEX idx_pages_session_id ON pages(session_id)')
+    cursor.execute('CREATE INDEX idx_pages_session_id_id ON pages(session_id, id)')
     cursor.execute('CREATE INDEX idx_pages_url ON pages(url)')
+    cursor.execute('CREATE INDEX idx_pages_canonical_url ON pages(canonical_url)')
     cursor.execute('CREATE INDEX idx_links_page_id ON links(page_id)')
+    cursor.execute('CREATE INDEX idx_links_canonical_url ON links(canonical_url)')
     cursor.execute('CREATE INDEX idx_media_session_id ON media_files(session_id)')
     cursor.execute('CREATE INDEX idx_media_page_id ON media_files(page_id)')
     
@@ -0,0 +1,264 @@
+import atexit
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+from link_graph import LinkStore
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseWriter:
+    """Single writer thread that owns one long-lived SQLite connection in WAL mode.
+
+    Crawl workers enqueue page/link records and session updates without
+    touching the disk; the writer drains the queue and commits them in grouped
+    transactions, flushing when ``batch_size`` items are pending or
+    ``flush_interval`` seconds have passed. Progress updates are coalesced so
+    only the latest value per session is written. A batch that fails to
+    commit is retried once, then applied one item at a time so a bad row only
+    loses itself. Batch commit times go to ``metrics`` (a StageMetrics) when
+    one is given.
+    """
+
+    def __init__(self, db_path, batch_size=200, flush_interval=0.5, content_store=None, metrics=None):
+        self.db_path = db_path
+        self.content_store = content_store
+        self.metrics = metrics
+        self.link_store = LinkStore()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._progress = {}
+        self._errors = {}
+        self._progress_lock = threading.Lock()
+        self._sql_cache = {}
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit_page(self, page, links=(), seo=None, media=()):
+        """Queue a page row (column -> value dict), its link rows, an optional seo_analysis row and media rows."""
+        self._queue.put(('page', page, (list(links), seo, list(media))))
+
+    def update_media(self, url, result):
+        """Queue a media download result for every still pending media_files row of ``url``."""
+        self._queue.put(('media', url, result))
+
+    def update_progress(self, session_id, total_pages):
+        with self._progress_lock:
+            self._progress[session_id] = total_pages
+
+    def record_error(self, session_id, url=None, error=None):
+        """Count a failed fetch; with ``url``, also record it in crawl_errors for broken-link reports."""
+        with self._progress_lock:
+            self._errors[session_id] = self._errors.get(session_id, 0) + 1
+        if url is not None:
+            self._queue.put(('error', session_id, (url, error)))
+
+    def checkpoint_frontier(self, session_id, done_url=None, added=()):
+        """Queue a frontier delta: ``added`` URLs were enqueued and ``done_url`` was finished."""
+        self._queue.put(('frontier', session_id, (done_url, list(added))))
+
+    def complete_session(self, session_id, total_pages, status='completed'):
+        """Queue the final status; ``total_pages`` of None keeps the stored count."""
+        self._queue.put(('complete', session_id, (total_pages, status)))
+
+    def flush(self, timeout=None):
+        """Block until everything queued so far has been committed."""
+        done = threading.Event()
+        self._queue.put(('flush', done, None))
+        return done.wait(timeout)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(('stop', None, None))
+        self._thread.join()
+
+    def _run(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        if self.content_store is not None:
+            self.content_store.register(conn)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        running = True
+        while running:
+            batch = []
+            try:
+                batch.append(self._queue.get(timeout=self.flush_interval))
+            except queue.Empty:
+                pass
+            deadline = time.monotonic() + self.flush_interval
+            while batch and len(batch) < self.batch_size and batch[-1][0] not in ('flush', 'stop'):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            running = not any(kind == 'stop' for kind, _, _ in batch)
+            start = time.perf_counter()
+            error = self._try_write(conn, batch)
+            if error is None:
+                if self.metrics is not None and batch:
+                    self.metrics.observe('db_write', time.perf_counter() - start)
+            else:
+                logger.warning("Database writer failed to commit %d items, retrying: %s", len(batch), error)
+                time.sleep(self.flush_interval)
+                if self._try_write(conn, batch) is not None:
+                    self._write_each(conn, batch)
+            for kind, event, _ in batch:
+                if kind == 'flush':
+                    event.set()
+        conn.close()
+
+    def _try_write(self, conn, batch):
+        """Commit ``batch``; on failure roll back and return the error, keeping the coalesced counters pending."""
+        with self._progress_lock:
+            progress, self._progress = self._progress, {}
+            errors, self._errors = self._errors, {}
+        try:
+            self._write_batch(conn, batch, progress, errors)
+            return None
+        except Exception as e:
+            conn.rollback()
+            self.link_store.reset()
+            if self.content_store is not None:
+                self.content_store.reset()
+            with self._progress_lock:
+                # A newer progress value queued meanwhile wins; error counts add up
+                for session_id, total in progress.items():
+                    self._progress.setdefault(session_id, total)
+                for session_id, count in errors.items():
+                    self._errors[session_id] = self._errors.get(session_id, 0) + count
+            return e
+
+    def _write_each(self, conn, batch):
+        """Apply a batch that will not commit one item at a time, dropping only the items that fail."""
+        for item in batch:
+            if item[0] in ('flush', 'stop'):
+                continue
+            error = self._try_write(conn, [item])
+            if error is not None:
+                logger.error("Database writer dropped a %r item that failed to commit: %s", item[0], error)
+
+    def _write_batch(self, conn, batch, progress, errors):
+        if not batch and not progress and not errors:
+            return
+        cursor = conn.cursor()
+        rows_by_sql = {}
+        link_items = []
+        counters = {}
+        fts_rows = []
+        for kind, first, second in batch:
+            if kind != 'page':
+                continue
+            links, seo, media = second
+            row, text = first, first.get('content')
+            if self.content_store is not None and text is not None and first.get('content_hash'):
+                # Text goes to the content store once per hash; the pages row keeps only metadata
+                row = {key: value for key, value in first.items() if key != 'content'}
+                self.content_store.put(cursor, first['content_hash'], text)
+            cursor.execute(self._insert_sql('pages', row), tuple(row.values()))
+            page_id = cursor.lastrowid
+            fts_rows.append((page_id, first.get('title'), text))
+            link_items.append((first['session_id'], page_id, first.get('canonical_url') or first['url'], links))
+            if seo:
+                row = dict(seo, page_id=page_id, session_id=first['session_id'])
+                rows_by_sql.setdefault(self._insert_sql('seo_analysis', row), []).append(tuple(row.values()))
+            for item in media:
+                row = dict(item, page_id=page_id, session_id=first['session_id'])
+                rows_by_sql.setdefault(self._insert_sql('media_files', row), []).append(tuple(row.values()))
+            session = counters.setdefault(first['session_id'], [0, 0, 0.0, 0, 0])
+            session[0] += 1
+            session[1] += len(links)
+            session[4] += len(media)
+            if first.get('response_time') is not None:
+                session[2] += first['response_time']
+                session[3] += 1
+        if link_items:
+            self.link_store.write_links(cursor, link_items)
+        for sql, rows in rows_by_sql.items():
+            cursor.executemany(sql, rows)
+        # After the inserts, so results also reach rows of pages queued in the same batch
+        downloaded = [(result.get('file_size'), result.get('width'), result.get('height'), result.get('format'),
+                       result.get('local_path'), result.get('content_hash'), result['download_status'], url)
+                      for kind, url, result in batch if kind == 'media']
+        if downloaded:
+            cursor.executemany("""
+                UPDATE media_files SET file_size = ?, width = ?, height = ?, format = COALESCE(?, format),
+                    local_path = ?, content_hash = ?, download_status = ?, download_time = CURRENT_TIMESTAMP
+                WHERE url = ? AND download_status = 'pending'
+            """, downloaded)
+        failed = [(session_id,) + detail for kind, session_id, detail in batch if kind == 'error']
+        if failed:
+            self.link_store.write_errors(cursor, failed)
+        if fts_rows:
+            cursor.executemany("INSERT INTO pages_fts (rowid, title, content) VALUES (?, ?, ?)", fts_rows)
+        self._update_counters(cursor, counters, errors)
+        self._write_frontier(cursor, [(session_id, delta) for kind, session_id, delta in batch if kind == 'frontier'])
+        if progress:
+            cursor.executemany("UPDATE crawl_sessions SET total_pages = ? WHERE id = ?",
+                               [(total, session_id) for session_id, total in progress.items()])
+        completed = [(final[1], final[0], session_id) for kind, session_id, final in batch if kind == 'complete']
+        if completed:
+            cursor.executemany("""
+                UPDATE crawl_sessions SET end_time = CURRENT_TIMESTAMP, status = ?,
+                    total_pages = COALESCE(?, total_pages)
+                WHERE id = ?
+            """, completed)
+            # Only a paused session can be resumed; the others no longer need their checkpoint
+            cursor.executemany("DELETE FROM crawl_frontier WHERE session_id = ?",
+                               [(session_id,) for status, _, session_id in completed if status != 'paused'])
+        conn.commit()
+
+    def _write_frontier(self, cursor, deltas):
+        """Apply queued frontier deltas; rows are only ever inserted or flagged done, never rewritten."""
+        if not deltas:
+            return
+        cursor.executemany("INSERT OR IGNORE INTO crawl_frontier (session_id, url) VALUES (?, ?)",
+                           [(session_id, url) for session_id, (_, added) in deltas for url in added])
+        cursor.executemany("UPDATE crawl_frontier SET done = 1 WHERE session_id = ? AND url = ?",
+                           [(session_id, done_url) for session_id, (done_url, _) in deltas if done_url])
+
+    def _update_counters(self, cursor, counters, errors):
+        """Keep the materialized per-session and global counters in step with the inserted rows."""
+        if counters:
+            cursor.executemany("""
+                UPDATE crawl_sessions SET
+                    total_links = COALESCE(total_links, 0) + ?,
+                    avg_response_time = CASE WHEN COALESCE(response_time_samples, 0) + ? > 0
+                        THEN (COALESCE(avg_response_time, 0) * COALESCE(response_time_samples, 0) + ?)
+                             / (COALESCE(response_time_samples, 0) + ?)
+                        ELSE avg_response_time END,
+                    response_time_samples = COALESCE(response_time_samples, 0) + ?,
+                    total_media_files = COALESCE(total_media_files, 0) + ?
+                WHERE id = ?
+            """, [(links, samples, rt_sum, samples, samples, media, session_id)
+                  for session_id, (_, links, rt_sum, samples, media) in counters.items()])
+        if errors:
+            cursor.executemany("UPDATE crawl_sessions SET total_errors = COALESCE(total_errors, 0) + ? WHERE id = ?",
+                               [(count, session_id) for session_id, count in errors.items()])
+        totals = {
+            'total_pages': sum(c[0] for c in counters.values()),
+            'total_links': sum(c[1] for c in counters.values()),
+            'total_errors': sum(errors.values()),
+            'total_media_files': sum(c[4] for c in counters.values()),
+        }
+        cursor.executemany("UPDATE crawl_stats SET value = value + ? WHERE name = ?",
+                           [(value, name) for name, value in totals.items() if value])
+
+    def _insert_sql(self, table, row):
+        key = (table, tuple(row))
+        sql = self._sql_cache.get(key)
+        if sql is None:
+            columns = ', '.join(row)
+            placeholders = ', '.join('?' * len(row))
+            sql = self._sql_cache[key] = f"INSERT INTO {table} ({columns}) VALUES ({placeholders})"
+        return sql
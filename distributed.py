@@ -0,0 +1,533 @@
+"""Distributed crawl mode: one coordinator owning the database, many worker processes.
+
+The coordinator is the web app. Sessions started with ``engine='distributed'``
+fetch nothing in-process; their frontier lives in the ``shared_frontier``
+table, where every URL belongs to a partition picked by hashing its host.
+Workers (``python distributed.py --coordinator http://host:5000``) lease a
+batch of pending URLs from one partition, fetch, parse and analyse them
+locally and post back page rows, extracted links and media references. The
+coordinator drops duplicates, stores pages through the database writer,
+queues new links and hands the media to its own download pipeline.
+
+A partition is leased to one worker at a time and is handed out again only
+after the host's delay (or the Crawl-delay the worker saw) has passed, so
+per-host politeness holds however many workers run. With rate control the
+delay adapts to the fetch outcomes workers report. Leases a worker stops
+reporting on expire after ``lease_timeout`` seconds and their URLs are
+requeued, up to ``max_attempts`` leases per URL.
+"""
+import argparse
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from urllib.parse import urlparse
+
+import requests
+
+from analysis import analyze_content
+from canonicalize import DEFAULT_TRACKING_PATTERNS, URLCanonicalizer
+from extractor import count_media, extract_links, extract_media, parse_page, resolve_base
+from robots import RobotsCache
+from rate_control import is_overload
+from simhash import to_signed
+from transport import HttpTransport
+
+PAGE_FIELDS = ('url', 'canonical_url', 'title', 'content', 'status_code', 'response_time', 'word_count',
+               'language_detected', 'readability_score', 'content_hash', 'simhash', 'etag', 'last_modified',
+               'cache_control', 'image_count', 'video_count', 'audio_count')
+LINK_FIELDS = ('url', 'canonical_url', 'text', 'is_internal', 'link_type')
+WORKER_STAGES = frozenset({'fetch', 'connect', 'ttfb', 'download', 'parse', 'analysis', 'extract'})
+
+
+def init_shared_frontier(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS shared_frontier (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id INTEGER NOT NULL,
+            url TEXT NOT NULL,
+            partition INTEGER NOT NULL,
+            state TEXT DEFAULT 'pending',
+            lease_id TEXT,
+            attempts INTEGER DEFAULT 0,
+            UNIQUE (session_id, url),
+            FOREIGN KEY (session_id) REFERENCES crawl_sessions (id)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_shared_frontier_state ON shared_frontier(session_id, state, id)")
+    # Leases live in the coordinator's memory and do not survive a restart
+    cursor.execute("UPDATE shared_frontier SET state = 'pending', lease_id = NULL WHERE state = 'leased'")
+
+
+def validate_result(result):
+    """Raise ValueError unless ``result`` has the shape CrawlWorker.crawl_url produces."""
+    if not isinstance(result, dict) or not isinstance(result.get('url'), str):
+        raise ValueError("each result needs a url")
+    for key in ('error', 'skipped'):
+        if result.get(key) is not None and not isinstance(result[key], str):
+            raise ValueError(f"{key} must be a string")
+    fetch = result.get('fetch')
+    if fetch is not None:
+        if not isinstance(fetch, dict):
+            raise ValueError("fetch must be an object")
+        for key, types in (('response_time', (int, float)), ('status_code', int)):
+            if fetch.get(key) is not None and not isinstance(fetch[key], types):
+                raise ValueError(f"fetch.{key} has the wrong type")
+    page = result.get('page')
+    if page is None:
+        return
+    if not isinstance(page, dict) or not isinstance(page.get('content_hash'), str) \
+            or not isinstance(page.get('canonical_url'), str):
+        raise ValueError("page needs content_hash and canonical_url")
+    if not isinstance(page.get('simhash'), int) or not 0 <= page['simhash'] < 1 << 64:
+        raise ValueError("page simhash must be an unsigned 64-bit integer")
+    for key, fields in (('links', ('url', 'canonical_url')), ('media', ('url',))):
+        items = result.get(key) or []
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            raise ValueError(f"{key} must be a list of objects")
+        if not all(isinstance(item.get(field), str) for item in items for field in fields):
+            raise ValueError(f"{key} rows need a string {' and '.join(fields)}")
+
+
+def host_partition(url, partitions):
+    """Partition of ``url``'s host; every URL of a host lands in the same one."""
+    return zlib.crc32(urlparse(url).netloc.encode()) % partitions
+
+
+class DistributedCoordinator:
+    """Leases frontier URLs to workers and applies the results they post back.
+
+    ``run`` is the scheduler job of a distributed session; ``lease``,
+    ``submit`` and ``status`` back the ``/api/workers`` endpoints.
+    """
+
+    def __init__(self, crawler, partitions=64, lease_timeout=60.0, max_attempts=3, max_batch=100):
+        self.crawler = crawler
+        self.partitions = partitions
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+        self.max_batch = max_batch
+        self._cond = threading.Condition()
+        self._conn = None
+        self._sessions = {}  # session_id -> crawl state of a running distributed session
+        self._leases = {}  # lease_id -> {session_id, partition, worker_id, urls: {url: row id}, expires}
+        self._ready_at = {}  # (session_id, partition) -> when the partition may be leased again
+        self._workers = {}  # worker_id -> last request time
+        self._requeued = 0
+
+    def _db(self):
+        if self._conn is None:
+            # Shared by the request threads and session jobs, always under self._cond
+            self._conn = sqlite3.connect(self.crawler.db_path, timeout=30, check_same_thread=False)
+        return self._conn
+
+    def run(self, session_id, start_url, max_pages, delay, incremental=False, checkpoint=None):
+        with self._cond:
+            seeded = self._db().execute("SELECT 1 FROM shared_frontier WHERE session_id = ? LIMIT 1",
+                                        (session_id,)).fetchone()
+        if not seeded:
+            self.add_urls(session_id, [start_url] + self.crawler._sitemap_seeds(start_url))
+        state = {
+            'max_pages': max_pages,
+            'delay': delay,
+            'domain': urlparse(start_url).netloc,
+            'crawled': checkpoint['pages_crawled'] if checkpoint else 0,
+            'content_hashes': set(checkpoint['content_hashes']) if checkpoint else set(),
+            'applying': 0,
+        }
+        with self._cond:
+            self._sessions[session_id] = state
+        try:
+            with self._cond:
+                while not self.crawler.scheduler.stop_status(session_id) and state['crawled'] < max_pages:
+                    self._expire_leases(time.time())
+                    if not self._leased(session_id) and not self._db().execute(
+                            "SELECT 1 FROM shared_frontier WHERE session_id = ? AND state = 'pending' LIMIT 1",
+                            (session_id,)).fetchone():
+                        break
+                    self._cond.wait(1.0)
+        finally:
+            with self._cond:
+                del self._sessions[session_id]
+                self._ready_at = {key: value for key, value in self._ready_at.items() if key[0] != session_id}
+                for lease_id in [i for i, lease in self._leases.items() if lease['session_id'] == session_id]:
+                    del self._leases[lease_id]
+                conn = self._db()
+                conn.execute("UPDATE shared_frontier SET state = 'pending', lease_id = NULL "
+                             "WHERE session_id = ? AND state = 'leased'", (session_id,))
+                conn.commit()
+            status = self.crawler._complete_session(session_id, state['crawled'])
+            if status != 'paused':
+                with self._cond:
+                    conn.execute("DELETE FROM shared_frontier WHERE session_id = ?", (session_id,))
+                    conn.commit()
+        print(f"Session {status}: {state['crawled']} pages crawled.")
+
+    def add_urls(self, session_id, urls):
+        """Queue ``urls`` for ``session_id``; URLs the session already has are ignored."""
+        with self._cond:
+            conn = self._db()
+            conn.executemany("INSERT OR IGNORE INTO shared_frontier (session_id, url, partition) VALUES (?, ?, ?)",
+                             [(session_id, url, host_partition(url, self.partitions)) for url in urls])
+            conn.commit()
+            self._cond.notify_all()
+
+    def _leased(self, session_id):
+        """URLs of a session out on lease, counting results still being applied."""
+        leased = sum(len(lease['urls']) for lease in self._leases.values() if lease['session_id'] == session_id)
+        return leased + self._sessions[session_id]['applying'] if session_id in self._sessions else leased
+
+    def _expire_leases(self, now):
+        expired = [lease_id for lease_id, lease in self._leases.items() if lease['expires'] < now]
+        if not expired:
+            return
+        conn = self._db()
+        for lease_id in expired:
+            lease = self._leases.pop(lease_id)
+            requeued = conn.execute("UPDATE shared_frontier SET state = 'pending', lease_id = NULL "
+                                    "WHERE lease_id = ? AND state = 'leased' AND attempts < ?",
+                                    (lease_id, self.max_attempts)).rowcount
+            self._requeued += requeued
+            for url, in conn.execute("SELECT url FROM shared_frontier WHERE lease_id = ? AND state = 'leased'",
+                                     (lease_id,)).fetchall():
+                self.crawler._report_error(lease['session_id'], url,
+                                           f"Lease expired {self.max_attempts} times")
+            conn.execute("UPDATE shared_frontier SET state = 'failed' WHERE lease_id = ? AND state = 'leased'",
+                         (lease_id,))
+            print(f"Lease {lease_id} of worker {lease['worker_id']} expired; requeued {requeued} URLs")
+        conn.commit()
+
+    def lease(self, worker_id, max_urls=10):
+        """Lease up to ``max_urls`` pending URLs of one partition to ``worker_id``, or None if there are none."""
+        max_urls = max(1, min(max_urls, self.max_batch))
+        with self._cond:
+            now = time.time()
+            self._workers[worker_id] = now
+            self._expire_leases(now)
+            conn = self._db()
+            busy = {(lease['session_id'], lease['partition']) for lease in self._leases.values()}
+            busy.update(key for key, ready_at in self._ready_at.items() if ready_at > now)
+            # Sessions with the fewest URLs out on lease go first
+            for session_id in sorted(self._sessions, key=self._leased):
+                state = self._sessions[session_id]
+                budget = min(max_urls, state['max_pages'] - state['crawled'] - self._leased(session_id))
+                if budget <= 0 or self.crawler.scheduler.stop_status(session_id):
+                    continue
+                excluded = [partition for sid, partition in busy if sid == session_id]
+                row = conn.execute(f"""
+                    SELECT partition FROM shared_frontier
+                    WHERE session_id = ? AND state = 'pending' AND partition NOT IN ({', '.join('?' * len(excluded))})
+                    ORDER BY id LIMIT 1
+                """, (session_id, *excluded)).fetchone()
+                if not row:
+                    continue
+                rows = conn.execute("""
+                    SELECT id, url FROM shared_frontier
+                    WHERE session_id = ? AND state = 'pending' AND partition = ? ORDER BY id LIMIT ?
+                """, (session_id, row[0], budget)).fetchall()
+                lease_id = uuid.uuid4().hex
+                delay = self._delay(state, rows[0][1])
+                conn.executemany("UPDATE shared_frontier SET state = 'leased', lease_id = ?, attempts = attempts + 1 "
+                                 "WHERE id = ?", [(lease_id, row_id) for row_id, _ in rows])
+                conn.commit()
+                self._leases[lease_id] = {'session_id': session_id, 'partition': row[0], 'worker_id': worker_id,
+                                          'urls': {url: row_id for row_id, url in rows}, 'delay': delay,
+                                          'expires': now + self.lease_timeout}
+                return {'lease_id': lease_id, 'session_id': session_id, 'urls': [url for _, url in rows],
+                        'domain': state['domain'], 'delay': delay, 'lease_timeout': self.lease_timeout}
+            return None
+
+    def _delay(self, state, url):
+        """Gap between requests to ``url``'s host: the session delay, lengthened by rate control if the host struggles.
+
+        Workers raise it to the host's Crawl-delay themselves.
+        """
+        rate_control = self.crawler.rate_control
+        return rate_control.delay(urlparse(url).netloc, state['delay']) if rate_control else state['delay']
+
+    def submit(self, lease_id, results, final=False, delay=None):
+        """Apply a worker's results for URLs of ``lease_id``; ``final`` releases the lease.
+
+        Returns the number of results accepted, or None if the lease has
+        expired (its URLs are already back in the frontier) or is unknown.
+        Raises ValueError, before anything is applied, if a result is
+        malformed; URLs whose results fail to apply are requeued.
+        """
+        for result in results:
+            validate_result(result)
+        delay = float(delay or 0.0)
+        with self._cond:
+            lease = self._leases.get(lease_id)
+            if lease is None:
+                return None
+            session_id = lease['session_id']
+            state = self._sessions[session_id]
+            self._workers[lease['worker_id']] = time.time()
+            lease['expires'] = time.time() + self.lease_timeout
+            accepted = []
+            for result in results:
+                url = result['url']
+                if url not in lease['urls']:
+                    continue
+                row_id = lease['urls'].pop(url)
+                page = result.get('page')
+                if page and page.get('content_hash') in state['content_hashes']:
+                    page = None
+                elif page:
+                    state['content_hashes'].add(page['content_hash'])
+                    state['crawled'] += 1
+                accepted.append((row_id, url, result, page))
+            # Until their links are queued, accepted URLs still keep the session from finishing
+            state['applying'] += len(accepted)
+
+        pages = 0
+        added = []
+        applied = 0
+        try:
+            for row_id, url, result, page in accepted:
+                fetch = result.get('fetch')
+                if self.crawler.rate_control and fetch:
+                    self.crawler.rate_control.observe(urlparse(url).netloc, fetch.get('response_time'),
+                                                      fetch.get('status_code'), bool(fetch.get('overloaded')))
+                if result.get('error'):
+                    self.crawler._report_error(session_id, url, result['error'])
+                elif result.get('skipped'):
+                    print(f"{result['skipped']}: {url}")
+                if page:
+                    links = self._store_result(session_id, url, page, result, state['domain'])
+                    added.extend(link['canonical_url'] for link in links if link['is_internal'])
+                    pages += 1
+                applied += 1
+        finally:
+            if pages:
+                # A URL is only flagged done once its page has been committed
+                self.crawler.writer.flush()
+            with self._cond:
+                state['applying'] -= len(accepted)
+                # Results that failed to apply give their page budget back and their URLs are fetched again
+                unapplied = accepted[applied:]
+                for _, _, _, page in unapplied:
+                    if page:
+                        state['crawled'] -= 1
+                        state['content_hashes'].discard(page['content_hash'])
+                if session_id in self._sessions:
+                    conn = self._db()
+                    conn.executemany("INSERT OR IGNORE INTO shared_frontier (session_id, url, partition) "
+                                     "VALUES (?, ?, ?)",
+                                     [(session_id, url, host_partition(url, self.partitions)) for url in added])
+                    conn.executemany("UPDATE shared_frontier SET state = 'done', lease_id = NULL WHERE id = ?",
+                                     [(row_id,) for row_id, _, _, _ in accepted[:applied]])
+                    conn.executemany("UPDATE shared_frontier SET state = 'pending', lease_id = NULL WHERE id = ?",
+                                     [(row_id,) for row_id, _, _, _ in unapplied])
+                    if final and self._leases.pop(lease_id, None):
+                        # URLs the worker gave up on go back to the frontier
+                        conn.execute("UPDATE shared_frontier SET state = 'pending', lease_id = NULL "
+                                     "WHERE lease_id = ? AND state = 'leased'", (lease_id,))
+                        gap = max(lease['delay'], min(delay, 60.0))
+                        self._ready_at[(session_id, lease['partition'])] = time.time() + gap
+                    conn.commit()
+                    queued = conn.execute("SELECT COUNT(*) FROM shared_frontier "
+                                          "WHERE session_id = ? AND state = 'pending'", (session_id,)).fetchone()[0]
+                    crawled = state['crawled']
+                    self._cond.notify_all()
+                else:
+                    queued = None
+        if pages and queued is not None:
+            self.crawler._update_session_progress(session_id, crawled, queued)
+            print(f"Pages Crawled: {crawled}/{state['max_pages']} | Queue: {queued}")
+        return len(accepted)
+
+    def _store_result(self, session_id, url, page, result, domain):
+        """Store a page a worker crawled, like _build_page/_store_page do for local engines."""
+        page = {key: page.get(key) for key in PAGE_FIELDS}
+        page['session_id'] = session_id
+        fingerprint = page['simhash']
+        page['simhash'] = to_signed(fingerprint)
+        host = urlparse(url).netloc
+        for stage, seconds in (result.get('timings') or {}).items():
+            if stage in WORKER_STAGES and isinstance(seconds, (int, float)):
+                self.crawler.metrics.observe(stage, seconds, session_id, host)
+        near_duplicate_of = self.crawler._near_duplicate(page['canonical_url'], fingerprint)
+        if near_duplicate_of:
+            print(f"Near-duplicate of {near_duplicate_of}: {url}")
+        links = [{key: link.get(key) for key in LINK_FIELDS} for link in result.get('links') or ()]
+        missing_alt = result.get('missing_alt_images')
+        media = [item for item in result.get('media') or () if isinstance(item, dict)]
+        page_data = {'page': page, 'links': links, 'media': media, 'near_duplicate_of': near_duplicate_of,
+                     'seo': {'duplicate_content': near_duplicate_of is not None,
+                             'missing_alt_images': missing_alt if isinstance(missing_alt, int) else None}}
+        return self.crawler._store_page(page_data, url, domain)
+
+    def session_status(self, session_id):
+        """Frontier URLs of a distributed session by state."""
+        with self._cond:
+            counts = dict(self._db().execute("SELECT state, COUNT(*) FROM shared_frontier WHERE session_id = ? "
+                                             "GROUP BY state", (session_id,)).fetchall())
+        return {state: counts.get(state, 0) for state in ('pending', 'leased', 'done', 'failed')}
+
+    def status(self):
+        """Workers seen in the last ``lease_timeout`` seconds, active leases and requeue count."""
+        with self._cond:
+            now = time.time()
+            workers = [{'worker_id': worker_id, 'last_seen': round(now - seen, 1),
+                        'leases': sum(1 for lease in self._leases.values() if lease['worker_id'] == worker_id)}
+                       for worker_id, seen in sorted(self._workers.items()) if now - seen < self.lease_timeout]
+            return {'workers': workers, 'sessions': sorted(self._sessions), 'active_leases': len(self._leases),
+                    'leased_urls': sum(len(lease['urls']) for lease in self._leases.values()),
+                    'requeued_urls': self._requeued}
+
+
+class CrawlWorker:
+    """Worker loop: lease a batch from the coordinator, crawl it and post the results back.
+
+    Fetching, robots.txt checks, parsing, analysis and link extraction all run
+    in the worker; the coordinator only stores what it receives.
+    """
+
+    def __init__(self, coordinator_url, worker_id=None, batch_size=10, parser='lxml', respect_robots=True,
+                 tracking_params=DEFAULT_TRACKING_PATTERNS, idle_interval=1.0, transport=None):
+        self.api = coordinator_url.rstrip('/') + '/api/workers'
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.batch_size = batch_size
+        self.parser = parser
+        self.idle_interval = idle_interval
+        self.transport = transport or HttpTransport()
+        self.robots = RobotsCache(self.transport) if respect_robots else None
+        self.canonicalizer = URLCanonicalizer(tracking_params)
+        self.client = requests.Session()
+
+    def run(self, stop=None):
+        """Crawl until ``stop`` (an Event) is set; waits ``idle_interval`` when there is nothing to lease."""
+        stop = stop or threading.Event()
+        print(f"Worker {self.worker_id} polling {self.api}")
+        while not stop.is_set():
+            try:
+                response = self.client.post(f"{self.api}/lease", timeout=30,
+                                            json={'worker_id': self.worker_id, 'max_urls': self.batch_size})
+                response.raise_for_status()
+            except requests.RequestException as e:
+                print(f"Worker {self.worker_id} cannot reach the coordinator: {e}")
+                stop.wait(self.idle_interval)
+                continue
+            if response.status_code == 204:
+                stop.wait(self.idle_interval)
+                continue
+            self.crawl_lease(response.json())
+
+    def crawl_lease(self, lease):
+        """Crawl the URLs of ``lease`` in order, spacing requests to a host by its delay."""
+        results, last_start, gap = [], {}, lease['delay']
+        # Report well before the lease would expire; every report extends it
+        report_every = lease['lease_timeout'] / 3
+        reported = time.monotonic()
+        for url in lease['urls']:
+            host = urlparse(url).netloc
+            crawl_delay = self.robots.crawl_delay(url) if self.robots else None
+            gap = max(gap, crawl_delay or 0.0)
+            wait = last_start.get(host, float('-inf')) + max(lease['delay'], crawl_delay or 0.0) - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            last_start[host] = time.monotonic()
+            results.append(self.crawl_url(url, lease['domain']))
+            if time.monotonic() - reported > report_every:
+                if not self._report(lease['lease_id'], results):
+                    return
+                results, reported = [], time.monotonic()
+        self._report(lease['lease_id'], results, final=True, delay=gap)
+
+    def _report(self, lease_id, results, final=False, delay=None):
+        try:
+            response = self.client.post(f"{self.api}/leases/{lease_id}", timeout=60,
+                                        json={'results': results, 'final': final, 'delay': delay})
+        except requests.RequestException as e:
+            print(f"Worker {self.worker_id} failed to report lease {lease_id}: {e}")
+            return False
+        if response.status_code == 409:
+            print(f"Lease {lease_id} expired; dropping the rest of it")
+            return False
+        return response.ok
+
+    def crawl_url(self, url, domain):
+        """Result for one URL: a page row with its links and media, an error or a robots.txt skip."""
+        if self.robots and not self.robots.allowed(url):
+            return {'url': url, 'skipped': 'Disallowed by robots.txt'}
+        print(f"Crawling: {url}")
+        # What the coordinator's rate control needs to know about the fetch
+        fetch = {}
+        try:
+            start = time.time()
+            try:
+                response = self.transport.get(url)
+            except Exception as e:
+                return {'url': url, 'error': str(e), 'fetch': {'overloaded': is_overload(error=e)}}
+            response_time = time.time() - start
+            fetch = {'response_time': response_time, 'status_code': response.status_code,
+                     'overloaded': response.retries > 0}
+            if response.status_code != 200:
+                return {'url': url, 'error': f"HTTP {response.status_code}", 'fetch': fetch}
+            timings = dict(response.timings, fetch=response_time)
+            start = time.perf_counter()
+            parsed = parse_page(response.content, response.headers.get('Content-Type'), self.parser)
+            timings['parse'] = time.perf_counter() - start
+            start = time.perf_counter()
+            analysis = analyze_content(parsed['content'])
+            timings['analysis'] = time.perf_counter() - start
+            start = time.perf_counter()
+            base = resolve_base(parsed, response.url or url)
+            links = extract_links(parsed['anchors'], base, domain, self.canonicalizer)
+            media = extract_media(parsed['media'], base)
+            media_counts = count_media(parsed['media'])
+            timings['extract'] = time.perf_counter() - start
+        except Exception as e:
+            return {'url': url, 'error': str(e), 'fetch': fetch}
+        page = dict(analysis, url=url, canonical_url=self.canonicalizer.canonicalize(url), title=parsed['title'],
+                    content=parsed['content'], status_code=response.status_code, response_time=response_time,
+                    etag=response.headers.get('ETag'), last_modified=response.headers.get('Last-Modified'),
+                    cache_control=response.headers.get('Cache-Control'), image_count=media_counts['image_count'],
+                    video_count=media_counts['video_count'], audio_count=media_counts['audio_count'])
+        return {'url': url, 'page': page, 'links': links, 'media': media,
+                'missing_alt_images': media_counts['missing_alt_images'], 'timings': timings, 'fetch': fetch}
+
+
+def _run_worker(coordinator_url, worker_id, options):
+    try:
+        CrawlWorker(coordinator_url, worker_id, **options).run()
+    except KeyboardInterrupt:
+        pass
+
+
+def main(argv=None):
+    """Run distributed crawl workers against a coordinator (the web app)."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--coordinator', default="http://127.0.0.1:5000", help="base URL of the web app")
+    parser.add_argument('--processes', type=int, default=1, help="worker processes to start")
+    parser.add_argument('--worker-id', help="worker name; process numbers are appended with --processes > 1")
+    parser.add_argument('--batch-size', type=int, default=10, help="URLs leased at a time")
+    parser.add_argument('--parser', choices=('lxml', 'html.parser'), default='lxml')
+    parser.add_argument('--ignore-robots', action='store_true')
+    args = parser.parse_args(argv)
+
+    options = {'batch_size': args.batch_size, 'parser': args.parser, 'respect_robots': not args.ignore_robots}
+    worker_id = args.worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    if args.processes <= 1:
+        _run_worker(args.coordinator, worker_id, options)
+        return
+    context = multiprocessing.get_context('spawn')
+    processes = [context.Process(target=_run_worker, args=(args.coordinator, f"{worker_id}-{i}", options),
+                                 name=f"crawl-worker-{i}") for i in range(args.processes)]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.join()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+import itertools
+import json
+import threading
+import time
+from collections import deque
+
+
+class Subscription:
+    """One consumer's bounded event buffer; when full, the oldest events are dropped."""
+
+    def __init__(self, bus, session_id, buffer_size):
+        self.bus = bus
+        self.session_id = session_id
+        self.dropped = 0
+        self._events = deque(maxlen=buffer_size)
+        self._cond = threading.Condition()
+
+    def _push(self, event):
+        with self._cond:
+            if len(self._events) == self._events.maxlen:
+                self.dropped += 1
+            self._events.append(event)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Next event, or None if nothing arrived within ``timeout`` seconds."""
+        with self._cond:
+            if not self._events:
+                self._cond.wait(timeout)
+            return self._events.popleft() if self._events else None
+
+    def take_dropped(self):
+        with self._cond:
+            dropped, self.dropped = self.dropped, 0
+        return dropped
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class EventBus:
+    """In-process publish/subscribe hub for crawl progress.
+
+    Crawl workers publish without blocking; each subscriber either follows a
+    single session or, with ``session_id=None``, every session.
+    """
+
+    def __init__(self, buffer_size=256):
+        self.buffer_size = buffer_size
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def subscribe(self, session_id=None, buffer_size=None):
+        subscription = Subscription(self, session_id, buffer_size or self.buffer_size)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, event_type, session_id, **data):
+        event = {'id': next(self._ids), 'type': event_type, 'session_id': session_id,
+                 'time': time.time(), **data}
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            if subscription.session_id is None or subscription.session_id == session_id:
+                subscription._push(event)
+
+
+def format_sse(event):
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+def iter_sse(subscription, heartbeat=15.0):
+    """Server-sent events stream for a subscription, with keep-alive comments while idle."""
+    try:
+        yield 'retry: 3000\n\n'
+        while True:
+            event = subscription.get(timeout=heartbeat)
+            dropped = subscription.take_dropped()
+            if dropped:
+                # Tell the client it missed events so it can resync from the REST API
+                overflow = {'session_id': subscription.session_id, 'dropped': dropped}
+                yield f"event: overflow\ndata: {json.dumps(overflow)}\n\n"
+            yield format_sse(event) if event else ': keep-alive\n\n'
+    finally:
+        subscription.close()
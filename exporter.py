@@ -0,0 +1,111 @@
+import csv
+import io
+import json
+import sqlite3
+import zlib
+from datetime import datetime
+
+EXPORT_FORMATS = {
+    'json': ('application/json', 'json'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv', 'csv'),
+}
+LINK_COLUMNS = ('url', 'canonical_url', 'text', 'is_internal', 'link_type')
+
+
+def iter_page_chunks(conn, session_id, columns, include_links=False, chunk_size=100, content_store=None):
+    """Yield lists of page dicts for a session, ``chunk_size`` rows at a time (keyset on id).
+
+    With a ``content_store``, ``content`` is decompressed from the store for
+    pages whose text is not inline.
+    """
+    load_content = content_store is not None and 'content' in columns
+    extra = ['content_hash'] if load_content and 'content_hash' not in columns else []
+    select = ', '.join(['id'] + [c for c in columns if c != 'id'] + extra)
+    last_id = 0
+    while True:
+        cursor = conn.execute(
+            f"SELECT {select} FROM pages WHERE session_id = ? AND id > ? ORDER BY id LIMIT ?",
+            (session_id, last_id, chunk_size))
+        names = [desc[0] for desc in cursor.description]
+        pages = [dict(zip(names, row)) for row in cursor.fetchall()]
+        if not pages:
+            return
+        last_id = pages[-1]['id']
+        if load_content:
+            content_store.fill(conn, pages)
+            for page in pages:
+                for column in extra:
+                    del page[column]
+        if include_links:
+            by_page = {page['id']: page for page in pages}
+            for page in pages:
+                page['links'] = []
+            placeholders = ', '.join('?' * len(by_page))
+            for row in conn.execute(
+                    f"SELECT page_id, {', '.join(LINK_COLUMNS)} FROM links WHERE page_id IN ({placeholders}) "
+                    "ORDER BY id", list(by_page)):
+                by_page[row[0]]['links'].append(dict(zip(LINK_COLUMNS, row[1:])))
+        if 'id' not in columns:
+            for page in pages:
+                del page['id']
+        yield pages
+
+
+def iter_export(db_path, session, fmt='json', include_content=True, include_links=False, chunk_size=100,
+                content_store=None):
+    """Stream a session export as text chunks; memory use is bounded by ``chunk_size`` pages.
+
+    ``json`` keeps the layout of the original export
+    (``{"session": ..., "pages": [...], "export_time": ...}``), ``ndjson``
+    writes the session on the first line and one page per line after it, and
+    ``csv`` writes one row per page with links JSON-encoded in a column.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    conn = sqlite3.connect(db_path)
+    try:
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(pages)")]
+        if not include_content:
+            columns.remove('content')
+        chunks = iter_page_chunks(conn, session['id'], columns, include_links, chunk_size, content_store)
+
+        if fmt == 'json':
+            yield '{"session": ' + json.dumps(session) + ', "pages": ['
+            first = True
+            for pages in chunks:
+                body = ', '.join(json.dumps(page) for page in pages)
+                yield body if first else ', ' + body
+                first = False
+            yield '], "export_time": ' + json.dumps(datetime.now().isoformat()) + '}'
+        elif fmt == 'ndjson':
+            yield json.dumps({'session': session, 'export_time': datetime.now().isoformat()}) + '\n'
+            for pages in chunks:
+                yield ''.join(json.dumps(page) + '\n' for page in pages)
+        else:
+            header = columns + (['links'] if include_links else [])
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(header)
+            for pages in chunks:
+                for page in pages:
+                    if include_links:
+                        page['links'] = json.dumps(page['links'])
+                    writer.writerow([page.get(column) for column in header])
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            if buffer.tell():
+                yield buffer.getvalue()
+    finally:
+        conn.close()
+
+
+def gzip_chunks(chunks, level=6):
+    """Compress a stream of text chunks into a gzip byte stream."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
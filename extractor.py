@@ -0,0 +1,212 @@
+import posixpath
+import re
+from urllib.parse import unquote, urldefrag, urljoin, urlparse
+
+from bs4 import BeautifulSoup
+
+try:
+    from lxml import etree
+    import lxml.html
+except ImportError:  # pragma: no cover - lxml is listed in requirements.txt
+    lxml = None
+
+SKIP_TAGS = frozenset(['script', 'style', 'nav', 'footer', 'header'])
+MEDIA_TAGS = {'img': 'image', 'video': 'video', 'audio': 'audio'}
+# <source> takes its media type from the element it belongs to; libxml2 nests consecutive <source> tags,
+# so that is the nearest such ancestor rather than the parent
+SOURCE_PARENTS = {'video': 'video', 'audio': 'audio', 'picture': 'image'}
+_CHARSET_RE = re.compile(rb'charset\s*=\s*["\']?([\w.:-]+)', re.I)
+
+
+def sniff_encoding(content, content_type=None):
+    """Pick the document encoding: Content-Type charset, then <meta> charset, then UTF-8."""
+    if content_type:
+        match = _CHARSET_RE.search(content_type.encode('latin-1', 'ignore'))
+        if match:
+            return match.group(1).decode('ascii')
+    match = _CHARSET_RE.search(content[:2048])
+    if match:
+        return match.group(1).decode('ascii')
+    return 'utf-8'
+
+
+def _media_ref(tag, get, container):
+    """``(tag, file_type, src, alt, title)`` for an img/video/audio/source element; src may be None."""
+    if tag == 'source':
+        srcset = (get('srcset') or '').strip()
+        src = get('src') or (srcset.split(',')[0].split()[0] if srcset else None)
+        return (tag, SOURCE_PARENTS.get(container), src, None, get('title'))
+    src = get('src') or (get('data-src') if tag == 'img' else None)
+    return (tag, MEDIA_TAGS[tag], src, get('alt'), get('title'))
+
+
+def extract_page(content, content_type=None):
+    """Parse ``content`` once with lxml and return title, clean text and anchors.
+
+    Produces the same output as the BeautifulSoup path (``<script>``,
+    ``<style>``, ``<nav>``, ``<footer>`` and ``<header>`` subtrees are dropped
+    from the text, the link list and the media list) without mutating the
+    tree. ``base`` is the ``<base href>``, if any. Anchors are ``(href, text)``
+    pairs with the raw, unjoined href;
+    media are ``(tag, file_type, src, alt, title)`` for every img, video,
+    audio and source element, unresolved.
+    Raises if lxml is missing or the document looks malformed, so callers
+    can fall back to BeautifulSoup.
+    """
+    if lxml is None:
+        raise RuntimeError("lxml is not installed")
+    parser = lxml.html.HTMLParser(encoding=sniff_encoding(content, content_type),
+                                  remove_comments=True, remove_pis=True)
+    root = lxml.html.document_fromstring(content, parser=parser)
+    body = root.find('body')
+    if body is None or (len(body) == 0 and not (body.text or '').strip()):
+        # e.g. an unclosed <title> swallowing the document; let html.parser recover it
+        raise ValueError("document has no body content")
+
+    title = None
+    base = None
+    texts = []
+    anchors = []
+    media = []
+    open_anchors = []
+    walker = etree.iterwalk(root, events=('start', 'end'))
+    for event, el in walker:
+        tag = el.tag if isinstance(el.tag, str) else None
+        if event == 'start':
+            if tag in SKIP_TAGS:
+                walker.skip_subtree()
+                continue
+            if tag == 'title' and title is None:
+                title = (el.text or '').strip()
+            if tag == 'base' and base is None and el.get('href'):
+                base = el.get('href').strip()
+            if tag == 'a' and el.get('href') is not None:
+                open_anchors.append((el, len(texts)))
+            if tag in MEDIA_TAGS or tag == 'source':
+                container = next((a.tag for a in el.iterancestors(*SOURCE_PARENTS)), None) \
+                    if tag == 'source' else None
+                media.append(_media_ref(tag, el.get, container))
+            if el.text and tag is not None:
+                texts.append(el.text)
+        else:
+            if open_anchors and open_anchors[-1][0] is el:
+                _, start = open_anchors.pop()
+                anchor_text = ''.join(s.strip() for s in texts[start:])
+                anchors.append((el.get('href'), anchor_text[:200]))
+            if el.tail and el is not root:
+                texts.append(el.tail)
+
+    return {
+        'title': title if title is not None else 'No Title',
+        'content': re.sub(r'\s+', ' ', ''.join(texts)).strip(),
+        'base': base,
+        'anchors': anchors,
+        'media': media,
+    }
+
+
+def extract_page_soup(content):
+    """BeautifulSoup/html.parser extraction; slower, but tolerant of badly broken markup."""
+    soup = BeautifulSoup(content, 'html.parser')
+    title = soup.title.string.strip() if soup.title and soup.title.string else 'No Title'
+    base = soup.find('base', href=True)
+    for tag in soup(list(SKIP_TAGS)):
+        tag.decompose()
+    anchors = [(tag['href'], tag.get_text(strip=True)[:200]) for tag in soup.find_all('a', href=True)]
+    media = []
+    for tag in soup.find_all(list(MEDIA_TAGS) + ['source']):
+        container = tag.find_parent(list(SOURCE_PARENTS)) if tag.name == 'source' else None
+        media.append(_media_ref(tag.name, tag.get, container.name if container else None))
+    return {
+        'title': title,
+        'content': re.sub(r'\s+', ' ', soup.get_text()).strip(),
+        'base': base['href'].strip() if base and base['href'].strip() else None,
+        'anchors': anchors,
+        'media': media,
+    }
+
+
+def parse_page(content, content_type=None, parser='lxml'):
+    """Extract with ``parser``; lxml falls back to html.parser on documents it cannot handle."""
+    if parser == 'lxml':
+        try:
+            return extract_page(content, content_type)
+        except Exception as e:
+            print(f"lxml extraction failed, falling back to html.parser: {e}")
+    return extract_page_soup(content)
+
+
+def resolve_base(parsed, response_url):
+    """URL relative references of a page resolve against: its ``<base href>``, else the final response URL."""
+    return urljoin(response_url, parsed['base']) if parsed.get('base') else response_url
+
+
+def extract_links(anchors, base_url, domain, canonicalizer):
+    """Resolve ``(href, text)`` anchors against ``base_url`` into http(s) link rows.
+
+    Links to ``domain`` are marked internal; each row carries the resolved URL
+    and its canonical form.
+    """
+    links = []
+    for raw_href, text in anchors:
+        href = urljoin(base_url, raw_href)  # Normalize relative links
+        canonical_url = canonicalizer.canonicalize(href)
+        parsed = urlparse(canonical_url)
+
+        # Only allow http(s) links
+        if parsed.scheme not in ['http', 'https']:
+            continue
+
+        # Determine if link is internal
+        netloc = parsed.netloc
+        is_internal = (netloc == '' or netloc == domain)
+
+        links.append({
+            'url': href,
+            'canonical_url': canonical_url,
+            'text': text,
+            'is_internal': is_internal,
+            'link_type': 'internal' if is_internal else 'external'
+        })
+
+    return links
+
+
+def extract_media(media, base_url):
+    """Resolve ``(tag, file_type, src, alt, title)`` references into media_files rows, one per http(s) URL.
+
+    ``format`` is guessed from the file extension until a download sniffs
+    the real one.
+    """
+    rows = []
+    seen = set()
+    for tag, file_type, src, alt, title in media:
+        if not src or file_type is None:
+            continue
+        url = urldefrag(urljoin(base_url, src.strip()))[0]
+        parsed = urlparse(url)
+        if parsed.scheme not in ('http', 'https') or url in seen:
+            continue
+        seen.add(url)
+        file_name = posixpath.basename(unquote(parsed.path))
+        extension = posixpath.splitext(file_name)[1][1:].lower()
+        rows.append({
+            'url': url,
+            'file_type': file_type,
+            'file_name': file_name[:255] or None,
+            'format': extension if extension.isalnum() and len(extension) <= 5 else None,
+            'alt_text': alt[:500] if alt is not None else None,
+            'title_text': title[:500] if title is not None else None,
+        })
+    return rows
+
+
+def count_media(media):
+    """Per-page media counts: img/video/audio elements and images without an alt attribute."""
+    counts = {'image_count': 0, 'video_count': 0, 'audio_count': 0, 'missing_alt_images': 0}
+    for tag, _, _, alt, _ in media:
+        if tag != 'source':
+            counts[MEDIA_TAGS[tag] + '_count'] += 1
+        if tag == 'img' and alt is None:
+            counts['missing_alt_images'] += 1
+    return counts
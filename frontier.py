@@ -0,0 +1,114 @@
+import hashlib
+import math
+from collections import deque
+
+
+def _digest(url):
+    return hashlib.blake2b(url.encode(), digest_size=16).digest()
+
+
+class BloomFilter:
+    """Memory-bounded probabilistic seen-set.
+
+    Sized for ``capacity`` URLs at the given false-positive ``error_rate``; a
+    false positive means a URL is wrongly treated as already seen and skipped.
+    """
+
+    def __init__(self, capacity=1_000_000, error_rate=0.001):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self._count = 0
+
+    def _positions(self, url):
+        digest = _digest(url)
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, url):
+        """Add ``url``; return True if it was not (probably) present before."""
+        added = False
+        bits = self._bits
+        for pos in self._positions(url):
+            mask = 1 << (pos & 7)
+            if not bits[pos >> 3] & mask:
+                bits[pos >> 3] |= mask
+                added = True
+        if added:
+            self._count += 1
+        return added
+
+    def __contains__(self, url):
+        bits = self._bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(url))
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def nbytes(self):
+        return len(self._bits)
+
+
+class ExactSeenSet:
+    """Exact seen-set holding 128-bit URL digests instead of full strings."""
+
+    def __init__(self):
+        self._digests = set()
+
+    def add(self, url):
+        digest = _digest(url)
+        if digest in self._digests:
+            return False
+        self._digests.add(digest)
+        return True
+
+    def __contains__(self, url):
+        return _digest(url) in self._digests
+
+    def __len__(self):
+        return len(self._digests)
+
+
+def make_seen_set(mode='bloom', capacity=1_000_000, error_rate=0.001):
+    if mode == 'bloom':
+        return BloomFilter(capacity, error_rate)
+    if mode == 'exact':
+        return ExactSeenSet()
+    raise ValueError(f"Unknown frontier mode: {mode}")
+
+
+class Frontier:
+    """FIFO crawl frontier with constant-time dedup on enqueue.
+
+    Every URL ever enqueued is recorded in the seen-set, so a URL is fetched
+    at most once and membership checks never scan the queue. Pending URLs are
+    kept UTF-8 encoded to trim per-entry overhead.
+    """
+
+    def __init__(self, seen=None):
+        self.seen = seen if seen is not None else BloomFilter()
+        self._queue = deque()
+
+    def add(self, url):
+        if not self.seen.add(url):
+            return False
+        self._queue.append(url.encode())
+        return True
+
+    def restore(self, seen, pending):
+        """Reload a checkpointed frontier: mark ``seen`` URLs and queue ``pending`` ones in order."""
+        for url in seen:
+            self.seen.add(url)
+        for url in pending:
+            self.seen.add(url)
+            self._queue.append(url.encode())
+
+    def pop(self):
+        return self._queue.popleft().decode()
+
+    def __len__(self):
+        return len(self._queue)
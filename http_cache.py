@@ -0,0 +1,88 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+
+
+class HttpCache:
+    """On-disk cache of zlib-compressed response bodies keyed by canonical URL.
+
+    Each entry is one file holding a JSON header line (validators and
+    content type) followed by the compressed body. When the cache grows past
+    ``max_bytes`` the least recently used entries are evicted until it is
+    back under 90% of the limit.
+    """
+
+    HEADERS = ('ETag', 'Last-Modified', 'Cache-Control', 'Content-Type')
+
+    def __init__(self, directory="cache/http", max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._entries = {}
+        for entry in os.scandir(directory):
+            if entry.is_file() and entry.name.endswith('.cache'):
+                stat = entry.stat()
+                self._entries[entry.name] = [stat.st_size, stat.st_mtime]
+        self._size = sum(size for size, _ in self._entries.values())
+
+    def _name(self, url):
+        return hashlib.sha1(url.encode()).hexdigest() + '.cache'
+
+    def get(self, url):
+        """Return ``(headers, body)`` for ``url`` or None."""
+        name = self._name(url)
+        path = os.path.join(self.directory, name)
+        try:
+            with open(path, 'rb') as f:
+                headers = json.loads(f.readline())
+                body = zlib.decompress(f.read())
+        except (OSError, ValueError, zlib.error):
+            return None
+        with self._lock:
+            if name in self._entries:
+                self._entries[name][1] = time.time()
+        return headers, body
+
+    def get_headers(self, url):
+        """Return only the stored headers for ``url`` (no body decompression), or None."""
+        try:
+            with open(os.path.join(self.directory, self._name(url)), 'rb') as f:
+                return json.loads(f.readline())
+        except (OSError, ValueError):
+            return None
+
+    def put(self, url, body, headers):
+        name = self._name(url)
+        kept = {key: headers[key] for key in self.HEADERS if headers.get(key)}
+        kept['url'] = url
+        data = json.dumps(kept).encode() + b'\n' + zlib.compress(body, 6)
+        path = os.path.join(self.directory, name)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            old = self._entries.get(name)
+            self._size += len(data) - (old[0] if old else 0)
+            self._entries[name] = [len(data), time.time()]
+            if self._size > self.max_bytes:
+                self._evict(int(self.max_bytes * 0.9))
+
+    def _evict(self, target):
+        for name, (size, _) in sorted(self._entries.items(), key=lambda item: item[1][1]):
+            if self._size <= target:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+            del self._entries[name]
+            self._size -= size
+
+    @property
+    def size(self):
+        return self._size
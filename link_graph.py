@@ -0,0 +1,368 @@
+"""Normalized link storage and whole-session link graph analysis.
+
+Every distinct URL gets one integer id in ``url_dictionary`` and every
+distinct anchor text one in ``anchor_texts``; ``link_edges`` stores each link
+occurrence as integers (source page URL, target URL, raw href when it differs
+from the target, anchor text). ``links`` is kept as a view with the old
+columns so exports and 304 carry-forward read it unchanged. ``crawl_errors``
+records the URLs whose fetch failed, for broken-link reports.
+
+``LinkGraph`` loads a session's internal edges into CSR arrays (NumPy when it
+is installed, ``array`` otherwise) and computes in-degree, PageRank, click
+depth, orphan pages and broken links over them.
+"""
+from array import array
+from collections import deque
+
+try:
+    import numpy as np
+except ImportError:  # optional: the pure-Python path gives the same results, more slowly
+    np = None
+
+
+def init_link_graph(cursor):
+    """Create the graph tables and the ``links`` view; move rows of an old ``links`` table into them."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS url_dictionary (
+            id INTEGER PRIMARY KEY,
+            url TEXT NOT NULL UNIQUE
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS anchor_texts (
+            id INTEGER PRIMARY KEY,
+            text TEXT NOT NULL UNIQUE
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS link_edges (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id INTEGER,
+            page_id INTEGER,
+            source_id INTEGER,
+            target_id INTEGER NOT NULL,
+            url_id INTEGER,
+            text_id INTEGER,
+            is_internal BOOLEAN,
+            FOREIGN KEY (page_id) REFERENCES pages (id),
+            FOREIGN KEY (session_id) REFERENCES crawl_sessions (id)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_link_edges_page_id ON link_edges(page_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_link_edges_session_id ON link_edges(session_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_link_edges_target_id ON link_edges(target_id)")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS crawl_errors (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id INTEGER,
+            url_id INTEGER NOT NULL,
+            error TEXT,
+            error_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (session_id) REFERENCES crawl_sessions (id)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_crawl_errors_session_id ON crawl_errors(session_id)")
+    existing = cursor.execute("SELECT type FROM sqlite_master WHERE name = 'links'").fetchone()
+    if existing and existing[0] == 'table':
+        _migrate_links_table(cursor)
+    cursor.execute("""
+        CREATE VIEW IF NOT EXISTS links AS
+        SELECT e.id AS id, e.page_id AS page_id, e.session_id AS session_id,
+               u.url AS url, c.url AS canonical_url, t.text AS text, e.is_internal AS is_internal,
+               CASE WHEN e.is_internal THEN 'internal' ELSE 'external' END AS link_type
+        FROM link_edges e
+        JOIN url_dictionary c ON c.id = e.target_id
+        JOIN url_dictionary u ON u.id = COALESCE(e.url_id, e.target_id)
+        LEFT JOIN anchor_texts t ON t.id = e.text_id
+    """)
+
+
+def _migrate_links_table(cursor):
+    cursor.execute("""
+        INSERT OR IGNORE INTO url_dictionary (url)
+        SELECT url FROM links UNION SELECT canonical_url FROM links WHERE canonical_url IS NOT NULL
+        UNION SELECT COALESCE(canonical_url, url) FROM pages
+    """)
+    cursor.execute("INSERT OR IGNORE INTO anchor_texts (text) SELECT DISTINCT text FROM links WHERE text IS NOT NULL")
+    cursor.execute("""
+        INSERT INTO link_edges (id, session_id, page_id, source_id, target_id, url_id, text_id, is_internal)
+        SELECT l.id, COALESCE(l.session_id, p.session_id), l.page_id, s.id, c.id, CASE WHEN u.id = c.id THEN NULL ELSE u.id END, t.id,
+               l.is_internal
+        FROM links l
+        JOIN url_dictionary u ON u.url = l.url
+        JOIN url_dictionary c ON c.url = COALESCE(l.canonical_url, l.url)
+        LEFT JOIN pages p ON p.id = l.page_id
+        LEFT JOIN url_dictionary s ON s.url = COALESCE(p.canonical_url, p.url)
+        LEFT JOIN anchor_texts t ON t.text = l.text
+    """)
+    cursor.execute("DROP TABLE links")
+
+
+class Interner:
+    """Maps strings to their integer id in ``table``, inserting new ones; writer thread only.
+
+    Ids are cached, so hot values (site navigation) cost a dict lookup; the
+    cache is dropped once it holds ``max_size`` entries.
+    """
+
+    def __init__(self, table, column, max_size=200_000):
+        self.table = table
+        self.column = column
+        self.max_size = max_size
+        self._ids = {}
+
+    def ids(self, cursor, values):
+        if len(self._ids) > self.max_size:
+            self._ids.clear()
+        missing = list({value for value in values if value is not None and value not in self._ids})
+        if missing:
+            cursor.executemany(f"INSERT OR IGNORE INTO {self.table} ({self.column}) VALUES (?)",
+                               [(value,) for value in missing])
+            for i in range(0, len(missing), 500):
+                chunk = missing[i:i + 500]
+                self._ids.update((value, value_id) for value_id, value in cursor.execute(
+                    f"SELECT id, {self.column} FROM {self.table} WHERE {self.column} IN "
+                    f"({', '.join('?' * len(chunk))})", chunk))
+        return self._ids
+
+
+class LinkStore:
+    """Writes link occurrences and failed URLs as integer rows (used by the database writer)."""
+
+    def __init__(self):
+        self.urls = Interner('url_dictionary', 'url')
+        self.texts = Interner('anchor_texts', 'text')
+
+    def reset(self):
+        """Forget cached ids after a rollback, which may have discarded some of them."""
+        self.urls = Interner('url_dictionary', 'url')
+        self.texts = Interner('anchor_texts', 'text')
+
+    def write_links(self, cursor, items):
+        """``items``: ``(session_id, page_id, page_url, links)`` with link dicts as built by the crawler."""
+        urls, texts = [], []
+        for _, _, page_url, links in items:
+            urls.append(page_url)
+            for link in links:
+                urls.append(link['url'])
+                urls.append(link.get('canonical_url') or link['url'])
+                texts.append(link.get('text'))
+        url_ids = self.urls.ids(cursor, urls)
+        text_ids = self.texts.ids(cursor, texts)
+        rows = []
+        for session_id, page_id, page_url, links in items:
+            source_id = url_ids[page_url]
+            for link in links:
+                target_id = url_ids[link.get('canonical_url') or link['url']]
+                url_id = url_ids[link['url']]
+                rows.append((session_id, page_id, source_id, target_id, None if url_id == target_id else url_id,
+                             text_ids.get(link.get('text')), link.get('is_internal')))
+        cursor.executemany("""
+            INSERT INTO link_edges (session_id, page_id, source_id, target_id, url_id, text_id, is_internal)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+
+    def write_errors(self, cursor, items):
+        """``items``: ``(session_id, url, error)`` for fetches that failed."""
+        url_ids = self.urls.ids(cursor, [url for _, url, _ in items])
+        cursor.executemany("INSERT INTO crawl_errors (session_id, url_id, error) VALUES (?, ?, ?)",
+                           [(session_id, url_ids[url], error) for session_id, url, error in items])
+
+
+class LinkGraph:
+    """A session's internal link graph in CSR form over dense node indexes.
+
+    Nodes ``0 .. crawled - 1`` are the session's pages, the rest are link
+    targets that were not crawled. Parallel edges and self-links are dropped.
+    """
+
+    def __init__(self, url_ids, crawled, indptr, indices, start=None):
+        self.url_ids = url_ids
+        self.crawled = crawled
+        self.indptr = indptr
+        self.indices = indices
+        self.start = start
+
+    @property
+    def nodes(self):
+        return len(self.url_ids)
+
+    @property
+    def edges(self):
+        return len(self.indices)
+
+    @classmethod
+    def load(cls, conn, session_id, start_url=None):
+        page_ids = [row[0] for row in conn.execute("""
+            SELECT DISTINCT u.id FROM pages p JOIN url_dictionary u ON u.url = COALESCE(p.canonical_url, p.url)
+            WHERE p.session_id = ?
+        """, (session_id,))]
+        pairs = conn.execute("""
+            SELECT DISTINCT source_id, target_id FROM link_edges
+            WHERE session_id = ? AND is_internal AND source_id IS NOT NULL AND source_id != target_id
+        """, (session_id,)).fetchall()
+        index = {url_id: i for i, url_id in enumerate(page_ids)}
+        url_ids = list(page_ids)
+        for _, target in pairs:
+            if target not in index:
+                index[target] = len(url_ids)
+                url_ids.append(target)
+        start = None
+        if start_url:
+            row = conn.execute("SELECT id FROM url_dictionary WHERE url = ?", (start_url,)).fetchone()
+            start = index.get(row[0]) if row else None
+        sources = [index[source] for source, _ in pairs if source in index]
+        targets = [index[target] for source, target in pairs if source in index]
+        n = len(url_ids)
+        if np is not None:
+            sources = np.asarray(sources, dtype=np.int64)
+            targets = np.asarray(targets, dtype=np.int64)
+            order = np.argsort(sources, kind='stable')
+            indptr = np.zeros(n + 1, dtype=np.int64)
+            np.cumsum(np.bincount(sources, minlength=n), out=indptr[1:])
+            indices = targets[order].astype(np.int32)
+        else:
+            counts = [0] * (n + 1)
+            for source in sources:
+                counts[source + 1] += 1
+            for i in range(n):
+                counts[i + 1] += counts[i]
+            indptr = array('q', counts)
+            indices = array('i', bytes(4 * len(targets)))
+            fill = list(counts[:n])
+            for source, target in zip(sources, targets):
+                indices[fill[source]] = target
+                fill[source] += 1
+        return cls(url_ids, len(page_ids), indptr, indices, start)
+
+    def _sources(self):
+        """Source node of every edge, aligned with ``indices``."""
+        return np.repeat(np.arange(self.nodes), np.diff(self.indptr))
+
+    def in_degree(self):
+        """Number of distinct crawled pages linking to each node."""
+        if np is not None:
+            return np.bincount(self.indices, minlength=self.nodes)
+        degree = [0] * self.nodes
+        for target in self.indices:
+            degree[target] += 1
+        return degree
+
+    def pagerank(self, damping=0.85, tol=1e-8, max_iter=100):
+        """PageRank by power iteration; rank of dangling nodes (no out-links) is spread over all nodes."""
+        n = self.nodes
+        if not n:
+            return []
+        if np is not None:
+            out_degree = np.diff(self.indptr)
+            sources = self._sources()
+            dangling = out_degree == 0
+            rank = np.full(n, 1.0 / n)
+            weights = np.where(dangling, 0.0, 1.0 / np.maximum(out_degree, 1))
+            for _ in range(max_iter):
+                flow = np.bincount(self.indices, weights=(rank * weights)[sources], minlength=n)
+                new = (1 - damping) / n + damping * (flow + rank[dangling].sum() / n)
+                done = np.abs(new - rank).sum() < tol
+                rank = new
+                if done:
+                    break
+            return rank
+        indptr, indices = self.indptr, self.indices
+        rank = [1.0 / n] * n
+        for _ in range(max_iter):
+            flow = [0.0] * n
+            dangling_sum = 0.0
+            for node in range(n):
+                start, end = indptr[node], indptr[node + 1]
+                if start == end:
+                    dangling_sum += rank[node]
+                    continue
+                share = rank[node] / (end - start)
+                for k in range(start, end):
+                    flow[indices[k]] += share
+            base = (1 - damping) / n + damping * dangling_sum / n
+            new = [base + damping * value for value in flow]
+            done = sum(abs(a - b) for a, b in zip(new, rank)) < tol
+            rank = new
+            if done:
+                break
+        return rank
+
+    def depths(self):
+        """Click depth of each node from the start page (BFS); -1 where unreachable or without a start."""
+        depth = [-1] * self.nodes
+        if self.start is None:
+            return depth
+        depth[self.start] = 0
+        queue = deque([self.start])
+        indptr, indices = self.indptr, self.indices
+        while queue:
+            node = queue.popleft()
+            if node >= self.crawled:
+                continue
+            for k in range(indptr[node], indptr[node + 1]):
+                target = int(indices[k])
+                if depth[target] < 0:
+                    depth[target] = depth[node] + 1
+                    queue.append(target)
+        return depth
+
+    def sources_of(self, node, limit=5):
+        """Up to ``limit`` crawled nodes linking to ``node``."""
+        if np is not None:
+            return [int(source) for source in self._sources()[self.indices == node][:limit]]
+        found = []
+        for source in range(self.crawled):
+            if node in self.indices[self.indptr[source]:self.indptr[source + 1]]:
+                found.append(source)
+                if len(found) == limit:
+                    break
+        return found
+
+
+def analyze_session(conn, session_id, start_url=None, limit=50):
+    """In-degree, PageRank and click depth of the top pages, plus orphan pages and broken links."""
+    graph = LinkGraph.load(conn, session_id, start_url)
+    in_degree = [int(value) for value in graph.in_degree()]
+    rank = [float(value) for value in graph.pagerank()]
+    depth = graph.depths()
+    urls = {}
+
+    def url(node):
+        url_id = graph.url_ids[node]
+        if url_id not in urls:
+            urls[url_id] = conn.execute("SELECT url FROM url_dictionary WHERE id = ?", (url_id,)).fetchone()[0]
+        return urls[url_id]
+
+    top = sorted(range(graph.crawled), key=lambda node: rank[node], reverse=True)[:limit]
+    node_of = {url_id: node for node, url_id in enumerate(graph.url_ids)}
+    broken = []
+    for url_id, error in conn.execute("""
+            SELECT url_id, MAX(error) FROM crawl_errors WHERE session_id = ? GROUP BY url_id
+    """, (session_id,)):
+        node = node_of.get(url_id)
+        broken.append({
+            'url': conn.execute("SELECT url FROM url_dictionary WHERE id = ?", (url_id,)).fetchone()[0],
+            'error': error,
+            'linked_from': in_degree[node] if node is not None else 0,
+            'depth': depth[node] if node is not None and depth[node] >= 0 else None,
+            'sources': [url(source) for source in graph.sources_of(node)] if node is not None else [],
+        })
+    broken.sort(key=lambda item: item['linked_from'], reverse=True)
+    # No internal link points at an orphan; unreachable pages cannot be reached by clicks from the start page
+    orphans = [node for node in range(graph.crawled) if in_degree[node] == 0 and node != graph.start]
+    unreachable = [node for node in range(graph.crawled) if graph.start is not None and depth[node] < 0]
+    return {
+        'session_id': session_id,
+        'nodes': graph.nodes,
+        'edges': graph.edges,
+        'crawled_pages': graph.crawled,
+        'pages': [{'url': url(node), 'pagerank': round(rank[node], 6), 'in_degree': in_degree[node],
+                   'depth': depth[node] if depth[node] >= 0 else None} for node in top],
+        'orphan_count': len(orphans),
+        'orphans': [url(node) for node in orphans[:limit]],
+        'unreachable_count': len(unreachable),
+        'unreachable': [url(node) for node in unreachable[:limit]],
+        'broken_link_count': len(broken),
+        'broken_links': broken[:limit],
+    }
@@ -0,0 +1,315 @@
+"""Media asset pipeline: probes the images, video and audio pages reference and keeps low-res copies.
+
+Extraction records every img/video/audio/source URL of a stored page in
+``media_files`` as ``pending``. ``MediaPipeline`` works through them on its
+own ``workers`` threads and HTTP transport; the crawl path only pays for a
+non-blocking queue put.
+
+- Each URL is fetched once per process. Later references reuse the result,
+  and every update applies to all pending rows of the URL.
+- A streamed ``Range`` request reads at most ``probe_bytes``. That gives the
+  size (Content-Range or Content-Length), the format and, for PNG, GIF, JPEG,
+  WebP and BMP, the dimensions, without fetching the whole file.
+- With Pillow installed, images up to ``max_bytes`` are read in full. A JPEG
+  copy no larger than ``thumbnail_size`` is written under ``media_dir``,
+  named by the content hash, so identical files are stored once.
+
+Rows end as ``downloaded`` (low-res copy written), ``probed`` (metadata only),
+``skipped`` (disallowed by robots.txt) or ``failed``. URLs that arrive while
+the queue is full are dropped, and their rows stay ``pending``.
+"""
+import atexit
+import hashlib
+import os
+import queue
+import struct
+import threading
+import time
+from collections import OrderedDict
+from io import BytesIO
+from urllib.parse import urlparse
+
+try:
+    from PIL import Image
+except ImportError:  # optional: without Pillow media are probed but no low-res copies are made
+    Image = None
+
+MEDIA_FIELDS = ('url', 'file_type', 'file_name', 'format', 'alt_text', 'title_text')
+STATUSES = ('downloaded', 'probed', 'skipped', 'failed')
+# Start-of-frame markers carry the JPEG dimensions; C4, C8 and CC share the range but are not frames
+_JPEG_SOF = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+_SIGNATURES = (
+    (0, b'\x1aE\xdf\xa3', 'webm'),
+    (0, b'OggS', 'ogg'),
+    (0, b'ID3', 'mp3'),
+    (0, b'fLaC', 'flac'),
+    (8, b'WAVE', 'wav'),
+    (4, b'ftypavif', 'avif'),
+    (4, b'ftypqt', 'mov'),
+    (4, b'ftyp', 'mp4'),
+)
+
+
+def init_media(cursor):
+    """Create ``media_files`` (as in database_schema.py, plus ``content_hash``) and its indexes."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS media_files (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            page_id INTEGER,
+            session_id INTEGER,
+            url TEXT NOT NULL,
+            file_type TEXT,
+            file_name TEXT,
+            file_size INTEGER,
+            alt_text TEXT,
+            title_text TEXT,
+            width INTEGER,
+            height INTEGER,
+            format TEXT,
+            local_path TEXT,
+            download_status TEXT DEFAULT 'pending',
+            download_time TIMESTAMP,
+            content_hash TEXT,
+            FOREIGN KEY (page_id) REFERENCES pages (id),
+            FOREIGN KEY (session_id) REFERENCES crawl_sessions (id)
+        )
+    """)
+    if 'content_hash' not in {row[1] for row in cursor.execute("PRAGMA table_info(media_files)")}:
+        cursor.execute("ALTER TABLE media_files ADD COLUMN content_hash TEXT")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_media_session_id ON media_files(session_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_media_page_id ON media_files(page_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_media_url ON media_files(url)")
+
+
+def image_info(data):
+    """``(format, width, height)`` sniffed from the first bytes of a file; unknown parts are None."""
+    if data[:8] == b'\x89PNG\r\n\x1a\n' and data[12:16] == b'IHDR' and len(data) >= 24:
+        return ('png',) + struct.unpack('>II', data[16:24])
+    if data[:6] in (b'GIF87a', b'GIF89a') and len(data) >= 10:
+        return ('gif',) + struct.unpack('<HH', data[6:10])
+    if data[:2] == b'\xff\xd8':
+        return ('jpg',) + _jpeg_size(data)
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return ('webp',) + _webp_size(data)
+    if data[:2] == b'BM' and len(data) >= 26:
+        width, height = struct.unpack('<ii', data[18:26])
+        return 'bmp', width, abs(height)
+    head = data[:256].lstrip()
+    if head.startswith(b'<svg') or (head.startswith(b'<?xml') and b'<svg' in data[:1024]):
+        return 'svg', None, None
+    for offset, signature, name in _SIGNATURES:
+        if data[offset:offset + len(signature)] == signature:
+            return name, None, None
+    if data[:2] in (b'\xff\xfb', b'\xff\xf3', b'\xff\xf2'):
+        return 'mp3', None, None
+    return None, None, None
+
+
+def _jpeg_size(data):
+    i = 2
+    while i + 9 <= len(data):
+        if data[i] != 0xFF:
+            break
+        marker = data[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:  # markers without a length
+            i += 2
+            continue
+        if marker in _JPEG_SOF:
+            height, width = struct.unpack('>HH', data[i + 5:i + 9])
+            return width, height
+        i += 2 + struct.unpack('>H', data[i + 2:i + 4])[0]
+    return None, None
+
+
+def _webp_size(data):
+    chunk = data[12:16]
+    if chunk == b'VP8 ' and data[23:26] == b'\x9d\x01\x2a' and len(data) >= 30:
+        width, height = struct.unpack('<HH', data[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b'VP8L' and len(data) >= 25 and data[20] == 0x2F:
+        bits = int.from_bytes(data[21:25], 'little')
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b'VP8X' and len(data) >= 30:
+        return int.from_bytes(data[24:27], 'little') + 1, int.from_bytes(data[27:30], 'little') + 1
+    return None, None
+
+
+def _total_size(response):
+    """Full file size from Content-Range (206) or Content-Length (200), or None."""
+    try:
+        if response.status_code == 206:
+            total = response.headers.get('Content-Range', '').rpartition('/')[2]
+            return int(total) if total.isdigit() else None
+        return int(response.headers['Content-Length'])
+    except (KeyError, ValueError):
+        return None
+
+
+class MediaPipeline:
+    """Bounded pool of threads probing and downloading media, with results applied through ``writer``.
+
+    ``allowed`` (url -> bool) checks robots.txt; per-URL times go to
+    ``metrics`` as the ``media`` stage.
+    """
+
+    def __init__(self, writer, transport, allowed=None, metrics=None, workers=2, max_queue=1000,
+                 media_dir="media", thumbnail_size=(320, 320), probe_bytes=64 * 1024, max_bytes=5 * 1024 * 1024,
+                 cache_size=10000):
+        self.writer = writer
+        self.transport = transport
+        self.allowed = allowed
+        self.metrics = metrics
+        self.media_dir = media_dir
+        self.thumbnail_size = tuple(thumbnail_size)
+        self.probe_bytes = probe_bytes
+        self.max_bytes = max_bytes
+        self.cache_size = cache_size
+        self._queue = queue.Queue(max_queue)
+        # Finished URLs (LRU) and URLs queued or being fetched, guarded by _lock
+        self._results = OrderedDict()
+        self._inflight = set()
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(('queued', 'dropped', 'reused') + STATUSES, 0)
+        self._closed = False
+        self._threads = [threading.Thread(target=self._run, name=f"media-{i}", daemon=True) for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+        atexit.register(self.close)
+
+    def submit(self, session_id, media):
+        """Queue the media rows of a page already submitted to the writer; never blocks.
+
+        Returns the number of URLs queued for download.
+        """
+        queued = 0
+        with self._lock:
+            for row in media:
+                url = row['url']
+                if url in self._inflight or self._closed:
+                    continue
+                result = self._results.get(url)
+                if result is not None:
+                    self._results.move_to_end(url)
+                    self._counts['reused'] += 1
+                    self.writer.update_media(url, result)
+                    continue
+                try:
+                    self._queue.put_nowait((session_id, url, row.get('file_type')))
+                except queue.Full:
+                    self._counts['dropped'] += 1
+                    continue
+                self._inflight.add(url)
+                self._counts['queued'] += 1
+                queued += 1
+        return queued
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counts, pending=self._queue.qsize(), thumbnails=Image is not None)
+
+    def close(self, timeout=5.0):
+        """Stop the workers; URLs still queued are dropped and their rows stay pending."""
+        if self._closed:
+            return
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            session_id, url, file_type = item
+            start = time.perf_counter()
+            try:
+                result = self._process(url, file_type)
+            except Exception as e:
+                print(f"Failed to fetch media {url}: {e}")
+                result = {'download_status': 'failed'}
+            if self.metrics is not None:
+                self.metrics.observe('media', time.perf_counter() - start, session_id, urlparse(url).netloc)
+            with self._lock:
+                self._inflight.discard(url)
+                self._results[url] = result
+                if len(self._results) > self.cache_size:
+                    self._results.popitem(last=False)
+                self._counts[result['download_status']] += 1
+                # Under the lock, so a page submitted from now on finds the result instead
+                self.writer.update_media(url, result)
+
+    def _process(self, url, file_type):
+        if self.allowed is not None and not self.allowed(url):
+            return {'download_status': 'skipped'}
+        data, size, content_type, complete = self._probe(url)
+        format_name, width, height = image_info(data)
+        if format_name is None and content_type:
+            subtype = content_type.split(';')[0].strip().lower().partition('/')[2]
+            format_name = {'jpeg': 'jpg', 'svg+xml': 'svg', 'mpeg': 'mp3'}.get(subtype, subtype[:10] or None)
+        result = {'file_size': size, 'width': width, 'height': height, 'format': format_name,
+                  'content_hash': hashlib.sha1(data).hexdigest() if complete else None,
+                  'local_path': None, 'download_status': 'probed'}
+        if Image is None or file_type != 'image' or format_name == 'svg' or (size or 0) > self.max_bytes:
+            return result
+        if not complete:
+            response = self.transport.get(url)
+            if response.status_code != 200:
+                return result
+            data = response.content
+            result.update(file_size=len(data), content_hash=hashlib.sha1(data).hexdigest())
+        try:
+            local_path, width, height = self._thumbnail(data, result['content_hash'])
+        except Exception as e:
+            print(f"Could not make a low-res copy of {url}: {e}")
+            return result
+        result.update(local_path=local_path, width=width, height=height, download_status='downloaded')
+        return result
+
+    def _probe(self, url):
+        """First ``probe_bytes`` of ``url``, its full size, Content-Type and whether that was the whole file."""
+        response = self.transport.stream(url, {'Range': f"bytes=0-{self.probe_bytes - 1}"})
+        try:
+            if response.status_code not in (200, 206):
+                raise ValueError(f"HTTP {response.status_code}")
+            chunks, read, exhausted = [], 0, True
+            # A server ignoring Range sends the whole file; stop reading once the probe is full
+            for chunk in response.iter_content(16 * 1024):
+                chunks.append(chunk)
+                read += len(chunk)
+                if read >= self.probe_bytes:
+                    exhausted = False
+                    break
+            data = b''.join(chunks)[:self.probe_bytes]
+            size = _total_size(response)
+            if size is None and exhausted:
+                size = len(data)
+            return data, size, response.headers.get('Content-Type'), size is not None and len(data) >= size
+        finally:
+            response.close()
+
+    def _thumbnail(self, data, content_hash):
+        """Write the low-res JPEG copy named by ``content_hash`` unless it exists; returns it and the full size."""
+        path = os.path.join(self.media_dir, content_hash[:2], f"{content_hash}.jpg")
+        with Image.open(BytesIO(data)) as image:
+            width, height = image.size
+            if not os.path.exists(path):
+                image.draft('RGB', self.thumbnail_size)  # JPEGs decode straight at a reduced scale
+                image.thumbnail(self.thumbnail_size)
+                if image.mode not in ('RGB', 'L'):
+                    image = image.convert('RGB')
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                partial = f"{path}.{threading.get_ident()}.tmp"
+                image.save(partial, 'JPEG', quality=75)
+                os.replace(partial, path)
+        return path, width, height
@@ -0,0 +1,231 @@
+"""Latency histograms for each crawl stage, rendered in the Prometheus text format.
+
+Stages timed on the hot path:
+
+- ``fetch``: the whole HTTP request, split into ``connect`` (DNS, TCP and TLS
+  when a new connection is opened), ``ttfb`` (request sent until response
+  headers arrive) and ``download`` (reading the body)
+- ``parse``: HTML parsing with text and anchor extraction
+- ``analysis``: language, readability and fingerprints, including time queued
+  for an analysis worker
+- ``extract``: resolving and canonicalizing the links of a page
+- ``db_write``: one database writer batch commit
+
+Each observation costs a lock and a bisect, well under the time of the stage
+it measures. Histograms are kept overall, per session and per host; the oldest
+sessions and hosts are dropped beyond ``max_sessions`` / ``max_hosts``.
+"""
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PROFILE_MODES = ('cprofile', 'sampling')
+
+
+class Histogram:
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self, size):
+        self.counts = [0] * size
+        self.sum = 0.0
+        self.count = 0
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class StageMetrics:
+    """Thread-safe stage histograms; ``observe`` is called from fetch, processing and writer threads."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, max_sessions=50, max_hosts=500):
+        self.buckets = tuple(buckets)
+        self.max_sessions = max_sessions
+        self.max_hosts = max_hosts
+        self._overall = {}
+        self._sessions = OrderedDict()  # session_id -> {stage: Histogram}
+        self._hosts = OrderedDict()  # host -> {stage: Histogram}
+        self._lock = threading.Lock()
+
+    def _add(self, histograms, stage, index, seconds):
+        histogram = histograms.get(stage)
+        if histogram is None:
+            histogram = histograms[stage] = Histogram(len(self.buckets) + 1)
+        histogram.counts[index] += 1
+        histogram.sum += seconds
+        histogram.count += 1
+
+    def _series(self, table, key, limit):
+        histograms = table.get(key)
+        if histograms is None:
+            histograms = table[key] = {}
+            if len(table) > limit:
+                table.popitem(last=False)
+        return histograms
+
+    def observe(self, stage, seconds, session_id=None, host=None):
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            self._add(self._overall, stage, index, seconds)
+            if session_id is not None:
+                self._add(self._series(self._sessions, session_id, self.max_sessions), stage, index, seconds)
+            if host:
+                self._add(self._series(self._hosts, host, self.max_hosts), stage, index, seconds)
+
+    @contextmanager
+    def timer(self, stage, session_id=None, host=None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start, session_id, host)
+
+    def _quantile(self, histogram, q):
+        """Upper bound of the bucket holding the ``q`` quantile (the last bound for the overflow bucket)."""
+        rank, seen = q * histogram.count, 0
+        for bound, count in zip(self.buckets, histogram.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.buckets[-1]
+
+    def summary(self, session_id=None):
+        """``{stage: {count, mean, p50, p99}}`` in seconds, for one session or overall."""
+        with self._lock:
+            histograms = self._overall if session_id is None else self._sessions.get(session_id, {})
+            return {stage: {'count': h.count, 'mean': round(h.sum / h.count, 6) if h.count else 0.0,
+                            'p50': self._quantile(h, 0.5), 'p99': self._quantile(h, 0.99)}
+                    for stage, h in histograms.items()}
+
+    def render(self, prefix='crawler'):
+        lines = []
+        with self._lock:
+            families = (
+                (f'{prefix}_stage_seconds', 'Time spent in each crawl stage.', [((), self._overall)]),
+                (f'{prefix}_session_stage_seconds', 'Time spent in each crawl stage per session.',
+                 [((('session', key),), value) for key, value in self._sessions.items()]),
+                (f'{prefix}_host_stage_seconds', 'Time spent in each crawl stage per host.',
+                 [((('host', key),), value) for key, value in self._hosts.items()]),
+            )
+            for name, help_text, series in families:
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for labels, histograms in series:
+                    for stage, histogram in histograms.items():
+                        base = ','.join(f'{key}="{_escape(value)}"' for key, value in labels + (('stage', stage),))
+                        cumulative = 0
+                        for bound, count in zip(self.buckets + (float('inf'),), histogram.counts):
+                            cumulative += count
+                            le = '+Inf' if bound == float('inf') else _format(bound)
+                            lines.append(f'{name}_bucket{{{base},le="{le}"}} {cumulative}')
+                        lines.append(f'{name}_sum{{{base}}} {_format(histogram.sum)}')
+                        lines.append(f'{name}_count{{{base}}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+def render_values(values, prefix='crawler'):
+    """Prometheus lines for ``(name, type, help, value)`` tuples, e.g. counters and gauges."""
+    lines = []
+    for name, metric_type, help_text, value in values:
+        lines.append(f'# HELP {prefix}_{name} {help_text}')
+        lines.append(f'# TYPE {prefix}_{name} {metric_type}')
+        lines.append(f'{prefix}_{name} {_format(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+class SamplingProfiler:
+    """Samples the stacks of every thread each ``interval`` seconds and counts them.
+
+    Unlike cProfile it sees the fetch, parse and writer threads too, at a cost
+    that does not grow with the number of calls.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path):
+        """Write collapsed stacks (flamegraph.pl / speedscope input)."""
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def top(self, limit=20):
+        """Crawler functions by share of samples with them anywhere on the stack (inclusive time)."""
+        modules = {name for name in os.listdir(os.path.dirname(os.path.abspath(__file__))) if name.endswith('.py')}
+        inclusive = Counter()
+        for stack, count in self.stacks.items():
+            for name in set(stack.split(';')):
+                if name.split(':', 1)[0] in modules:
+                    inclusive[name] += count
+        total = sum(self.stacks.values()) or 1
+        return [(name, count / total) for name, count in inclusive.most_common(limit)]
+
+
+@contextmanager
+def profile_session(mode, profile_dir, session_id):
+    """Profile the enclosed crawl and dump the result into ``profile_dir``.
+
+    ``cprofile`` profiles the calling thread (the whole sequential engine, the
+    event loop of the async one) into ``session_<id>.prof``; ``sampling``
+    samples every thread into ``session_<id>.folded``.
+    """
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Unknown profile mode: {mode}")
+    os.makedirs(profile_dir, exist_ok=True)
+    if mode == 'cprofile':
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            path = os.path.join(profile_dir, f"session_{session_id}.prof")
+            profiler.dump_stats(path)
+            print(f"Profile written to {path}")
+            pstats.Stats(profiler).sort_stats('cumulative').print_stats(15)
+        return
+    profiler = SamplingProfiler()
+    profiler.start()
+    try:
+        yield
+    finally:
+        profiler.stop()
+        path = os.path.join(profile_dir, f"session_{session_id}.folded")
+        profiler.dump(path)
+        print(f"Profile written to {path}")
+        for name, share in profiler.top(15):
+            print(f"{share:7.1%}  {name}")
@@ -0,0 +1,135 @@
+"""AIMD rate control per host, driven by response times and overload signals.
+
+Every fetch reports its latency and outcome. Healthy responses raise a host's
+request rate additively (``increase`` requests/sec per response) and its
+connection window by about one per round of requests. Overload halves both:
+
+- HTTP 429 and 5xx answers, including ones the transport had to retry
+- timeouts and connection failures
+- latency climbing to ``latency_factor`` times the host's baseline
+
+Decreases are applied at most once per ``decrease_interval`` seconds, so a
+burst of failures from requests already in flight counts as one signal.
+The inter-request gap (1 / rate) stays within ``[min_delay, max_delay]`` and
+the window within ``[1, max_connections]``. A session's own delay is a floor:
+adaptation can only make it slower, and a host's rate climbs no further than
+the delay last asked for allows.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+import urllib3.exceptions
+
+OVERLOAD_ERRORS = (requests.Timeout, requests.ConnectionError, urllib3.exceptions.TimeoutError,
+                   urllib3.exceptions.ProtocolError)
+
+
+def is_overload(status_code=None, error=None):
+    """Whether a fetch outcome means the host is struggling (429/5xx, timeout, dropped connection)."""
+    if error is not None:
+        return isinstance(error, OVERLOAD_ERRORS)
+    return status_code is not None and (status_code == 429 or status_code >= 500)
+
+
+class HostRate:
+    __slots__ = ('rate', 'window', 'floor', 'latency', 'baseline', 'last_decrease', 'responses', 'decreases')
+
+    def __init__(self, rate, window, floor):
+        self.rate = rate
+        self.window = window
+        self.floor = floor
+        self.latency = None
+        self.baseline = None
+        self.last_decrease = float('-inf')
+        self.responses = 0
+        self.decreases = 0
+
+
+class HostRateController:
+    """Thread-safe per-host delay and concurrency, shared by every session of a crawler."""
+
+    def __init__(self, min_delay=0.05, max_delay=30.0, max_connections=4, increase=0.2, decrease=0.5,
+                 latency_factor=2.0, decrease_interval=1.0, max_hosts=4096):
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.max_connections = max_connections
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.decrease_interval = decrease_interval
+        self.max_hosts = max_hosts
+        self._hosts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _host(self, host, delay):
+        state = self._hosts.get(host)
+        if state is None:
+            # A new host starts at the session's delay with a window of two connections
+            delay = min(max(delay, self.min_delay), self.max_delay)
+            state = self._hosts[host] = HostRate(1.0 / delay, min(2.0, self.max_connections), delay)
+            if len(self._hosts) > self.max_hosts:
+                self._hosts.popitem(last=False)
+        else:
+            self._hosts.move_to_end(host)
+        return state
+
+    def delay(self, host, minimum=1.0):
+        """Current gap between requests to ``host``, never below the session's ``minimum`` delay."""
+        minimum = min(max(minimum, self.min_delay), self.max_delay)
+        with self._lock:
+            state = self._host(host, minimum)
+            state.floor = minimum
+            return max(1.0 / state.rate, minimum)
+
+    def connections(self, host, initial=1.0):
+        """Current number of concurrent requests allowed to ``host``."""
+        with self._lock:
+            return int(self._host(host, initial).window)
+
+    def observe(self, host, response_time=None, status_code=None, overloaded=False):
+        """Record one fetch of a host.
+
+        ``response_time`` is None for a failed fetch; ``overloaded`` flags
+        other overload signals, e.g. a timeout or a response that had to be
+        retried.
+        """
+        now = time.monotonic()
+        with self._lock:
+            state = self._host(host, 1.0)
+            state.responses += 1
+            latency_high = False
+            if response_time is not None:
+                state.latency = response_time if state.latency is None else \
+                    0.7 * state.latency + 0.3 * response_time
+                # The baseline follows the fastest responses and creeps up 1% per response otherwise
+                state.baseline = response_time if state.baseline is None else \
+                    min(state.baseline * 1.01, response_time)
+                latency_high = (state.latency > state.baseline * self.latency_factor
+                                and state.latency - state.baseline > 0.05)
+            if overloaded or latency_high or is_overload(status_code):
+                if now - state.last_decrease >= self.decrease_interval:
+                    state.last_decrease = now
+                    state.decreases += 1
+                    state.rate = max(state.rate * self.decrease, 1.0 / self.max_delay)
+                    state.window = max(state.window * self.decrease, 1.0)
+                return
+            if response_time is not None:
+                state.rate = min(state.rate + self.increase, 1.0 / state.floor)
+                state.window = min(state.window + 1.0 / state.window, self.max_connections)
+
+    def snapshot(self, hosts=None):
+        """Current state per host: delay, connections, requests_per_sec, latencies and counts."""
+        with self._lock:
+            states = self._hosts.items() if hosts is None else \
+                [(host, self._hosts[host]) for host in hosts if host in self._hosts]
+            return {host: {
+                'delay': round(1.0 / state.rate, 4),
+                'connections': int(state.window),
+                'requests_per_sec': round(state.rate, 3),
+                'latency': round(state.latency, 4) if state.latency is not None else None,
+                'baseline_latency': round(state.baseline, 4) if state.baseline is not None else None,
+                'responses': state.responses,
+                'decreases': state.decreases,
+            } for host, state in states}
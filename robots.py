@@ -0,0 +1,153 @@
+"""robots.txt rules per host, fetched once and cached with a TTL.
+
+Rules are matched as in RFC 9309: the most specific (longest) matching
+allow/disallow pattern wins, ``*`` matches any characters and a trailing
+``$`` anchors the end of the path. A missing robots.txt (4xx) allows
+everything; an unreachable one (5xx, network error) disallows the host until
+the shorter ``error_ttl`` runs out.
+"""
+import re
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+ROBOTS_USER_AGENT = 'WebCrawler'
+MAX_CRAWL_DELAY = 60.0
+MAX_ROBOTS_BYTES = 500 * 1024  # the RFC's minimum a crawler must parse; the rest is ignored
+
+
+def _pattern(path):
+    anchored = path.endswith('$')
+    regex = re.escape(path.rstrip('$')).replace(r'\*', '.*')
+    return re.compile(regex + ('$' if anchored else ''))
+
+
+class RobotsRules:
+    """The allow/disallow rules and crawl-delay one robots.txt sets for one user agent."""
+
+    def __init__(self, rules=(), crawl_delay=None, sitemaps=(), disallow_all=False):
+        # (pattern length, allow, compiled pattern), longest first so the first match wins
+        self.rules = sorted(rules, key=lambda rule: (-rule[0], not rule[1]))
+        self.crawl_delay = crawl_delay
+        self.sitemaps = list(sitemaps)
+        self.disallow_all = disallow_all
+
+    @classmethod
+    def parse(cls, text, user_agent=ROBOTS_USER_AGENT):
+        token = user_agent.lower()
+        groups = {'specific': ([], []), 'default': ([], [])}
+        sitemaps = []
+        agents, in_rules, specific = [], False, False
+        for line in text[:MAX_ROBOTS_BYTES].splitlines():
+            line = line.split('#', 1)[0].strip()
+            if ':' not in line:
+                continue
+            field, value = (part.strip() for part in line.split(':', 1))
+            field = field.lower()
+            if field == 'sitemap':
+                if value:
+                    sitemaps.append(value)
+            elif field == 'user-agent':
+                if in_rules:
+                    agents, in_rules = [], False
+                agents.append(value.lower())
+            elif field in ('allow', 'disallow', 'crawl-delay') and agents:
+                in_rules = True
+                targets = []
+                if token in agents:
+                    specific = True
+                    targets.append(groups['specific'])
+                if '*' in agents:
+                    targets.append(groups['default'])
+                for rules, delays in targets:
+                    if field == 'crawl-delay':
+                        try:
+                            delays.append(float(value))
+                        except ValueError:
+                            pass
+                    elif value:
+                        # An empty Disallow allows everything, which is the default anyway
+                        rules.append((len(value), field == 'allow', _pattern(value)))
+        rules, delays = groups['specific'] if specific else groups['default']
+        crawl_delay = min(max(delays[-1], 0.0), MAX_CRAWL_DELAY) if delays else None
+        return cls(rules, crawl_delay, sitemaps)
+
+    def allowed(self, url):
+        parsed = urlparse(url)
+        path = (parsed.path or '/') + ('?' + parsed.query if parsed.query else '')
+        if path == '/robots.txt':
+            return True
+        if self.disallow_all:
+            return False
+        for _, allow, pattern in self.rules:
+            if pattern.match(path):
+                return allow
+        return True
+
+
+class RobotsCache:
+    """Per-host robots.txt rules fetched through the crawler's transport, kept for ``ttl`` seconds.
+
+    Concurrent lookups for a host that is not cached yet wait for a single fetch.
+    """
+
+    def __init__(self, transport, user_agent=ROBOTS_USER_AGENT, ttl=3600.0, error_ttl=300.0, max_hosts=4096):
+        self.transport = transport
+        self.user_agent = user_agent
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.max_hosts = max_hosts
+        self._entries = OrderedDict()  # origin -> (expires, RobotsRules)
+        self._fetching = {}
+        self._lock = threading.Lock()
+
+    def rules(self, url):
+        parsed = urlparse(url)
+        origin = f"{parsed.scheme}://{parsed.netloc}"
+        while True:
+            with self._lock:
+                entry = self._entries.get(origin)
+                if entry and entry[0] > time.time():
+                    self._entries.move_to_end(origin)
+                    return entry[1]
+                pending = self._fetching.get(origin)
+                if pending is None:
+                    pending = self._fetching[origin] = threading.Event()
+                    break
+            pending.wait()
+        try:
+            rules, ttl = self._fetch(origin)
+            with self._lock:
+                self._entries[origin] = (time.time() + ttl, rules)
+                self._entries.move_to_end(origin)
+                while len(self._entries) > self.max_hosts:
+                    self._entries.popitem(last=False)
+        finally:
+            with self._lock:
+                del self._fetching[origin]
+            pending.set()
+        return rules
+
+    def _fetch(self, origin):
+        try:
+            response = self.transport.get(origin + '/robots.txt')
+        except Exception as e:
+            print(f"robots.txt unreachable for {origin}: {e}")
+            return RobotsRules(disallow_all=True), self.error_ttl
+        if response.status_code >= 500:
+            print(f"robots.txt for {origin} returned HTTP {response.status_code}; host disallowed for now")
+            return RobotsRules(disallow_all=True), self.error_ttl
+        if response.status_code >= 400:
+            return RobotsRules(), self.ttl
+        text = response.content[:MAX_ROBOTS_BYTES].decode('utf-8', errors='replace')
+        return RobotsRules.parse(text, self.user_agent), self.ttl
+
+    def allowed(self, url):
+        return self.rules(url).allowed(url)
+
+    def crawl_delay(self, url):
+        return self.rules(url).crawl_delay
+
+    def sitemaps(self, url):
+        return self.rules(url).sitemaps
@@ -0,0 +1,131 @@
+import heapq
+import itertools
+import threading
+from contextlib import contextmanager
+
+
+class FetchLimiter:
+    """Global cap on in-flight HTTP fetches, shared fairly between sessions.
+
+    When a slot frees up it goes to the waiting session with the fewest
+    fetches in flight (oldest request first on ties), so one wide async crawl
+    cannot starve a sequential one.
+    """
+
+    def __init__(self, max_fetches=8):
+        self.max_fetches = max_fetches
+        self._cond = threading.Condition()
+        self._active = {}
+        self._total = 0
+        self._waiting = []
+        self._tickets = itertools.count()
+
+    def _next_ticket(self):
+        return min(self._waiting, key=lambda w: (self._active.get(w[0], 0), w[1]))[1]
+
+    @contextmanager
+    def slot(self, session_id=None):
+        with self._cond:
+            waiter = (session_id, next(self._tickets))
+            self._waiting.append(waiter)
+            self._cond.wait_for(lambda: self._total < self.max_fetches and self._next_ticket() == waiter[1])
+            self._waiting.remove(waiter)
+            self._active[session_id] = self._active.get(session_id, 0) + 1
+            self._total += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._total -= 1
+                self._active[session_id] -= 1
+                if not self._active[session_id]:
+                    del self._active[session_id]
+                self._cond.notify_all()
+
+    def active(self, session_id):
+        with self._cond:
+            return self._active.get(session_id, 0)
+
+
+class CrawlScheduler:
+    """Runs crawl sessions on a fixed pool of worker threads.
+
+    Pending sessions wait in a priority queue (higher ``priority`` first,
+    FIFO within a priority). Running sessions are stopped cooperatively: the
+    crawl engines poll ``stop_status`` between pages.
+    """
+
+    def __init__(self, workers=2, max_fetches=8):
+        self.workers = workers
+        self.limiter = FetchLimiter(max_fetches)
+        self._cond = threading.Condition()
+        self._heap = []
+        self._queued = {}
+        self._running = set()
+        self._stopping = {}
+        self._seq = itertools.count()
+        self._threads = [threading.Thread(target=self._work, name=f'crawl-worker-{i}', daemon=True)
+                         for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, session_id, run, priority=0):
+        """Queue ``run()`` for ``session_id``; return its 1-based queue position."""
+        with self._cond:
+            entry = [-priority, next(self._seq), session_id, run]
+            self._queued[session_id] = entry
+            heapq.heappush(self._heap, entry)
+            self._cond.notify()
+            return self._position(session_id)
+
+    def position(self, session_id):
+        """1-based position among queued sessions, or None if not queued."""
+        with self._cond:
+            return self._position(session_id)
+
+    def _position(self, session_id):
+        entry = self._queued.get(session_id)
+        if entry is None:
+            return None
+        return sum(1 for other in self._queued.values() if other[:2] < entry[:2]) + 1
+
+    def stop(self, session_id, status):
+        """Withdraw a queued session or ask a running one to stop with ``status``.
+
+        Returns 'queued' or 'running' for where the session was found, or None.
+        """
+        with self._cond:
+            entry = self._queued.pop(session_id, None)
+            if entry is not None:
+                entry[3] = None  # Lazily dropped when it reaches the top of the heap
+                return 'queued'
+            if session_id in self._running:
+                self._stopping[session_id] = status
+                return 'running'
+            return None
+
+    def stop_status(self, session_id):
+        """The status a running session has been asked to stop with, if any."""
+        return self._stopping.get(session_id)
+
+    def running(self):
+        with self._cond:
+            return sorted(self._running)
+
+    def _work(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._heap)
+                _, _, session_id, run = heapq.heappop(self._heap)
+                if run is None:
+                    continue
+                del self._queued[session_id]
+                self._running.add(session_id)
+            try:
+                run()
+            except Exception as e:
+                print(f"Crawl session {session_id} failed: {e}")
+            finally:
+                with self._cond:
+                    self._running.discard(session_id)
+                    self._stopping.pop(session_id, None)
@@ -0,0 +1,84 @@
+"""Full-text search over crawled pages with SQLite FTS5.
+
+``pages_fts`` is an external-content index over the ``pages_text`` view
+(page titles plus text decompressed from the content store): it stores only
+the inverted index and decompresses a page's text only to build its snippet.
+The database writer indexes each page in the transaction that inserts it, so
+pages are searchable as soon as they are committed. Connections that search
+or delete pages need ``ContentStore.register`` for the view's
+``page_content`` function.
+"""
+import re
+
+_TERM = re.compile(r'\w+\*?')
+
+
+def init_search(cursor):
+    """Create the text view, FTS index and delete trigger; (re)index existing pages when the index is new.
+
+    Needs the content store tables and a connection with ``page_content`` registered.
+    """
+    existing = cursor.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'pages_fts'").fetchone()
+    if existing and 'pages_text' not in existing[0]:
+        # Index built over pages.content before page text moved into the content store
+        cursor.execute("DROP TRIGGER IF EXISTS pages_fts_insert")
+        cursor.execute("DROP TRIGGER IF EXISTS pages_fts_delete")
+        cursor.execute("DROP TABLE pages_fts")
+        existing = None
+    cursor.execute("""
+        CREATE VIEW IF NOT EXISTS pages_text AS
+        SELECT p.id AS id, p.title AS title, COALESCE(p.content, page_content(b.dict_id, b.data)) AS content
+        FROM pages p LEFT JOIN content_blobs b ON b.content_hash = p.content_hash
+    """)
+    cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS pages_fts USING fts5(
+            title, content, content='pages_text', content_rowid='id'
+        )
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS pages_fts_delete BEFORE DELETE ON pages BEGIN
+            INSERT INTO pages_fts (pages_fts, rowid, title, content)
+            SELECT 'delete', id, title, content FROM pages_text WHERE id = old.id;
+        END
+    """)
+    if not existing:
+        cursor.execute("INSERT INTO pages_fts (pages_fts) VALUES ('rebuild')")
+
+
+def fts_query(text):
+    """Turn free text into an FTS5 query: every word must match, ``word*`` is a prefix search.
+
+    Words are quoted so user input can never be parsed as FTS5 operators.
+    """
+    terms = []
+    for term in _TERM.findall(text):
+        prefix = term.endswith('*')
+        terms.append('"' + term.rstrip('*') + '"' + ('*' if prefix else ''))
+    return ' '.join(terms)
+
+
+def search_pages(conn, query, session_id=None, language=None, limit=20, offset=0):
+    """Pages matching ``query`` best-first by bm25 (title hits weigh more), with highlighted snippets."""
+    match = fts_query(query)
+    if not match:
+        return []
+    sql = """
+        SELECT p.id, p.session_id, p.url, p.title, p.language_detected, p.crawl_time,
+               bm25(pages_fts, 5.0, 1.0) AS rank,
+               snippet(pages_fts, 1, '<mark>', '</mark>', '...', 16) AS snippet
+        FROM pages_fts JOIN pages p ON p.id = pages_fts.rowid
+        WHERE pages_fts MATCH ?
+    """
+    params = [match]
+    if session_id is not None:
+        sql += " AND p.session_id = ?"
+        params.append(session_id)
+    if language:
+        sql += " AND p.language_detected = ?"
+        params.append(language)
+    sql += " ORDER BY rank LIMIT ? OFFSET ?"
+    params += [limit, offset]
+    cursor = conn.execute(sql, params)
+    columns = [desc[0] for desc in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
@@ -0,0 +1,92 @@
+import hashlib
+import re
+from collections import Counter
+
+_WORD = re.compile(r'\w+')
+
+
+def simhash(text, shingle_size=3):
+    """64-bit SimHash of the word shingles in ``text``.
+
+    Texts that differ in a few words (a timestamp, a sidebar link) get
+    fingerprints a few bits apart; unrelated texts differ in about half the bits.
+    """
+    words = _WORD.findall(text.lower())
+    shingles = {' '.join(words[i:i + shingle_size]) for i in range(max(1, len(words) - shingle_size + 1))}
+    digests = [hashlib.blake2b(s.encode(), digest_size=8).digest() for s in shingles]
+    if not digests:
+        return 0
+    # Count set bits per position one byte column at a time rather than 64 shifts per shingle
+    threshold = len(digests) / 2
+    fingerprint = 0
+    for j, column in enumerate(zip(*digests)):
+        counts = [0] * 8
+        for value, count in Counter(column).items():
+            for bit in range(8):
+                if value >> bit & 1:
+                    counts[bit] += count
+        for bit, count in enumerate(counts):
+            if count > threshold:
+                fingerprint |= 1 << (j * 8 + bit)
+    return fingerprint
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+def to_signed(fingerprint):
+    """Map an unsigned 64-bit fingerprint into SQLite's signed INTEGER range."""
+    return fingerprint - (1 << 64) if fingerprint >= 1 << 63 else fingerprint
+
+
+def from_signed(value):
+    return value + (1 << 64) if value < 0 else value
+
+
+class SimHashIndex:
+    """Finds fingerprints within ``max_distance`` bits without scanning every entry.
+
+    The 64 bits are split into ``max_distance + 1`` bands; by the pigeonhole
+    principle two fingerprints that differ in at most ``max_distance`` bits
+    agree exactly on at least one band, so only entries sharing a band value
+    are compared.
+    """
+
+    def __init__(self, max_distance=3, bits=64):
+        self.max_distance = max_distance
+        bands = max_distance + 1
+        width, extra = divmod(bits, bands)
+        self._bands = []
+        shift = 0
+        for i in range(bands):
+            size = width + (1 if i < extra else 0)
+            self._bands.append((shift, (1 << size) - 1, {}))
+            shift += size
+        self._keys = {}
+
+    def add(self, fingerprint, key):
+        """Index ``fingerprint`` under ``key``; re-adding a key replaces its fingerprint."""
+        old = self._keys.get(key)
+        if old == fingerprint:
+            return
+        for shift, mask, buckets in self._bands:
+            if old is not None:
+                buckets[old >> shift & mask].pop(key, None)
+            buckets.setdefault(fingerprint >> shift & mask, {})[key] = fingerprint
+        self._keys[key] = fingerprint
+
+    def find(self, fingerprint, exclude=None):
+        """Return ``(key, distance)`` of the nearest entry within range, ignoring ``exclude``, or None."""
+        best = None
+        for shift, mask, buckets in self._bands:
+            for key, other in buckets.get(fingerprint >> shift & mask, {}).items():
+                if key == exclude:
+                    continue
+                distance = hamming(fingerprint, other)
+                if distance <= self.max_distance and (best is None or distance < best[1]):
+                    best = (key, distance)
+        return best
+
+    def __len__(self):
+        return len(self._keys)
@@ -0,0 +1,103 @@
+"""Streaming sitemap.xml reader for seeding the crawl frontier.
+
+Sitemaps are read straight off the response with ``lxml.etree.iterparse`` and
+each ``<url>``/``<sitemap>`` element is discarded once its ``<loc>`` has been
+read, so a 50,000-URL sitemap never sits in memory as a tree. Sitemap
+indexes are followed breadth-first and gzipped sitemaps (``.xml.gz`` or a
+gzip body) are decompressed on the fly.
+"""
+import gzip
+from urllib.parse import urljoin
+
+from lxml import etree
+
+MAX_SITEMAP_BYTES = 50 * 1024 * 1024  # the protocol's limit for one uncompressed sitemap
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+class _CappedReader:
+    """File-like view of ``raw`` that replays ``prefix`` first and stops after ``limit`` bytes."""
+
+    def __init__(self, raw, limit, prefix=b''):
+        self.raw = raw
+        self.remaining = limit
+        self.prefix = prefix
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = 64 * 1024
+        if self.prefix:
+            data, self.prefix = self.prefix[:size], self.prefix[size:]
+        else:
+            data = self.raw.read(min(size, self.remaining)) if self.remaining > 0 else b''
+        self.remaining -= len(data)
+        return data
+
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1] if isinstance(tag, str) else ''
+
+
+def _open(transport, url, max_bytes):
+    response = transport.stream(url)
+    if response.status_code != 200:
+        response.close()
+        raise ValueError(f"HTTP {response.status_code}")
+    head = response.raw.read(2)
+    stream = _CappedReader(response.raw, max_bytes, head)
+    if head == GZIP_MAGIC:
+        # A .xml.gz file rather than gzip Content-Encoding, which urllib3 has already undone
+        stream = _CappedReader(gzip.GzipFile(fileobj=stream), max_bytes)
+    return response, stream
+
+
+def iter_entries(stream):
+    """Yield ``('url' | 'sitemap', loc)`` for every entry of a sitemap or sitemap index."""
+    parser = etree.iterparse(stream, events=('end',), resolve_entities=False, no_network=True)
+    for _, elem in parser:
+        kind = _local_name(elem.tag)
+        if kind not in ('url', 'sitemap'):
+            continue
+        for child in elem:
+            if _local_name(child.tag) == 'loc' and child.text and child.text.strip():
+                yield kind, child.text.strip()
+                break
+        # Drop the finished entry and the empty siblings before it
+        elem.clear()
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+
+
+def iter_sitemap_urls(transport, sitemap_urls, max_urls=10000, max_sitemaps=50, max_bytes=MAX_SITEMAP_BYTES):
+    """Yield page URLs from ``sitemap_urls`` and the sitemaps their indexes list.
+
+    Stops after ``max_urls`` page URLs or ``max_sitemaps`` fetched files. A
+    sitemap that fails to download or parse is reported and skipped.
+    """
+    queue = list(sitemap_urls)
+    visited = set()
+    yielded = 0
+    while queue and len(visited) < max_sitemaps:
+        url = queue.pop(0)
+        if url in visited:
+            continue
+        visited.add(url)
+        try:
+            response, stream = _open(transport, url, max_bytes)
+        except Exception as e:
+            print(f"Skipping sitemap {url}: {e}")
+            continue
+        try:
+            for kind, loc in iter_entries(stream):
+                loc = urljoin(url, loc)
+                if kind == 'sitemap':
+                    queue.append(loc)
+                    continue
+                yield loc
+                yielded += 1
+                if yielded >= max_urls:
+                    return
+        except (etree.XMLSyntaxError, OSError, EOFError) as e:
+            print(f"Skipping rest of sitemap {url}: {e}")
+        finally:
+            response.close()
@@ -1,6 +1,11 @@
 // Global variables
 let currentSessionId = null;
 let refreshInterval = null;
+let eventSource = null;
+let sessionEventSource = null;
+let refreshTimer = null;
+let lastPageId = 0;
+let currentPages = [];
 
 // Initialize the application
 document.addEventListener('DOMContentLoaded', function() {
@@ -8,12 +13,81 @@ document.addEventListener('DOMContentLoaded', function() {
     loadSessions();
     setupEventListeners();
     
-    // Auto-refresh every 30 seconds
-    refreshInterval = setInterval(() => {
+    if (window.EventSource) {
+        subscribeToEvents();
+    } else {
+        // Auto-refresh every 30 seconds
+        refreshInterval = setInterval(() => {
+            loadStats();
+            loadSessions();
+        }, 30000);
+    }
+});
+
+// Update counters from crawl events; re-fetch only when a session starts or finishes, or events were missed
+function subscribeToEvents() {
+    eventSource = new EventSource('/api/events');
+    ['queued', 'started', 'completed', 'paused', 'cancelled', 'overflow'].forEach(type => {
+        eventSource.addEventListener(type, scheduleRefresh);
+    });
+    eventSource.addEventListener('page', e => {
+        const event = JSON.parse(e.data);
+        addToStat('totalPages', 1);
+        addToStat('totalLinks', event.links || 0);
+    });
+    eventSource.addEventListener('progress', e => {
+        const event = JSON.parse(e.data);
+        const pages = document.querySelector(`.session-card[data-session-id="${event.session_id}"] .session-pages`);
+        if (pages) pages.textContent = event.pages_crawled;
+    });
+}
+
+function addToStat(id, amount) {
+    const element = document.getElementById(id);
+    element.textContent = (parseInt(element.textContent) || 0) + amount;
+}
+
+// Coalesce bursts of events into at most one refresh per second
+function scheduleRefresh() {
+    if (refreshTimer) return;
+    refreshTimer = setTimeout(() => {
+        refreshTimer = null;
         loadStats();
         loadSessions();
-    }, 30000);
-});
+    }, 1000);
+}
+
+// Follow a single session while its details are open
+function subscribeToSession(sessionId) {
+    unsubscribeFromSession();
+    if (!window.EventSource) return;
+    
+    let pending = null;
+    const refreshModal = () => {
+        if (pending) return;
+        pending = setTimeout(async () => {
+            pending = null;
+            if (currentSessionId !== sessionId) return;
+            const sessionResponse = await fetch(`/api/sessions/${sessionId}/status`);
+            const newPages = await loadSessionPages(sessionId, lastPageId);
+            if (sessionResponse.ok && newPages && currentSessionId === sessionId) {
+                const sessionData = await sessionResponse.json();
+                displaySessionModal(sessionData.session, currentPages.concat(newPages));
+            }
+        }, 1000);
+    };
+    sessionEventSource = new EventSource(`/api/sessions/${sessionId}/events`);
+    ['started', 'page', 'completed', 'paused', 'cancelled', 'error', 'overflow'].forEach(type => {
+        sessionEventSource.addEventListener(type, refreshModal);
+    });
+}
+
+function unsubscribeFromSession() {
+    if (sessionEventSource) {
+        sessionEventSource.close();
+        sessionEventSource = null;
+    }
+}
 
 // Set up event listeners
 function setupEventListeners() {
@@ -129,7 +203,7 @@ function displaySessions(sessions) {
     }
     
     container.innerHTML = sessions.map(session => `
-        <div class="session-card" onclick="showSessionDetails(${session.id})">
+        <div class="session-card" data-session-id="${session.id}" onclick="showSessionDetails(${session.id})">
             <div class="session-header">
                 <div class="session-url">${session.start_url}</div>
                 <div class="session-status status-${session.status}">
@@ -138,7 +212,7 @@ function displaySessions(sessions) {
             </div>
             <div class="session-info">
                 <div class="info-item">
-                    <span class="info-value">${session.total_pages}</span>
+                    <span class="info-value session-pages">${session.total_pages}</span>
                     <span class="info-label">Pages</span>
                 </div>
                 <div class="info-item">
@@ -168,11 +242,13 @@ async function showSessionDetails(sessionId) {
         const sessionData = await sessionResponse.json();
         
         // Load session pages
-        const pagesResponse = await fetch(`/api/sessions/${sessionId}/pages`);
-        const pagesData = await pagesResponse.json();
+        const pages = await loadSessionPages(sessionId);
         
-        if (sessionResponse.ok && pagesResponse.ok) {
-            displaySessionModal(sessionData.session, pagesData.pages);
+        if (sessionResponse.ok && pages) {
+            displaySessionModal(sessionData.session, pages);
+            if (['queued', 'running'].includes(sessionData.session.status)) {
+                subscribeToSession(sessionId);
+            }
         } else {
             showMessage('Error loading session details', 'error');
         }
@@ -181,6 +257,24 @@ async function showSessionDetails(sessionId) {
     }
 }
 
+// Load session pages with keyset pagination, starting after afterId
+async function loadSessionPages(sessionId, afterId = 0) {
+    const pages = [];
+    let hasMore = true;
+    
+    while (hasMore) {
+        const response = await fetch(`/api/sessions/${sessionId}/pages?after_id=${afterId}&limit=500`);
+        const data = await response.json();
+        if (!response.ok) {
+            return null;
+        }
+        pages.push(...data.pages);
+        afterId = data.next_after_id;
+        hasMore = data.has_more;
+    }
+    return pages;
+}
+
 // Display session details in modal
 function displaySessionModal(session, pages) {
     const modal = document.getElementById('sessionModal');
@@ -188,6 +282,8 @@ function displaySessionModal(session, pages) {
     const sessionDetails = document.getElementById('sessionDetails');
     const pagesList = document.getElementById('pagesList');
     
+    currentPages = pages;
+    lastPageId = pages.length ? pages[pages.length - 1].id : 0;
     modalTitle.textContent = `Session #${session.id} - ${session.start_url}`;
     
     // Session details
@@ -197,6 +293,11 @@ function displaySessionModal(session, pages) {
                 <strong>Status:</strong><br>
                 <span class="session-status status-${session.status}">${session.status}</span>
             </div>
+            ${session.queue_position ? `
+            <div>
+                <strong>Queue Position:</strong><br>
+                ${session.queue_position}
+            </div>` : ''}
             <div>
                 <strong>Pages Crawled:</strong><br>
                 ${session.total_pages} / ${session.max_pages}
@@ -249,32 +350,62 @@ function displaySessionModal(session, pages) {
         `;
     }
     
+    const active = ['queued', 'running'].includes(session.status);
+    document.getElementById('resumeButton').classList.toggle('hidden', !['interrupted', 'paused'].includes(session.status));
+    document.getElementById('pauseButton').classList.toggle('hidden', !active);
+    document.getElementById('cancelButton').classList.toggle('hidden', !active && !['interrupted', 'paused'].includes(session.status));
     modal.classList.remove('hidden');
 }
 
+// Resume an interrupted session from its checkpoint
+async function resumeSession() {
+    if (!currentSessionId) return;
+    const sessionId = currentSessionId;
+    
+    try {
+        const response = await fetch(`/api/sessions/${sessionId}/resume`, { method: 'POST' });
+        const data = await response.json();
+        
+        if (response.ok) {
+            showMessage(`Session #${sessionId} queued to resume (position ${data.queue_position})`, 'success');
+            showSessionDetails(sessionId);
+        } else {
+            showMessage(`Error: ${data.error}`, 'error');
+        }
+    } catch (error) {
+        showMessage(`Network error: ${error.message}`, 'error');
+    }
+}
+
 // Export session data
-async function exportSession() {
+function exportSession() {
+    if (!currentSessionId) return;
+    
+    // The server streams the export as a file download, so the browser never holds it in memory
+    const a = document.createElement('a');
+    a.href = `/api/sessions/${currentSessionId}/export?format=json`;
+    a.download = `crawl_session_${currentSessionId}_${new Date().getTime()}.json`;
+    document.body.appendChild(a);
+    a.click();
+    document.body.removeChild(a);
+    
+    showMessage('Session export started', 'success');
+}
+
+// Pause or cancel the open session
+async function stopSession(action) {
     if (!currentSessionId) return;
+    const sessionId = currentSessionId;
     
     try {
-        const response = await fetch(`/api/sessions/${currentSessionId}/export`);
+        const response = await fetch(`/api/sessions/${sessionId}/${action}`, { method: 'POST' });
         const data = await response.json();
         
         if (response.ok) {
-            // Create and download JSON file
-            const blob = new Blob([JSON.stringify(data, null, 2)], { type: 'application/json' });
-            const url = URL.createObjectURL(blob);
-            const a = document.createElement('a');
-            a.href = url;
-            a.download = `crawl_session_${currentSessionId}_${new Date().getTime()}.json`;
-            document.body.appendChild(a);
-            a.click();
-            document.body.removeChild(a);
-            URL.revokeObjectURL(url);
-            
-            showMessage('Session data exported successfully!', 'success');
+            showMessage(`Session #${sessionId}: ${data.status}`, 'success');
+            showSessionDetails(sessionId);
         } else {
-            showMessage(`Export error: ${data.error}`, 'error');
+            showMessage(`Error: ${data.error}`, 'error');
         }
     } catch (error) {
         showMessage(`Network error: ${error.message}`, 'error');
@@ -286,6 +417,7 @@ function closeModal() {
     const modal = document.getElementById('sessionModal');
     modal.classList.add('hidden');
     currentSessionId = null;
+    unsubscribeFromSession();
 }
 
 // Refresh sessions manually
@@ -327,4 +459,8 @@ window.addEventListener('beforeunload', function() {
     if (refreshInterval) {
         clearInterval(refreshInterval);
     }
+    if (eventSource) {
+        eventSource.close();
+    }
+    unsubscribeFromSession();
 });
\ No newline at end of file
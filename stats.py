@@ -0,0 +1,117 @@
+"""Materialized crawl counters.
+
+The write path keeps ``crawl_stats`` (global) and the per-session counter
+columns of ``crawl_sessions`` up to date, so ``/api/stats`` never has to scan
+``pages`` or ``links``. Run this module to bring a database up to the
+crawler's schema and recompute every counter from the base tables:
+
+    python stats.py [database/crawler.db]
+"""
+import sqlite3
+import sys
+import threading
+import time
+
+COUNTERS = ('total_sessions', 'total_pages', 'total_links', 'total_errors', 'total_media_files')
+SESSION_COUNTER_COLUMNS = {
+    'total_links': 'INTEGER DEFAULT 0',
+    'total_errors': 'INTEGER DEFAULT 0',
+    'avg_response_time': 'REAL DEFAULT 0.0',
+    'response_time_samples': 'INTEGER DEFAULT 0',
+    'total_media_files': 'INTEGER DEFAULT 0',
+}
+
+
+def init_stats(cursor):
+    """Add the counter columns and table; seed them from the base tables while any counter is missing.
+
+    Needs the base tables the crawler creates (see crawler.init_database).
+    """
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(crawl_sessions)")}
+    for name, column_type in SESSION_COUNTER_COLUMNS.items():
+        if name not in columns:
+            cursor.execute(f"ALTER TABLE crawl_sessions ADD COLUMN {name} {column_type}")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS crawl_stats (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    existing = {row[0] for row in cursor.execute("SELECT name FROM crawl_stats")}
+    if set(COUNTERS) - existing:
+        # Rows and their values land in one transaction, so a failed seed is retried on the next start
+        cursor.executemany("INSERT OR IGNORE INTO crawl_stats (name, value) VALUES (?, 0)",
+                           [(name,) for name in COUNTERS])
+        reconcile_stats(cursor)
+
+
+def reconcile_stats(cursor):
+    """Recompute per-session and global counters from crawl_sessions, pages, links, crawl_errors and media_files."""
+    cursor.execute("""
+        UPDATE crawl_sessions SET
+            total_links = (SELECT COUNT(*) FROM links WHERE links.session_id = crawl_sessions.id),
+            avg_response_time = COALESCE((SELECT AVG(response_time) FROM pages
+                                          WHERE pages.session_id = crawl_sessions.id), 0.0),
+            response_time_samples = (SELECT COUNT(response_time) FROM pages
+                                     WHERE pages.session_id = crawl_sessions.id),
+            total_errors = (SELECT COUNT(*) FROM crawl_errors WHERE crawl_errors.session_id = crawl_sessions.id),
+            total_media_files = (SELECT COUNT(*) FROM media_files WHERE media_files.session_id = crawl_sessions.id)
+    """)
+    values = {
+        'total_sessions': cursor.execute("SELECT COUNT(*) FROM crawl_sessions").fetchone()[0],
+        'total_pages': cursor.execute("SELECT COUNT(*) FROM pages").fetchone()[0],
+        'total_links': cursor.execute("SELECT COUNT(*) FROM links").fetchone()[0],
+        'total_errors': cursor.execute("SELECT COALESCE(SUM(total_errors), 0) FROM crawl_sessions").fetchone()[0],
+        'total_media_files': cursor.execute("SELECT COUNT(*) FROM media_files").fetchone()[0],
+    }
+    cursor.executemany("UPDATE crawl_stats SET value = ? WHERE name = ?",
+                       [(value, name) for name, value in values.items()])
+    return values
+
+
+def read_stats(conn):
+    stats = dict(conn.execute("SELECT name, value FROM crawl_stats").fetchall())
+    stats['active_sessions'] = conn.execute(
+        "SELECT COUNT(*) FROM crawl_sessions WHERE status = 'running'").fetchone()[0]
+    return stats
+
+
+class StatsCache:
+    """Serves read_stats() from memory, re-reading the database at most every ``ttl`` seconds."""
+
+    def __init__(self, db_path, ttl=2.0):
+        self.db_path = db_path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._stats = None
+        self._loaded_at = 0.0
+
+    def get(self):
+        with self._lock:
+            if self._stats is None or time.monotonic() - self._loaded_at > self.ttl:
+                conn = sqlite3.connect(self.db_path)
+                try:
+                    self._stats = read_stats(conn)
+                finally:
+                    conn.close()
+                self._loaded_at = time.monotonic()
+            return dict(self._stats)
+
+
+def main(db_path="database/crawler.db"):
+    # The crawler imports this module; its migration creates every table the counters are computed from
+    from content_store import ContentStore
+    from crawler import init_database
+
+    conn = ContentStore(db_path).register(sqlite3.connect(db_path))
+    cursor = conn.cursor()
+    init_database(cursor)
+    values = reconcile_stats(cursor)
+    conn.commit()
+    conn.close()
+    for name, value in values.items():
+        print(f"{name}: {value}")
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:2])
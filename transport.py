@@ -0,0 +1,157 @@
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.request import ACCEPT_ENCODING
+from urllib3.util.retry import Retry
+
+DEFAULT_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+
+class ResponseTooLarge(Exception):
+    pass
+
+
+class CappedRetry(Retry):
+    """Retry that honors Retry-After but never sleeps longer than ``MAX_RETRY_AFTER`` seconds."""
+
+    MAX_RETRY_AFTER = 60.0
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        return None if retry_after is None else min(retry_after, self.MAX_RETRY_AFTER)
+
+
+class MeteredAdapter(HTTPAdapter):
+    """HTTPAdapter whose connection pools report every new connection and its setup time to ``on_connect``."""
+
+    def __init__(self, on_connect, **kwargs):
+        self.on_connect = on_connect
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        on_connect = self.on_connect
+
+        class MeteredHTTPConnection(HTTPConnection):
+            def connect(self):
+                start = time.perf_counter()
+                try:
+                    super().connect()
+                finally:
+                    on_connect(time.perf_counter() - start)
+
+        class MeteredHTTPSConnection(HTTPSConnection):
+            def connect(self):
+                start = time.perf_counter()
+                try:
+                    super().connect()
+                finally:
+                    on_connect(time.perf_counter() - start)
+
+        class MeteredHTTPPool(HTTPConnectionPool):
+            ConnectionCls = MeteredHTTPConnection
+
+        class MeteredHTTPSPool(HTTPSConnectionPool):
+            ConnectionCls = MeteredHTTPSConnection
+
+        self.poolmanager.pool_classes_by_scheme = {'http': MeteredHTTPPool, 'https': MeteredHTTPSPool}
+
+
+class HttpTransport:
+    """Shared HTTP client for all crawl threads.
+
+    Wraps one ``requests.Session`` with connection pools sized for concurrent
+    crawling (``pool_maxsize`` connections kept per host, ``pool_connections``
+    hosts), retries with exponential backoff on connection errors, 429 and 5xx,
+    separate connect and read timeouts, and compressed transfer encodings
+    (brotli/zstd too when their urllib3 extras are installed). Bodies are
+    streamed and the request is aborted once ``max_body_bytes`` is exceeded.
+    Responses carry ``timings``: ``connect`` (DNS, TCP and TLS of connections
+    opened for the request), ``ttfb`` and, once the body is read, ``download``;
+    ``retries`` counts the attempts retried before the final response.
+    """
+
+    def __init__(self, pool_connections=32, pool_maxsize=16, retries=3, backoff_factor=0.5,
+                 status_forcelist=(429, 500, 502, 503, 504), connect_timeout=5.0, read_timeout=15.0,
+                 max_body_bytes=10 * 1024 * 1024, user_agent=DEFAULT_USER_AGENT):
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_body_bytes = max_body_bytes
+        retry = CappedRetry(total=retries, connect=retries, read=retries, status=retries,
+                            backoff_factor=backoff_factor, status_forcelist=status_forcelist,
+                            allowed_methods=frozenset({'GET', 'HEAD'}), respect_retry_after_header=True,
+                            raise_on_status=False)
+        adapter = MeteredAdapter(self._on_connect, pool_connections=pool_connections,
+                                 pool_maxsize=pool_maxsize, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({'User-Agent': user_agent, 'Accept-Encoding': ACCEPT_ENCODING})
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._metrics = {'requests': 0, 'new_connections': 0, 'retries': 0, 'bytes_received': 0,
+                         'aborted_too_large': 0}
+
+    def stream(self, url, headers=None):
+        """GET ``url`` without reading the body; the caller reads ``response.raw`` and must close it."""
+        self._local.connect = 0.0
+        start = time.perf_counter()
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout, stream=True)
+        finally:
+            self._count('requests')
+        elapsed, connect = time.perf_counter() - start, self._local.connect
+        response.timings = {'connect': connect, 'ttfb': max(elapsed - connect, 0.0)}
+        retries = getattr(response.raw, 'retries', None)
+        response.retries = len(retries.history) if retries is not None else 0
+        if response.retries:
+            self._count('retries', response.retries)
+        response.raw.decode_content = True
+        return response
+
+    def get(self, url, headers=None):
+        """GET ``url`` with the body read eagerly but capped; raises ResponseTooLarge over the limit."""
+        response = self.stream(url, headers)
+        start = time.perf_counter()
+        try:
+            declared = int(response.headers.get('Content-Length') or 0)
+        except ValueError:
+            declared = 0
+        if declared > self.max_body_bytes:
+            response.close()
+            self._count('aborted_too_large')
+            raise ResponseTooLarge(f"Content-Length {declared} exceeds {self.max_body_bytes} bytes")
+        chunks, size = [], 0
+        for chunk in response.iter_content(64 * 1024):
+            size += len(chunk)
+            if size > self.max_body_bytes:
+                response.close()
+                self._count('aborted_too_large')
+                raise ResponseTooLarge(f"Body exceeds {self.max_body_bytes} bytes")
+            chunks.append(chunk)
+        # Reading to the end has already returned the connection to the pool
+        response._content = b''.join(chunks)
+        response.timings['download'] = time.perf_counter() - start
+        self._count('bytes_received', size)
+        return response
+
+    def _on_connect(self, seconds):
+        # Connections are opened on the thread that sends the request
+        self._local.connect = getattr(self._local, 'connect', 0.0) + seconds
+        self._count('new_connections')
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._metrics[name] += amount
+
+    def metrics(self):
+        with self._lock:
+            metrics = dict(self._metrics)
+        # Share of requests served on an already open connection
+        requests_made = metrics['requests'] + metrics['retries']
+        reused = max(requests_made - metrics['new_connections'], 0)
+        metrics['connection_reuse_rate'] = round(reused / requests_made, 4) if requests_made else 0.0
+        return metrics